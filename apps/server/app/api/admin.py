@@ -333,3 +333,34 @@ async def mark_feedback_read(
         read=payload.read,
     )
     return {"status": "ok"}
+
+
+@router.get("/admin/ingestion")
+async def get_ingestion_stats(
+    request: Request,
+    user: AuthUser = AuthDependency,
+) -> dict[str, Any]:
+    _ensure_admin(request, user)
+    return {
+        "parser": request.app.state.indexer.scheduler.stats(),
+        "answer_ws_pool": request.app.state.parser_client.ws_pool_stats(),
+        "parser_circuit": request.app.state.parser_client.circuit_stats(),
+    }
+
+
+@router.get("/admin/embedding-cache")
+async def get_embedding_cache_stats(
+    request: Request,
+    user: AuthUser = AuthDependency,
+) -> dict[str, Any]:
+    _ensure_admin(request, user)
+    return request.app.state.embedding_cache.stats()
+
+
+@router.get("/admin/vector-cache")
+async def get_vector_cache_stats(
+    request: Request,
+    user: AuthUser = AuthDependency,
+) -> dict[str, Any]:
+    _ensure_admin(request, user)
+    return request.app.state.vector_cache.stats()
@@ -9,15 +9,22 @@ from datetime import datetime, timezone, timedelta
 from typing import Any, Literal
 from urllib.parse import quote
 
+import anyio
 from fastapi import APIRouter, File, HTTPException, Request, Response, UploadFile, status, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 from app.db import repository
+from app.db.result_pages import parse_page_selection
+from app.db.vector import embedding_as_list, is_embedding
 from app.services.auth import AuthDependency, AuthUser, get_user_from_token_or_guest_app
+from app.services.embedding_export import EXPORT_FORMATS, EXPORT_MEDIA_TYPE, build_embedding_export, export_version
 from app.services.indexer import Indexer
+from app.services.spool import SpoolLimitExceeded, SpooledFile, remove_spooled_file, spool_upload
 from app.services.storage import StorageClient
 from app.services.usage import extract_usage
-from app.services.plans import get_plan_limits, resolve_user_plan
+from app.services.plans import PLAN_LIMITS, get_plan_limits, resolve_user_plan
+from app.services.progress import ProgressBroker
 
 router = APIRouter()
 logger = logging.getLogger("uvicorn.error")
@@ -35,6 +42,8 @@ ChatAnswerRequest.model_rebuild()
 
 _SEARCH_SPACE_PATTERN = re.compile(r"[\s\u00A0\u1680\u2000-\u200B\u202F\u205F\u3000\uFEFF]+")
 _ANSWER_RETRY_ATTEMPTS = 3
+_PROGRESS_HEARTBEAT_S = 15.0
+_ACTIVE_DOCUMENT_STATUSES = {"uploading", "uploaded", "processing"}
 
 
 def _build_model(settings, mode: str | None) -> str | None:
@@ -60,14 +69,14 @@ def _resolve_rag_params(settings, payload: ChatAnswerRequest) -> tuple[int, int,
     return top_k, min_k, score_threshold
 
 
-def _extract_embedding(payload: dict[str, Any]) -> list[float] | None:
+def _extract_embedding(payload: dict[str, Any]) -> Any:
     embedding = payload.get("embedding")
-    if isinstance(embedding, list):
+    if is_embedding(embedding):
         return embedding
     data = payload.get("data")
     if isinstance(data, dict):
         embedding = data.get("embedding")
-        if isinstance(embedding, list):
+        if is_embedding(embedding):
             return embedding
         data = data.get("data")
     if isinstance(data, list):
@@ -75,7 +84,7 @@ def _extract_embedding(payload: dict[str, Any]) -> list[float] | None:
             if not isinstance(item, dict):
                 continue
             embedding = item.get("embedding")
-            if isinstance(embedding, list):
+            if is_embedding(embedding):
                 return embedding
     return None
 
@@ -94,24 +103,6 @@ def _extract_model_name(payload: Any) -> str | None:
     return None
 
 
-def _parse_vector(value: Any) -> list[float] | None:
-    if isinstance(value, list):
-        return [float(item) for item in value]
-    if value is None:
-        return None
-    if isinstance(value, (bytes, bytearray, memoryview)):
-        value = bytes(value).decode()
-    if isinstance(value, str):
-        text = value.strip()
-        if text.startswith("[") and text.endswith("]"):
-            text = text[1:-1]
-        if not text:
-            return []
-        parts = [item.strip() for item in text.split(",") if item.strip()]
-        return [float(item) for item in parts]
-    return None
-
-
 def _split_matches(
     matches: list[dict[str, Any]],
     min_k: int,
@@ -169,6 +160,13 @@ def _extract_tag_refs(answer: str, ref_map: dict[str, dict[str, Any]]) -> list[d
     return refs
 
 
+def _parse_pages_param(value: str | None) -> list[int] | None:
+    try:
+        return parse_page_selection(value)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+
+
 def _normalize_search_query(value: str) -> str:
     return _SEARCH_SPACE_PATTERN.sub("", value).strip()
 
@@ -294,6 +292,25 @@ def _validate_pdf_upload(file: UploadFile, content: bytes) -> None:
         )
 
 
+async def _spool_pdf_upload(file: UploadFile, directory: str) -> SpooledFile:
+    # The largest plan limit bounds the spool; the user's own limit is checked afterwards.
+    max_bytes = max(
+        (item.max_file_mb for item in PLAN_LIMITS.values() if item.max_file_mb is not None),
+        default=None,
+    )
+    try:
+        return await spool_upload(
+            file,
+            directory,
+            max_bytes=max_bytes * 1024 * 1024 if max_bytes is not None else None,
+        )
+    except SpoolLimitExceeded:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="File size limit exceeded",
+        )
+
+
 async def _enforce_thread_limit(pool, user: AuthUser, document_id: str) -> None:
     _, limits = await _resolve_limits(pool, user)
     if limits.max_threads_per_document is None:
@@ -338,27 +355,103 @@ async def index_document(
     file: UploadFile = File(...),
     user: AuthUser = AuthDependency,
 ) -> dict[str, Any]:
-    content = await file.read()
-    _validate_pdf_upload(file, content)
+    settings = request.app.state.settings
+    spooled = await _spool_pdf_upload(file, settings.upload_spool_dir)
+    try:
+        _validate_pdf_upload(file, spooled.head)
+        pool = request.app.state.db_pool
+        _, limits = await _resolve_limits(pool, user)
+        active_uploads = await repository.count_active_uploads(pool, user.user_id)
+        limit = settings.max_concurrent_uploads
+        if active_uploads >= limit:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"同時にアップロード/解析できるPDFは{limit}つまでです。",
+            )
+        _enforce_file_size_limit(spooled.size, limits)
+        if limits.max_files is not None:
+            count = await repository.count_documents(pool, user.user_id)
+            if count >= limits.max_files:
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail="Document limit reached",
+                )
+        indexer: Indexer = request.app.state.indexer
+        return await indexer.start_index_document(pool, spooled, file.filename, user.user_id)
+    except BaseException:
+        remove_spooled_file(spooled.path)
+        raise
+
+
+@router.post("/documents/index/batch")
+async def index_documents_batch(
+    request: Request,
+    files: list[UploadFile] = File(...),
+    user: AuthUser = AuthDependency,
+) -> dict[str, Any]:
+    settings = request.app.state.settings
+    if len(files) > settings.batch_upload_max_files:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"一度にアップロードできるPDFは{settings.batch_upload_max_files}件までです。",
+        )
     pool = request.app.state.db_pool
     _, limits = await _resolve_limits(pool, user)
-    active_uploads = await repository.count_active_uploads(pool, user.user_id)
-    limit = request.app.state.settings.max_concurrent_uploads
+    document_count, active_uploads = await repository.count_document_quota(pool, user.user_id)
+    limit = settings.max_concurrent_uploads
     if active_uploads >= limit:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail=f"同時にアップロード/解析できるPDFは{limit}つまでです。",
         )
-    _enforce_file_size_limit(len(content), limits)
+    remaining = None
     if limits.max_files is not None:
-        count = await repository.count_documents(pool, user.user_id)
-        if count >= limits.max_files:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Document limit reached",
-            )
-    indexer: Indexer = request.app.state.indexer
-    return await indexer.start_index_document(pool, content, file.filename, user.user_id)
+        remaining = max(limits.max_files - document_count, 0)
+    # Every accepted file counts as an active upload, so the batch may only
+    # fill the slots that are still free.
+    free_slots = limit - active_uploads
+
+    results: list[dict[str, Any] | None] = [None] * len(files)
+    accepted: list[tuple[int, SpooledFile, str | None]] = []
+    try:
+        for index, file in enumerate(files):
+            if remaining is not None and len(accepted) >= remaining:
+                results[index] = {"filename": file.filename, "error": "Document limit reached"}
+                continue
+            if len(accepted) >= free_slots:
+                results[index] = {
+                    "filename": file.filename,
+                    "error": f"同時にアップロード/解析できるPDFは{limit}つまでです。",
+                }
+                continue
+            try:
+                spooled = await _spool_pdf_upload(file, settings.upload_spool_dir)
+            except HTTPException as exc:
+                results[index] = {"filename": file.filename, "error": exc.detail}
+                continue
+            try:
+                _validate_pdf_upload(file, spooled.head)
+                _enforce_file_size_limit(spooled.size, limits)
+            except HTTPException as exc:
+                remove_spooled_file(spooled.path)
+                results[index] = {"filename": file.filename, "error": exc.detail}
+                continue
+            accepted.append((index, spooled, file.filename))
+
+        indexer: Indexer = request.app.state.indexer
+        started = await indexer.start_index_batch(
+            pool,
+            [(spooled, filename) for _, spooled, filename in accepted],
+            user.user_id,
+            concurrency=settings.batch_upload_concurrency,
+        )
+    except BaseException:
+        for _, spooled, _ in accepted:
+            remove_spooled_file(spooled.path)
+        raise
+    for (index, _, filename), entry in zip(accepted, started):
+        results[index] = {"filename": filename, **entry}
+    return {"documents": results}
 
 
 @router.get("/documents")
@@ -442,6 +535,54 @@ async def search_documents_text(
     return {"items": items}
 
 
+def _sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@router.get("/documents/events")
+async def stream_document_events(
+    request: Request,
+    token: str,
+    token_type: str | None = None,
+) -> StreamingResponse:
+    # EventSource cannot send headers, so the token comes in the query string.
+    user = get_user_from_token_or_guest_app(request.app, token, token_type)
+    broker: ProgressBroker = request.app.state.progress_broker
+    pool = request.app.state.db_pool
+    queue = broker.subscribe(user.user_id)
+
+    async def events():
+        try:
+            rows = await repository.list_documents(pool, user.user_id)
+            snapshot = [
+                {
+                    "document_id": str(row["id"]),
+                    "status": row["status"],
+                    "stage": row.get("stage"),
+                    "progress": row.get("progress"),
+                }
+                for row in rows
+                if row["status"] in _ACTIVE_DOCUMENT_STATUSES
+            ]
+            yield _sse_event("snapshot", {"documents": snapshot})
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=_PROGRESS_HEARTBEAT_S)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                event.pop("user_id", None)
+                yield _sse_event("progress", event)
+        finally:
+            broker.unsubscribe(user.user_id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/documents/{document_id}")
 async def get_document(
     request: Request,
@@ -507,6 +648,7 @@ async def delete_document(
     row = await repository.delete_document(pool, document_id, user.user_id)
     if not row:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+    request.app.state.vector_cache.invalidate(document_id)
     return {"id": str(row["id"])}
 
 
@@ -578,11 +720,18 @@ async def download_document_file(
 async def get_document_bundle(
     request: Request,
     document_id: str,
+    pages: str | None = None,
     user: AuthUser = AuthDependency,
 ) -> dict[str, Any]:
     start = time.perf_counter()
+    page_numbers = _parse_pages_param(pages)
     pool = request.app.state.db_pool
-    bundle = await repository.get_document_bundle(pool, document_id, user.user_id)
+    bundle = await repository.get_document_bundle(
+        pool,
+        document_id,
+        user.user_id,
+        page_numbers=page_numbers,
+    )
     if not bundle:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
     storage_path = bundle.get("storage_path")
@@ -598,11 +747,6 @@ async def get_document_bundle(
             detail="Failed to create signed URL",
         )
     result = bundle.get("result")
-    if isinstance(result, str):
-        try:
-            result = json.loads(result)
-        except json.JSONDecodeError:
-            result = None
     annotations = bundle.get("annotations") if bundle else None
     if isinstance(annotations, str):
         try:
@@ -631,14 +775,21 @@ async def get_document_bundle(
 async def get_document_text_positions(
     request: Request,
     document_id: str,
+    pages: str | None = None,
     user: AuthUser = AuthDependency,
 ) -> dict[str, Any]:
+    page_numbers = _parse_pages_param(pages)
     pool = request.app.state.db_pool
-    row = await repository.get_document(pool, document_id, user.user_id)
-    if not row:
+    exists = await repository.document_exists(pool, document_id, user.user_id)
+    if not exists:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
 
-    result = row.get("result")
+    result = await repository.get_document_result(
+        pool,
+        document_id,
+        user.user_id,
+        page_numbers=page_numbers,
+    )
     if not isinstance(result, dict):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -715,18 +866,20 @@ async def get_document_text_positions(
 async def get_document_result(
     request: Request,
     document_id: str,
+    pages: str | None = None,
     user: AuthUser = AuthDependency,
 ) -> dict[str, Any]:
+    page_numbers = _parse_pages_param(pages)
     pool = request.app.state.db_pool
-    row = await repository.get_document(pool, document_id, user.user_id)
-    if not row:
+    exists = await repository.document_exists(pool, document_id, user.user_id)
+    if not exists:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
-    result = row.get("result")
-    if isinstance(result, str):
-        try:
-            result = json.loads(result)
-        except json.JSONDecodeError:
-            result = None
+    result = await repository.get_document_result(
+        pool,
+        document_id,
+        user.user_id,
+        page_numbers=page_numbers,
+    )
     if not isinstance(result, dict):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -769,19 +922,90 @@ async def list_document_chunks(
     )
     chunks: list[dict[str, Any]] = []
     for row in rows:
-        embedding = _parse_vector(row.get("embedding"))
+        embedding = row.get("embedding")
         chunks.append(
             {
                 "id": str(row["id"]),
                 "documentId": str(row["document_id"]),
                 "content": str(row.get("content") or ""),
                 "metadata": row.get("metadata"),
-                "embedding": embedding,
+                "embedding": embedding_as_list(embedding) if embedding is not None else None,
             }
         )
     return {"chunks": chunks}
 
 
+def _embedding_export_encoding(encoding: str) -> str:
+    if encoding not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"encoding must be one of: {', '.join(EXPORT_FORMATS)}",
+        )
+    return encoding
+
+
+@router.get("/documents/{document_id}/embeddings")
+async def get_document_embeddings_export(
+    request: Request,
+    response: Response,
+    document_id: str,
+    encoding: str = "i8",
+    user: AuthUser = AuthDependency,
+) -> dict[str, Any]:
+    """Point at the current immutable export; clients re-check this, never the export."""
+    encoding = _embedding_export_encoding(encoding)
+    digest = await repository.get_document_chunk_digest(
+        request.app.state.db_pool,
+        document_id,
+        user.user_id,
+    )
+    if not digest:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+    version = export_version(str(digest["chunk_digest"]), encoding)
+    response.headers["Cache-Control"] = "no-cache"
+    return {
+        "url": f"/documents/{document_id}/embeddings/{encoding}/{version}",
+        "version": version,
+        "encoding": encoding,
+        "chunk_count": int(digest["chunk_count"] or 0),
+    }
+
+
+@router.get("/documents/{document_id}/embeddings/{encoding}/{version}")
+async def download_document_embeddings_export(
+    request: Request,
+    document_id: str,
+    encoding: str,
+    version: str,
+    user: AuthUser = AuthDependency,
+) -> Response:
+    start = time.perf_counter()
+    encoding = _embedding_export_encoding(encoding)
+    pool = request.app.state.db_pool
+    digest = await repository.get_document_chunk_digest(pool, document_id, user.user_id)
+    # A stale version is gone for good; the client asks the manifest for the new one.
+    if not digest or export_version(str(digest["chunk_digest"]), encoding) != version:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+    headers = {
+        "Cache-Control": "private, max-age=31536000, immutable",
+        "ETag": f'"{version}"',
+    }
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    rows = await repository.list_document_chunks_with_embeddings(pool, document_id, user.user_id)
+    content = await anyio.to_thread.run_sync(build_embedding_export, rows, encoding)
+    logger.info(
+        "embedding_export doc=%s encoding=%s chunks=%d bytes=%d total_ms=%.1f",
+        document_id,
+        encoding,
+        len(rows),
+        len(content),
+        (time.perf_counter() - start) * 1000,
+    )
+    return Response(content=content, media_type=EXPORT_MEDIA_TYPE, headers=headers)
+
+
 @router.get("/document-chunks/{chunk_id}")
 async def get_document_chunk_preview(
     request: Request,
@@ -1196,13 +1420,13 @@ async def create_document_chat_assistant_message(
             chat_id,
             user.user_id,
         )
-        embed_task = parser.embed_text(message)
+        embed_task = request.app.state.embedding_cache.embed(message)
         exists_ok, embed_payload = await asyncio.gather(check_task, embed_task)
         if not exists_ok:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
 
         embedding = _extract_embedding(embed_payload)
-        if not isinstance(embedding, list):
+        if not is_embedding(embedding):
             logger.error(
                 "assistant.embed invalid response type=%s keys=%s",
                 type(embed_payload).__name__,
@@ -1223,12 +1447,20 @@ async def create_document_chat_assistant_message(
                 chat_id=chat_id,
                 model=_extract_model_name(embed_payload),
             )
-            matches = await repository.match_documents_conn(
-                conn,
-                query_embedding=embedding,
-                match_count=top_k,
-                document_id=document_id,
+            matches = await request.app.state.vector_cache.search(
+                document_id,
+                embedding,
+                top_k,
+                conn=conn,
             )
+            if matches is None:
+                matches = await repository.match_documents_conn(
+                    conn,
+                    query_embedding=embedding,
+                    match_count=top_k,
+                    document_id=document_id,
+                    ef_search=settings.vector_ef_search,
+                )
             recent_messages = await repository.list_recent_document_chat_messages_conn(
                 conn,
                 chat_id,
@@ -1501,7 +1733,7 @@ async def stream_document_chat_assistant_message(
     if client_matches:
         matches = client_matches[:top_k]
     else:
-        embed_payload = await parser.embed_text(message)
+        embed_payload = await websocket.scope["app"].state.embedding_cache.embed(message)
         await _record_usage(
             pool,
             user_id=user.user_id,
@@ -1512,15 +1744,18 @@ async def stream_document_chat_assistant_message(
             model=_extract_model_name(embed_payload),
         )
         embedding = _extract_embedding(embed_payload)
-        if not isinstance(embedding, list):
+        if not is_embedding(embedding):
             await websocket.close(code=1011)
             return
-        matches = await repository.match_documents(
-            pool,
-            query_embedding=embedding,
-            match_count=top_k,
-            document_id=document_id,
-        )
+        matches = await websocket.scope["app"].state.vector_cache.search(document_id, embedding, top_k)
+        if matches is None:
+            matches = await repository.match_documents(
+                pool,
+                query_embedding=embedding,
+                match_count=top_k,
+                document_id=document_id,
+                ef_search=settings.vector_ef_search,
+            )
     context_matches, _ = _split_matches(matches, min_k, score_threshold)
 
     recent_messages = await repository.list_recent_document_chat_messages(
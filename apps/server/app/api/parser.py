@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import hmac
+from typing import Any
+
+from fastapi import APIRouter, Header, HTTPException, Request, status
+from pydantic import BaseModel
+
+from app.services.indexer import Indexer
+
+
+router = APIRouter()
+
+
+class ParserCallbackRequest(BaseModel):
+    doc_id: str
+    status: str | None = None
+
+
+# Dormant: the parser API (PDF-PARSER-README.md) has no completion callbacks, so
+# nothing calls this yet and ingestion relies on ParserPollPolicy polling.
+@router.post("/parser/callback")
+async def parser_callback(
+    request: Request,
+    payload: ParserCallbackRequest,
+    token: str | None = None,
+    x_callback_token: str | None = Header(default=None, alias="X-Callback-Token"),
+) -> dict[str, Any]:
+    secret = request.app.state.settings.parser_callback_secret
+    provided = x_callback_token or token or ""
+    if not secret or not hmac.compare_digest(provided.encode(), secret.encode()):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+    indexer: Indexer = request.app.state.indexer
+    delivered = indexer.notify_parser_status(payload.doc_id)
+    return {"ok": True, "delivered": delivered}
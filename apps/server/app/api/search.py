@@ -2,11 +2,13 @@ from __future__ import annotations
 
 from typing import Any
 import logging
+import time
 
 from fastapi import APIRouter, HTTPException, Request, status
 from pydantic import BaseModel
 
 from app.db import repository
+from app.db.vector import embedding_as_list, is_embedding
 from app.services.auth import AuthDependency, AuthUser
 from app.services.usage import extract_usage
 
@@ -20,6 +22,12 @@ class SearchRequest(BaseModel):
     document_id: str | None = None
 
 
+class LibrarySearchRequest(BaseModel):
+    query: str
+    top_k: int = 10
+    chunks_per_document: int = 3
+
+
 class EmbeddingRequest(BaseModel):
     text: str
     document_id: str | None = None
@@ -39,30 +47,28 @@ def _extract_model_name(payload: Any) -> str | None:
     return None
 
 
-@router.post("/search")
-async def search(
+async def _embed_query(
     request: Request,
-    payload: SearchRequest,
-    user: AuthUser = AuthDependency,
-) -> dict[str, Any]:
-    parser = request.app.state.parser_client
-    embed_payload = await parser.embed_text(payload.query)
+    user: AuthUser,
+    text: str,
+    document_id: str | None = None,
+) -> tuple[Any, dict[str, Any]]:
+    """Embed ``text`` and log its usage; returns the embedding and the raw payload."""
+    embed_payload = await request.app.state.embedding_cache.embed(text)
     embed_model = _extract_model_name(embed_payload)
     input_tokens, output_tokens, total_tokens, raw_usage = extract_usage(embed_payload)
     embedding = embed_payload.get("embedding") or embed_payload.get("data")
     if isinstance(embedding, dict):
         embedding = embedding.get("embedding")
-    if not isinstance(embedding, list):
+    if not is_embedding(embedding):
         raise ValueError("Invalid embedding response")
-
-    pool = request.app.state.db_pool
     if raw_usage is not None or total_tokens is not None:
         try:
             await repository.insert_usage_log(
-                pool,
+                request.app.state.db_pool,
                 user_id=user.user_id,
                 operation="embed",
-                document_id=payload.document_id,
+                document_id=document_id,
                 model=embed_model,
                 input_tokens=input_tokens,
                 output_tokens=output_tokens,
@@ -71,19 +77,109 @@ async def search(
             )
         except Exception:
             logger.exception("usage_log failed operation=embed")
-    if payload.document_id:
-        owned = await repository.get_document(pool, payload.document_id, user.user_id)
-        if not owned:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+    return embedding, embed_payload
+
+
+def _group_by_document(
+    rows: list[dict[str, Any]],
+    document_count: int,
+    chunks_per_document: int,
+) -> list[dict[str, Any]]:
+    # Rows arrive best first, so a document's first row carries its score.
+    groups: dict[str, dict[str, Any]] = {}
+    for row in rows:
+        document_id = str(row["document_id"])
+        group = groups.get(document_id)
+        if group is None:
+            if len(groups) >= document_count:
+                continue
+            group = groups[document_id] = {
+                "document_id": document_id,
+                "title": row.get("document_title"),
+                "score": row.get("similarity"),
+                "matches": [],
+            }
+        if len(group["matches"]) < chunks_per_document:
+            group["matches"].append(
+                {
+                    "id": str(row["id"]),
+                    "content": row.get("content"),
+                    "metadata": row.get("metadata"),
+                    "similarity": row.get("similarity"),
+                }
+            )
+    return list(groups.values())
+
+
+@router.post("/search")
+async def search(
+    request: Request,
+    payload: SearchRequest,
+    user: AuthUser = AuthDependency,
+) -> dict[str, Any]:
+    embedding, _ = await _embed_query(request, user, payload.query, payload.document_id)
+    pool = request.app.state.db_pool
+    settings = request.app.state.settings
+    if not payload.document_id:
+        rows = await repository.match_user_documents(
+            pool,
+            user.user_id,
+            query_embedding=embedding,
+            match_count=payload.top_k,
+            ef_search=settings.vector_ef_search,
+            exact_max_chunks=settings.vector_exact_max_chunks,
+            rerank_candidates=settings.vector_rerank_candidates,
+        )
+        return {"matches": rows}
+    owned = await repository.document_exists(pool, payload.document_id, user.user_id)
+    if not owned:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
     rows = await repository.match_documents(
         pool,
         query_embedding=embedding,
         match_count=payload.top_k,
         document_id=payload.document_id,
+        ef_search=settings.vector_ef_search,
+        rerank_candidates=settings.vector_rerank_candidates,
     )
     return {"matches": rows}
 
 
+@router.post("/search/library")
+async def search_library(
+    request: Request,
+    payload: LibrarySearchRequest,
+    user: AuthUser = AuthDependency,
+) -> dict[str, Any]:
+    query = payload.query.strip()
+    if not query:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="query is required")
+    top_k = min(max(int(payload.top_k), 1), 50)
+    chunks_per_document = min(max(int(payload.chunks_per_document), 1), 10)
+    embedding, _ = await _embed_query(request, user, query)
+    settings = request.app.state.settings
+    start = time.perf_counter()
+    # Over-fetch chunks so one dominant document does not crowd out the others.
+    rows = await repository.match_user_documents(
+        request.app.state.db_pool,
+        user.user_id,
+        query_embedding=embedding,
+        match_count=min(top_k * chunks_per_document * 4, 400),
+        ef_search=settings.vector_ef_search,
+        exact_max_chunks=settings.vector_exact_max_chunks,
+        rerank_candidates=settings.vector_rerank_candidates,
+    )
+    documents = _group_by_document(rows, top_k, chunks_per_document)
+    logger.info(
+        "library_search user=%s chunks=%d documents=%d db_ms=%.1f",
+        user.user_id,
+        len(rows),
+        len(documents),
+        (time.perf_counter() - start) * 1000,
+    )
+    return {"documents": documents}
+
+
 @router.post("/embeddings")
 async def embeddings(
     request: Request,
@@ -93,29 +189,5 @@ async def embeddings(
     text = payload.text.strip()
     if not text:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="text is required")
-    parser = request.app.state.parser_client
-    embed_payload = await parser.embed_text(text)
-    embed_model = _extract_model_name(embed_payload)
-    input_tokens, output_tokens, total_tokens, raw_usage = extract_usage(embed_payload)
-    embedding = embed_payload.get("embedding") or embed_payload.get("data")
-    if isinstance(embedding, dict):
-        embedding = embedding.get("embedding")
-    if not isinstance(embedding, list):
-        raise ValueError("Invalid embedding response")
-    pool = request.app.state.db_pool
-    if raw_usage is not None or total_tokens is not None:
-        try:
-            await repository.insert_usage_log(
-                pool,
-                user_id=user.user_id,
-                operation="embed",
-                document_id=payload.document_id,
-                model=embed_model,
-                input_tokens=input_tokens,
-                output_tokens=output_tokens,
-                total_tokens=total_tokens,
-                raw_usage=raw_usage,
-            )
-        except Exception:
-            logger.exception("usage_log failed operation=embed")
-    return {"embedding": embedding, "usage": embed_payload.get("usage")}
+    embedding, embed_payload = await _embed_query(request, user, text, payload.document_id)
+    return {"embedding": embedding_as_list(embedding), "usage": embed_payload.get("usage")}
@@ -1,6 +1,7 @@
 from dataclasses import dataclass
 import os
 from pathlib import Path
+import tempfile
 
 from dotenv import load_dotenv
 
@@ -49,6 +50,7 @@ class Settings:
     parser_api_key: str
     parser_api_prefix: str
     database_url: str
+    database_listen_url: str
     supabase_url: str
     supabase_service_role_key: str
     supabase_bucket: str
@@ -61,6 +63,9 @@ class Settings:
     rag_top_k: int
     rag_min_k: int
     rag_score_threshold: float
+    vector_ef_search: int
+    vector_exact_max_chunks: int
+    vector_rerank_candidates: int
     stripe_secret_key: str
     stripe_webhook_secret: str
     stripe_plus_price_id: str
@@ -68,6 +73,32 @@ class Settings:
     cors_allow_origins: list[str]
     admin_user_ids: list[str]
     max_concurrent_uploads: int
+    ingestion_workers: int
+    ingestion_max_attempts: int
+    ingestion_poll_interval_s: float
+    ingestion_drain_timeout_s: float
+    parser_callback_url: str | None
+    parser_callback_secret: str | None
+    upload_spool_dir: str
+    ingestion_pipelined: bool
+    batch_upload_max_files: int
+    batch_upload_concurrency: int
+    parser_max_concurrent_jobs: int | None
+    embed_batch_window_ms: float
+    embed_batch_max: int
+    parser_ws_pool_size: int
+    parser_http2: bool | None
+    parser_max_connections: int
+    parser_max_retries: int
+    parser_breaker_threshold: int
+    parser_breaker_reset_s: float
+    embed_hedge_delay_ms: float
+    parser_embedding_format: str
+    parser_ws_pool_max_idle_s: float
+    embedding_cache_size: int
+    embedding_cache_ttl_s: float
+    embedding_cache_persist: bool
+    vector_cache_max_mb: float
 
 
 def _require_env(name: str) -> str:
@@ -78,10 +109,13 @@ def _require_env(name: str) -> str:
 
 
 def get_settings() -> Settings:
+    # Comma-separated list of parser replicas; jobs stay on the replica that accepted them.
     base_url = _require_env("PARSER_API_BASE_URL").rstrip("/")
     api_key = _require_env("PARSER_API_KEY")
     parser_api_prefix = os.getenv("PARSER_API_PREFIX", "").strip()
     database_url = _require_env("DATABASE_URL")
+    # LISTEN needs a session-level connection; point this at the direct port when DATABASE_URL is pooled.
+    database_listen_url = os.getenv("DATABASE_LISTEN_URL", "").strip() or database_url
     supabase_url = _require_env("SUPABASE_URL").rstrip("/") + "/"
     supabase_service_role_key = _require_env("SUPABASE_SERVICE_ROLE_KEY")
     supabase_bucket = os.getenv("SUPABASE_BUCKET", "pdfs")
@@ -97,6 +131,13 @@ def get_settings() -> Settings:
     rag_top_k = int(os.getenv("RAG_TOP_K", "5") or "5")
     rag_min_k = int(os.getenv("RAG_MIN_K", "2") or "2")
     rag_score_threshold = float(os.getenv("RAG_SCORE_THRESHOLD", "0.2") or "0.2")
+    # HNSW candidate list size for cross-document searches; higher = better recall, slower. 0 = server default.
+    vector_ef_search = int(os.getenv("VECTOR_EF_SEARCH", "64") or "64")
+    # Libraries up to this many chunks are searched exactly; larger ones use the HNSW index.
+    vector_exact_max_chunks = int(os.getenv("VECTOR_EXACT_MAX_CHUNKS", "20000") or "20000")
+    # >0: ANN searches take this many candidates from the binary (Hamming) index and re-rank
+    # them exactly; 0 = float32 HNSW. Needs migration 026 and scripts.quantize_embeddings.
+    vector_rerank_candidates = int(os.getenv("VECTOR_RERANK_CANDIDATES", "0") or "0")
     stripe_secret_key = _require_env("STRIPE_SECRET_KEY")
     stripe_webhook_secret = _require_env("STRIPE_WEBHOOK_SECRET")
     stripe_plus_price_id = _require_env("STRIPE_PLUS_PRICE_ID")
@@ -114,12 +155,56 @@ def get_settings() -> Settings:
         if item.strip()
     ]
     max_concurrent_uploads = int(os.getenv("MAX_CONCURRENT_UPLOADS", "2") or "2")
+    ingestion_workers = int(os.getenv("INGESTION_WORKERS", "2") or "2")
+    ingestion_max_attempts = int(os.getenv("INGESTION_MAX_ATTEMPTS", "3") or "3")
+    ingestion_poll_interval_s = float(os.getenv("INGESTION_POLL_INTERVAL_S", "2") or "2")
+    ingestion_drain_timeout_s = float(os.getenv("INGESTION_DRAIN_TIMEOUT_S", "30") or "30")
+    parser_callback_url = os.getenv("PARSER_CALLBACK_URL", "").strip() or None
+    parser_callback_secret = os.getenv("PARSER_CALLBACK_SECRET", "").strip() or None
+    if parser_callback_url and not parser_callback_secret:
+        raise ValueError("PARSER_CALLBACK_SECRET is required when PARSER_CALLBACK_URL is set")
+    upload_spool_dir = os.getenv("UPLOAD_SPOOL_DIR", "").strip() or os.path.join(
+        tempfile.gettempdir(), "askpdf-uploads"
+    )
+    ingestion_pipelined = os.getenv("INGESTION_PIPELINED", "").strip().lower() in {"1", "true", "yes"}
+    # Parser-wide job limit shared by all processes. Unset: read adi_max_concurrent_jobs from /system.
+    parser_max_concurrent_jobs = int(os.getenv("PARSER_MAX_CONCURRENT_JOBS", "0") or "0") or None
+    # 0 disables coalescing of concurrent embed_text calls. Off by default: the
+    # parser's /embeddings only takes {"text": ...}, so batching needs a parser
+    # that also accepts {"texts": [...]}.
+    embed_batch_window_ms = float(os.getenv("EMBED_BATCH_WINDOW_MS", "0") or "0")
+    embed_batch_max = int(os.getenv("EMBED_BATCH_MAX", "32") or "32")
+    parser_http2_raw = os.getenv("PARSER_HTTP2", "").strip().lower()
+    # Unset: use HTTP/2 when the h2 package is installed.
+    parser_http2 = None if not parser_http2_raw else parser_http2_raw in {"1", "true", "yes"}
+    parser_max_connections = int(os.getenv("PARSER_MAX_CONNECTIONS", "100") or "100")
+    parser_max_retries = int(os.getenv("PARSER_MAX_RETRIES", "2") or "2")
+    parser_breaker_threshold = int(os.getenv("PARSER_BREAKER_THRESHOLD", "5") or "5")
+    parser_breaker_reset_s = float(os.getenv("PARSER_BREAKER_RESET_S", "30") or "30")
+    # 0 disables hedging; otherwise a second embed request races the first after this delay.
+    embed_hedge_delay_ms = float(os.getenv("EMBED_HEDGE_DELAY_MS", "0") or "0")
+    # "base64" asks the parser for little-endian float32 embeddings instead of JSON floats.
+    parser_embedding_format = os.getenv("PARSER_EMBEDDING_FORMAT", "float").strip().lower() or "float"
+    if parser_embedding_format not in {"float", "base64"}:
+        raise ValueError("PARSER_EMBEDDING_FORMAT must be float or base64")
+    parser_ws_pool_size = int(os.getenv("PARSER_WS_POOL_SIZE", "2") or "2")
+    parser_ws_pool_max_idle_s = float(os.getenv("PARSER_WS_POOL_MAX_IDLE_S", "45") or "45")
+    embedding_cache_size = int(os.getenv("EMBEDDING_CACHE_SIZE", "2048") or "2048")
+    embedding_cache_ttl_s = float(os.getenv("EMBEDDING_CACHE_TTL_S", "604800") or "604800")
+    embedding_cache_persist = os.getenv("EMBEDDING_CACHE_PERSIST", "").strip().lower() in {"1", "true", "yes"}
+    # Per-process budget for chat retrieval matrices (needs numpy); 0 disables the cache.
+    vector_cache_max_mb = float(os.getenv("VECTOR_CACHE_MAX_MB", "256") or "256")
+    batch_upload_max_files = int(os.getenv("BATCH_UPLOAD_MAX_FILES", "20") or "20")
+    batch_upload_concurrency = int(
+        os.getenv("BATCH_UPLOAD_CONCURRENCY", "") or str(max_concurrent_uploads)
+    )
 
     return Settings(
         parser_api_base_url=base_url,
         parser_api_key=api_key,
         parser_api_prefix=parser_api_prefix,
         database_url=database_url,
+        database_listen_url=database_listen_url,
         supabase_url=supabase_url,
         supabase_service_role_key=supabase_service_role_key,
         supabase_bucket=supabase_bucket,
@@ -132,6 +217,9 @@ def get_settings() -> Settings:
         rag_top_k=rag_top_k,
         rag_min_k=rag_min_k,
         rag_score_threshold=rag_score_threshold,
+        vector_ef_search=vector_ef_search,
+        vector_exact_max_chunks=vector_exact_max_chunks,
+        vector_rerank_candidates=vector_rerank_candidates,
         stripe_secret_key=stripe_secret_key,
         stripe_webhook_secret=stripe_webhook_secret,
         stripe_plus_price_id=stripe_plus_price_id,
@@ -139,4 +227,30 @@ def get_settings() -> Settings:
         cors_allow_origins=cors_allow_origins,
         admin_user_ids=admin_user_ids,
         max_concurrent_uploads=max_concurrent_uploads,
+        ingestion_workers=ingestion_workers,
+        ingestion_max_attempts=ingestion_max_attempts,
+        ingestion_poll_interval_s=ingestion_poll_interval_s,
+        ingestion_drain_timeout_s=ingestion_drain_timeout_s,
+        parser_callback_url=parser_callback_url,
+        parser_callback_secret=parser_callback_secret,
+        upload_spool_dir=upload_spool_dir,
+        ingestion_pipelined=ingestion_pipelined,
+        batch_upload_max_files=batch_upload_max_files,
+        batch_upload_concurrency=batch_upload_concurrency,
+        parser_max_concurrent_jobs=parser_max_concurrent_jobs,
+        embed_batch_window_ms=embed_batch_window_ms,
+        embed_batch_max=embed_batch_max,
+        parser_ws_pool_size=parser_ws_pool_size,
+        parser_http2=parser_http2,
+        parser_max_connections=parser_max_connections,
+        parser_max_retries=parser_max_retries,
+        parser_breaker_threshold=parser_breaker_threshold,
+        parser_breaker_reset_s=parser_breaker_reset_s,
+        embed_hedge_delay_ms=embed_hedge_delay_ms,
+        parser_embedding_format=parser_embedding_format,
+        parser_ws_pool_max_idle_s=parser_ws_pool_max_idle_s,
+        embedding_cache_size=embedding_cache_size,
+        embedding_cache_ttl_s=embedding_cache_ttl_s,
+        embedding_cache_persist=embedding_cache_persist,
+        vector_cache_max_mb=vector_cache_max_mb,
     )
@@ -1,5 +1,7 @@
 import asyncpg
 
+from app.db.vector import register_vector_codec
+
 
 async def create_pool(database_url: str) -> asyncpg.Pool:
     return await asyncpg.create_pool(
@@ -11,6 +13,7 @@ async def create_pool(database_url: str) -> asyncpg.Pool:
         statement_cache_size=0,
         command_timeout=30,
         max_inactive_connection_lifetime=180,
+        init=register_vector_codec,
     )
 
 
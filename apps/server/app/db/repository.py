@@ -3,12 +3,18 @@ from __future__ import annotations
 import json
 import re
 from datetime import datetime, timezone
-from typing import Any
+from typing import Any, AsyncIterator, Callable
 
 import asyncpg
 
-def _vector_literal(values: list[float]) -> str:
-    return "[" + ",".join(str(v) for v in values) + "]"
+from app.db.result_pages import (
+    PAGED_LAYOUT,
+    PagedResultBuilder,
+    assemble_result,
+    split_result,
+    strip_chunk_embeddings,
+)
+from app.db.vector import decode_embedding, embedding_as_list
 
 
 def _normalize_whitespace_for_search(value: str) -> str:
@@ -107,12 +113,23 @@ async def insert_document(
     status: str = "ready",
     progress: int | None = None,
     error_message: str | None = None,
+    content_sha256: str | None = None,
 ) -> str:
     async with pool.acquire() as conn:
         row = await conn.fetchrow(
             """
-            insert into documents (user_id, title, storage_path, metadata, result, status, progress, error_message)
-            values ($1, $2, $3, $4::jsonb, $5::jsonb, $6, $7, $8)
+            insert into documents (
+                user_id,
+                title,
+                storage_path,
+                metadata,
+                result,
+                status,
+                progress,
+                error_message,
+                content_sha256
+            )
+            values ($1, $2, $3, $4::jsonb, $5::jsonb, $6, $7, $8, $9)
             returning id
             """,
             user_id,
@@ -123,6 +140,7 @@ async def insert_document(
             status,
             progress,
             error_message,
+            content_sha256,
         )
     return str(row["id"])
 
@@ -134,7 +152,7 @@ async def list_documents(
     async with pool.acquire() as conn:
         rows = await conn.fetch(
             """
-            select id, title, status
+            select id, title, status, stage, progress
             from documents
             where user_id = $1
             order by created_at desc
@@ -144,6 +162,54 @@ async def list_documents(
     return [dict(row) for row in rows]
 
 
+async def insert_documents(
+    pool: asyncpg.Pool,
+    user_id: str,
+    documents: list[dict[str, Any]],
+    status: str = "uploading",
+) -> list[str]:
+    """Insert several documents in one statement; ids come back in input order."""
+    if not documents:
+        return []
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            """
+            insert into documents (user_id, title, storage_path, metadata, status, content_sha256)
+            select $1, item.title, item.storage_path, '{}'::jsonb, $2, item.content_sha256
+            from unnest($3::text[], $4::text[], $5::text[])
+                with ordinality as item(title, storage_path, content_sha256, ord)
+            order by item.ord
+            returning id, storage_path
+            """,
+            user_id,
+            status,
+            [item["title"] for item in documents],
+            [item["storage_path"] for item in documents],
+            [item.get("content_sha256") for item in documents],
+        )
+    ids = {row["storage_path"]: str(row["id"]) for row in rows}
+    return [ids[item["storage_path"]] for item in documents]
+
+
+async def count_document_quota(
+    pool: asyncpg.Pool,
+    user_id: str,
+) -> tuple[int, int]:
+    """Return ``(total_documents, active_uploads)`` for quota checks."""
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(
+            """
+            select
+                count(*) as total,
+                count(*) filter (where status in ('uploading', 'uploaded', 'processing')) as active
+            from documents
+            where user_id = $1
+            """,
+            user_id,
+        )
+    return int(row["total"] or 0), int(row["active"] or 0)
+
+
 async def count_documents(
     pool: asyncpg.Pool,
     user_id: str,
@@ -185,7 +251,7 @@ async def get_document(
     async with pool.acquire() as conn:
         row = await conn.fetchrow(
             """
-            select id, title, storage_path, metadata, result, created_at, status, progress, error_message
+            select id, title, storage_path, metadata, created_at, status, stage, progress, error_message
             from documents
             where id = $1 and user_id = $2
             """,
@@ -203,7 +269,7 @@ async def get_document_status(
     async with pool.acquire() as conn:
         row = await conn.fetchrow(
             """
-            select id, status
+            select id, status, stage, progress
             from documents
             where id = $1 and user_id = $2
             """,
@@ -225,6 +291,7 @@ async def update_document_status(
             """
             update documents
             set status = $2,
+                stage = case when $2 = 'processing' then stage end,
                 progress = $3,
                 error_message = $4,
                 updated_at = now()
@@ -237,6 +304,30 @@ async def update_document_status(
         )
 
 
+async def update_document_progress(
+    pool: asyncpg.Pool,
+    document_id: str,
+    stage: str,
+    progress: int | None,
+) -> None:
+    """Record a processing stage; no-op once the document has left ``processing``."""
+    async with pool.acquire() as conn:
+        await conn.execute(
+            """
+            update documents
+            set stage = $2,
+                progress = greatest(coalesce(progress, 0), coalesce($3, 0)),
+                updated_at = now()
+            where id = $1
+              and status = 'processing'
+              and (stage is distinct from $2 or progress is distinct from $3)
+            """,
+            document_id,
+            stage,
+            progress,
+        )
+
+
 async def mark_stale_documents_failed(
     pool: asyncpg.Pool,
     user_id: str,
@@ -252,6 +343,12 @@ async def mark_stale_documents_failed(
             where user_id = $1
               and status in ('uploading', 'uploaded', 'processing')
               and updated_at < $2
+              and not exists (
+                select 1
+                from ingestion_jobs
+                where ingestion_jobs.document_id = documents.id
+                  and ingestion_jobs.status in ('queued', 'running')
+              )
             """,
             user_id,
             cutoff,
@@ -262,6 +359,52 @@ async def mark_stale_documents_failed(
         return 0
 
 
+async def _replace_result_pages_conn(
+    conn: asyncpg.Connection,
+    document_id: str,
+    page_rows: list[dict[str, Any]],
+) -> None:
+    await conn.execute(
+        """
+        delete from document_result_pages
+        where document_id = $1
+        """,
+        document_id,
+    )
+    await _insert_result_pages_conn(conn, document_id, page_rows)
+
+
+async def _insert_result_pages_conn(
+    conn: asyncpg.Connection,
+    document_id: str,
+    page_rows: list[dict[str, Any]],
+) -> None:
+    if not page_rows:
+        return
+    await conn.executemany(
+        """
+        insert into document_result_pages (document_id, page_number, page, paragraphs, words)
+        values ($1, $2, $3::jsonb, $4::jsonb, $5::jsonb)
+        """,
+        [
+            (
+                document_id,
+                row["page_number"],
+                json.dumps(row["page"]),
+                json.dumps(row["paragraphs"]),
+                json.dumps(row["words"]),
+            )
+            for row in page_rows
+        ],
+    )
+
+
+def _prepare_result(result: dict[str, Any] | None) -> tuple[Any, list[dict[str, Any]]]:
+    if not isinstance(result, dict):
+        return result, []
+    return split_result(strip_chunk_embeddings(result))
+
+
 async def update_document_result(
     pool: asyncpg.Pool,
     document_id: str,
@@ -271,25 +414,239 @@ async def update_document_result(
     progress: int | None = None,
     error_message: str | None = None,
 ) -> None:
+    manifest, page_rows = _prepare_result(result)
     async with pool.acquire() as conn:
-        await conn.execute(
+        async with conn.transaction():
+            await _replace_result_pages_conn(conn, document_id, page_rows)
+            await conn.execute(
+                """
+                update documents
+                set metadata = $2::jsonb,
+                    result = $3::jsonb,
+                    status = $4,
+                    stage = null,
+                    progress = $5,
+                    error_message = $6,
+                    updated_at = now()
+                where id = $1
+                """,
+                document_id,
+                json.dumps(metadata),
+                json.dumps(manifest) if manifest is not None else None,
+                status,
+                progress,
+                error_message,
+            )
+
+
+async def strip_result_chunk_embeddings_batch(
+    pool: asyncpg.Pool,
+    limit: int = 100,
+) -> int:
+    """Drop chunks[].embedding from stored results in place; returns rows updated."""
+    async with pool.acquire() as conn:
+        result = await conn.execute(
             """
             update documents
-            set metadata = $2::jsonb,
-                result = $3::jsonb,
-                status = $4,
-                progress = $5,
-                error_message = $6,
-                updated_at = now()
-            where id = $1
+            set result = jsonb_set(
+                result,
+                '{chunks}',
+                coalesce(
+                    (
+                        select jsonb_agg(item - 'embedding' order by ord)
+                        from jsonb_array_elements(documents.result->'chunks') with ordinality as t(item, ord)
+                    ),
+                    '[]'::jsonb
+                )
+            )
+            where id in (
+                select id
+                from documents
+                where jsonb_typeof(result->'chunks') = 'array'
+                  and result->'chunks' @? '$[*].embedding'
+                limit $1
+            )
+            """,
+            limit,
+        )
+    try:
+        return int(str(result).split()[-1])
+    except Exception:
+        return 0
+
+
+async def quantize_chunk_embeddings_batch(
+    pool: asyncpg.Pool,
+    limit: int = 500,
+) -> int:
+    """Fill embedding_half/embedding_bits for chunks written before migration 026."""
+    async with pool.acquire() as conn:
+        result = await conn.execute(
+            """
+            update document_chunks
+            set embedding_half = embedding::halfvec(1536)
+            where id in (
+                select id
+                from document_chunks
+                where embedding is not null
+                  and (embedding_half is null or embedding_bits is null)
+                limit $1
+            )
+            """,
+            limit,
+        )
+    try:
+        return int(str(result).split()[-1])
+    except Exception:
+        return 0
+
+
+async def compact_chunk_embeddings_batch(
+    pool: asyncpg.Pool,
+    limit: int = 500,
+) -> int:
+    """Drop the float32 embedding of chunks that already have their halfvec copy."""
+    async with pool.acquire() as conn:
+        result = await conn.execute(
+            """
+            update document_chunks
+            set embedding = null
+            where id in (
+                select id
+                from document_chunks
+                where embedding is not null
+                  and embedding_half is not null
+                limit $1
+            )
+            """,
+            limit,
+        )
+    try:
+        return int(str(result).split()[-1])
+    except Exception:
+        return 0
+
+
+async def list_unpaged_result_document_ids(
+    pool: asyncpg.Pool,
+    after_id: str | None = None,
+    limit: int = 100,
+) -> list[str]:
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            """
+            select id
+            from documents
+            where result is not null
+              and jsonb_typeof(result->'pages') = 'array'
+              and (result->>'result_layout') is distinct from 'paged'
+              and ($1::uuid is null or id > $1::uuid)
+            order by id
+            limit $2
+            """,
+            after_id,
+            limit,
+        )
+    return [str(row["id"]) for row in rows]
+
+
+async def repage_document_result(
+    pool: asyncpg.Pool,
+    document_id: str,
+) -> bool:
+    """Rewrite a legacy single-blob result into the paged, slimmed layout."""
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            row = await conn.fetchrow(
+                """
+                select result
+                from documents
+                where id = $1
+                for update
+                """,
+                document_id,
+            )
+            result = _decode_json(row["result"]) if row else None
+            if not isinstance(result, dict) or result.get("result_layout") == PAGED_LAYOUT:
+                return False
+            manifest, page_rows = _prepare_result(result)
+            if not page_rows:
+                return False
+            await _replace_result_pages_conn(conn, document_id, page_rows)
+            await conn.execute(
+                """
+                update documents
+                set result = $2::jsonb
+                where id = $1
+                """,
+                document_id,
+                json.dumps(manifest),
+            )
+    return True
+
+
+def _decode_json(value: Any) -> Any:
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            return None
+    return value
+
+
+async def _fetch_result_conn(
+    conn: asyncpg.Connection,
+    document_id: str,
+    manifest: Any,
+    page_numbers: list[int] | None,
+) -> dict[str, Any] | None:
+    manifest = _decode_json(manifest)
+    if not isinstance(manifest, dict):
+        return None
+    if manifest.get("result_layout") != PAGED_LAYOUT:
+        return assemble_result(manifest, [], page_numbers)
+    rows = await conn.fetch(
+        """
+        select page_number, page, paragraphs, words
+        from document_result_pages
+        where document_id = $1
+          and ($2::int[] is null or page_number = any($2::int[]))
+        order by page_number
+        """,
+        document_id,
+        page_numbers,
+    )
+    page_rows = [
+        {
+            "page_number": row["page_number"],
+            "page": _decode_json(row["page"]),
+            "paragraphs": _decode_json(row["paragraphs"]),
+            "words": _decode_json(row["words"]),
+        }
+        for row in rows
+    ]
+    return assemble_result(manifest, page_rows, page_numbers)
+
+
+async def get_document_result(
+    pool: asyncpg.Pool,
+    document_id: str,
+    user_id: str,
+    page_numbers: list[int] | None = None,
+) -> dict[str, Any] | None:
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(
+            """
+            select result
+            from documents
+            where id = $1 and user_id = $2
             """,
             document_id,
-            json.dumps(metadata),
-            json.dumps(result) if result is not None else None,
-            status,
-            progress,
-            error_message,
+            user_id,
         )
+        if not row:
+            return None
+        return await _fetch_result_conn(conn, document_id, row["result"], page_numbers)
 
 
 async def get_document_storage_path(
@@ -326,50 +683,413 @@ async def get_document_storage_path(
             document_id,
             user_id,
         )
-    if not row:
-        return None
-    value = row.get("storage_path")
-    return str(value) if value is not None else None
+    if not row:
+        return None
+    value = row.get("storage_path")
+    return str(value) if value is not None else None
+
+
+async def get_document_bundle(
+    pool: asyncpg.Pool,
+    document_id: str,
+    user_id: str,
+    page_numbers: list[int] | None = None,
+) -> dict[str, Any] | None:
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(
+            """
+            select
+                d.storage_path,
+                d.result,
+                a.data as annotations
+            from documents as d
+            left join document_annotations as a
+              on a.document_id = d.id and a.user_id = d.user_id
+            where d.id = $1 and d.user_id = $2
+            """,
+            document_id,
+            user_id,
+        )
+        if not row:
+            return None
+        bundle = dict(row)
+        bundle["result"] = await _fetch_result_conn(conn, document_id, row["result"], page_numbers)
+    return bundle
+
+
+async def list_processing_documents(
+    pool: asyncpg.Pool,
+    user_id: str,
+) -> list[dict[str, Any]]:
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            """
+            select id, user_id, metadata, metadata->>'parser_doc_id' as parser_doc_id
+            from documents
+            where status = 'processing' and user_id = $1
+              and not exists (
+                select 1
+                from ingestion_jobs
+                where ingestion_jobs.document_id = documents.id
+                  and ingestion_jobs.status in ('queued', 'running')
+              )
+            order by created_at asc
+            """,
+            user_id,
+        )
+    return [dict(row) for row in rows]
+
+
+async def set_document_parser_doc_id(
+    pool: asyncpg.Pool,
+    document_id: str,
+    parser_doc_id: str,
+    page_estimate: int | None = None,
+    parser_endpoint: str | None = None,
+) -> None:
+    async with pool.acquire() as conn:
+        await conn.execute(
+            """
+            update documents
+            set metadata = (coalesce(metadata, '{}'::jsonb) - 'parser_endpoint') || jsonb_strip_nulls(
+                    jsonb_build_object(
+                        'parser_doc_id', $2::text,
+                        'page_estimate', $3::int,
+                        'parser_endpoint', $4::text
+                    )
+                ),
+                updated_at = now()
+            where id = $1
+            """,
+            document_id,
+            parser_doc_id,
+            page_estimate,
+            parser_endpoint,
+        )
+
+
+async def clear_document_parser_doc_id(
+    pool: asyncpg.Pool,
+    document_id: str,
+) -> None:
+    async with pool.acquire() as conn:
+        await conn.execute(
+            """
+            update documents
+            set metadata = coalesce(metadata, '{}'::jsonb) - 'parser_doc_id' - 'parser_endpoint',
+                updated_at = now()
+            where id = $1
+            """,
+            document_id,
+        )
+
+
+async def get_document_ingest_state(
+    pool: asyncpg.Pool,
+    document_id: str,
+) -> dict[str, Any] | None:
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(
+            """
+            select
+                id,
+                user_id,
+                title,
+                storage_path,
+                status,
+                metadata->>'parser_doc_id' as parser_doc_id,
+                metadata->>'parser_endpoint' as parser_endpoint,
+                (metadata->>'page_estimate')::int as page_estimate
+            from documents
+            where id = $1
+            """,
+            document_id,
+        )
+    return dict(row) if row else None
+
+
+async def enqueue_ingestion_job(
+    pool: asyncpg.Pool,
+    document_id: str,
+    user_id: str,
+    kind: str,
+    payload: dict[str, Any],
+    max_attempts: int = 3,
+) -> str:
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(
+            """
+            insert into ingestion_jobs (document_id, user_id, kind, payload, max_attempts)
+            values ($1, $2, $3, $4::jsonb, $5)
+            returning id
+            """,
+            document_id,
+            user_id,
+            kind,
+            json.dumps(payload),
+            max_attempts,
+        )
+    return str(row["id"])
+
+
+# Jobs holding a parser slot across every process: live running jobs, plus
+# queued/running jobs whose document already has a parser job (pipelined
+# uploads waiting for their resume job, retries polling an accepted job).
+_PARSER_BUSY_JOBS_SQL = """
+    select count(*) as jobs
+    from ingestion_jobs as busy
+    join documents on documents.id = busy.document_id
+    where (busy.status = 'running' and busy.locked_at >= now() - make_interval(secs => $1))
+       or (
+           busy.status in ('queued', 'running')
+           and (documents.metadata ? 'parser_doc_id' or busy.payload ? 'parser_doc_id')
+       )
+"""
+# Serializes capacity-limited claims so two workers cannot both take the last slot.
+_CLAIM_LOCK_KEY = 0x61736B_706466
+
+
+async def count_parser_busy_jobs(pool: asyncpg.Pool, lease_s: float) -> int:
+    async with pool.acquire() as conn:
+        return int(await conn.fetchval(_PARSER_BUSY_JOBS_SQL, float(lease_s)) or 0)
+
+
+async def claim_ingestion_job(
+    pool: asyncpg.Pool,
+    worker_id: str,
+    lease_s: float,
+    capacity: int | None = None,
+) -> dict[str, Any] | None:
+    """Lock the next runnable job; running jobs whose lease expired are reclaimed.
+
+    Claims are fair across users and processes: the oldest runnable job of
+    the user with the fewest live running jobs goes first, so one user's
+    batch cannot occupy every worker while others wait.
+
+    With ``capacity`` set, a job that still has to submit to the parser is
+    only claimed while fewer than ``capacity`` jobs hold a parser slot
+    (``_PARSER_BUSY_JOBS_SQL``), which keeps the parser's concurrency limit
+    across all processes. Jobs that already have a parser job are always
+    claimable, since they occupy their slot either way.
+    """
+    async with pool.acquire() as conn, conn.transaction():
+        if capacity is not None:
+            await conn.execute("select pg_advisory_xact_lock($1)", _CLAIM_LOCK_KEY)
+        row = await conn.fetchrow(
+            f"""
+            with busy as ({_PARSER_BUSY_JOBS_SQL})
+            update ingestion_jobs
+            set status = 'running',
+                attempts = attempts + 1,
+                locked_at = now(),
+                locked_by = $2,
+                updated_at = now()
+            where id = (
+                select candidate.id
+                from ingestion_jobs as candidate
+                join documents on documents.id = candidate.document_id
+                cross join busy
+                where (
+                    (candidate.status = 'queued' and candidate.run_after <= now())
+                    or (
+                        candidate.status = 'running'
+                        and candidate.locked_at < now() - make_interval(secs => $1)
+                        and candidate.attempts < candidate.max_attempts
+                    )
+                )
+                and (
+                    $3::int is null
+                    or busy.jobs < $3::int
+                    or documents.metadata ? 'parser_doc_id'
+                    or candidate.payload ? 'parser_doc_id'
+                )
+                order by (
+                    select count(*)
+                    from ingestion_jobs as running
+                    where running.user_id = candidate.user_id
+                      and running.status = 'running'
+                      and running.locked_at >= now() - make_interval(secs => $1)
+                ),
+                candidate.run_after
+                limit 1
+                for update of candidate skip locked
+            )
+            returning id, document_id, user_id, kind, payload, attempts, max_attempts
+            """,
+            float(lease_s),
+            worker_id,
+            capacity,
+        )
+    return _ingestion_job_row(row) if row else None
+
+
+async def fail_expired_ingestion_jobs(
+    pool: asyncpg.Pool,
+    lease_s: float,
+    error_message: str,
+) -> list[dict[str, Any]]:
+    """Fail running jobs whose lease expired on their last attempt.
+
+    Such a job never reached the error handler (its worker died with it, e.g.
+    an OOM on a huge PDF), so reclaiming it would only crash the next worker.
+    """
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            """
+            update ingestion_jobs
+            set status = 'failed',
+                locked_at = null,
+                locked_by = null,
+                last_error = $2,
+                updated_at = now()
+            where id in (
+                select id
+                from ingestion_jobs
+                where status = 'running'
+                  and locked_at < now() - make_interval(secs => $1)
+                  and attempts >= max_attempts
+                for update skip locked
+            )
+            returning id, document_id, user_id, kind, payload, attempts, max_attempts
+            """,
+            float(lease_s),
+            error_message,
+        )
+    return [_ingestion_job_row(row) for row in rows]
+
+
+def _ingestion_job_row(row: asyncpg.Record) -> dict[str, Any]:
+    job = dict(row)
+    payload = job.get("payload")
+    if isinstance(payload, str):
+        try:
+            payload = json.loads(payload)
+        except json.JSONDecodeError:
+            payload = {}
+    job["payload"] = payload if isinstance(payload, dict) else {}
+    job["id"] = str(job["id"])
+    job["document_id"] = str(job["document_id"])
+    job["user_id"] = str(job["user_id"])
+    return job
+
+
+async def touch_ingestion_job(
+    pool: asyncpg.Pool,
+    job_id: str,
+    worker_id: str,
+) -> None:
+    async with pool.acquire() as conn:
+        await conn.execute(
+            """
+            update ingestion_jobs
+            set locked_at = now()
+            where id = $1 and locked_by = $2 and status = 'running'
+            """,
+            job_id,
+            worker_id,
+        )
+
+
+# The updates below are fenced on the claiming worker: once a stalled worker's
+# lease has been reclaimed, its late writes match no row instead of
+# overwriting the new owner's state. Each returns whether the write applied.
+
+
+async def complete_ingestion_job(
+    pool: asyncpg.Pool,
+    job_id: str,
+    worker_id: str,
+) -> bool:
+    async with pool.acquire() as conn:
+        result = await conn.execute(
+            """
+            update ingestion_jobs
+            set status = 'succeeded',
+                locked_at = null,
+                locked_by = null,
+                last_error = null,
+                updated_at = now()
+            where id = $1 and locked_by = $2 and status = 'running'
+            """,
+            job_id,
+            worker_id,
+        )
+    return int(str(result).split()[-1]) > 0
+
+
+async def retry_ingestion_job(
+    pool: asyncpg.Pool,
+    job_id: str,
+    worker_id: str,
+    delay_s: float,
+    error_message: str | None = None,
+) -> bool:
+    async with pool.acquire() as conn:
+        result = await conn.execute(
+            """
+            update ingestion_jobs
+            set status = 'queued',
+                run_after = now() + make_interval(secs => $3),
+                locked_at = null,
+                locked_by = null,
+                last_error = $4,
+                updated_at = now()
+            where id = $1 and locked_by = $2 and status = 'running'
+            """,
+            job_id,
+            worker_id,
+            float(delay_s),
+            error_message,
+        )
+    return int(str(result).split()[-1]) > 0
 
 
-async def get_document_bundle(
+async def release_ingestion_job(
     pool: asyncpg.Pool,
-    document_id: str,
-    user_id: str,
-) -> dict[str, Any] | None:
+    job_id: str,
+    worker_id: str,
+) -> bool:
+    """Hand an interrupted job back to the queue without spending an attempt."""
     async with pool.acquire() as conn:
-        row = await conn.fetchrow(
+        result = await conn.execute(
             """
-            select
-                d.storage_path,
-                d.result,
-                a.data as annotations
-            from documents as d
-            left join document_annotations as a
-              on a.document_id = d.id and a.user_id = d.user_id
-            where d.id = $1 and d.user_id = $2
+            update ingestion_jobs
+            set status = 'queued',
+                attempts = greatest(attempts - 1, 0),
+                run_after = now(),
+                locked_at = null,
+                locked_by = null,
+                updated_at = now()
+            where id = $1 and locked_by = $2 and status = 'running'
             """,
-            document_id,
-            user_id,
+            job_id,
+            worker_id,
         )
-    return dict(row) if row else None
+    return int(str(result).split()[-1]) > 0
 
 
-async def list_processing_documents(
+async def fail_ingestion_job(
     pool: asyncpg.Pool,
-    user_id: str,
-) -> list[dict[str, Any]]:
+    job_id: str,
+    worker_id: str,
+    error_message: str | None = None,
+) -> bool:
     async with pool.acquire() as conn:
-        rows = await conn.fetch(
+        result = await conn.execute(
             """
-            select id, user_id, metadata, metadata->>'parser_doc_id' as parser_doc_id
-            from documents
-            where status = 'processing' and user_id = $1
-            order by created_at asc
+            update ingestion_jobs
+            set status = 'failed',
+                locked_at = null,
+                locked_by = null,
+                last_error = $3,
+                updated_at = now()
+            where id = $1 and locked_by = $2 and status = 'running'
             """,
-            user_id,
+            job_id,
+            worker_id,
+            error_message,
         )
-    return [dict(row) for row in rows]
+    return int(str(result).split()[-1]) > 0
 
 
 async def document_exists(
@@ -479,63 +1199,320 @@ async def delete_document(
     return dict(row) if row else None
 
 
-async def insert_chunks(
+async def delete_document_chunks(
+    pool: asyncpg.Pool,
+    document_id: str,
+) -> None:
+    async with pool.acquire() as conn:
+        await conn.execute(
+            """
+            delete from document_chunks
+            where document_id = $1
+            """,
+            document_id,
+        )
+
+
+async def has_ready_document_with_hash(
+    pool: asyncpg.Pool,
+    content_sha256: str,
+    exclude_document_id: str,
+) -> bool:
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(
+            """
+            select 1
+            from documents
+            where content_sha256 = $1
+              and status = 'ready'
+              and result is not null
+              and id <> $2
+            limit 1
+            """,
+            content_sha256,
+            exclude_document_id,
+        )
+    return bool(row)
+
+
+async def clone_document_from_hash(
     pool: asyncpg.Pool,
     document_id: str,
     user_id: str,
-    chunks: list[dict[str, Any]],
-) -> int:
-    if not chunks:
-        return 0
+    content_sha256: str,
+) -> dict[str, Any] | None:
+    """Copy result and chunks from a ready document with the same content hash.
 
-    records: list[tuple[Any, ...]] = []
-    for chunk in chunks:
-        embedding = chunk.get("embedding")
-        metadata = chunk.get("metadata", {})
-        content = chunk.get("content") or chunk.get("text", "")
-        if embedding is None:
-            continue
-        records.append(
-            (
+    Returns the source id and page count, or None when nothing can be reused.
+    """
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            source = await conn.fetchrow(
+                """
+                select
+                    id,
+                    coalesce(jsonb_array_length(result->'pages'), 0) as pages
+                from documents
+                where content_sha256 = $1
+                  and status = 'ready'
+                  and result is not null
+                  and id <> $2
+                order by updated_at desc
+                limit 1
+                """,
+                content_sha256,
+                document_id,
+            )
+            if not source:
+                return None
+            await conn.execute(
+                """
+                delete from document_chunks
+                where document_id = $1
+                """,
+                document_id,
+            )
+            await conn.execute(
+                """
+                insert into document_chunks (document_id, user_id, content, embedding, embedding_half, metadata)
+                select $1, $2, content, embedding, embedding_half, metadata
+                from document_chunks
+                where document_id = $3
+                """,
                 document_id,
                 user_id,
-                content,
-                _vector_literal(embedding),
-                json.dumps(metadata),
+                source["id"],
             )
-        )
+            await conn.execute(
+                """
+                delete from document_result_pages
+                where document_id = $1
+                """,
+                document_id,
+            )
+            await conn.execute(
+                """
+                insert into document_result_pages (document_id, page_number, page, paragraphs, words)
+                select $1, page_number, page, paragraphs, words
+                from document_result_pages
+                where document_id = $2
+                """,
+                document_id,
+                source["id"],
+            )
+            await conn.execute(
+                """
+                update documents as d
+                set result = s.result,
+                    metadata = coalesce(s.metadata, '{}'::jsonb)
+                        || jsonb_build_object('dedup_source_document_id', s.id::text),
+                    status = 'ready',
+                    progress = null,
+                    error_message = null,
+                    updated_at = now()
+                from documents as s
+                where d.id = $1 and s.id = $2
+                """,
+                document_id,
+                source["id"],
+            )
+    return {"source_document_id": str(source["id"]), "pages": int(source["pages"] or 0)}
+
+
+def _chunk_record(document_id: str, user_id: str, chunk: Any) -> tuple[Any, ...] | None:
+    if not isinstance(chunk, dict):
+        return None
+    embedding = chunk.get("embedding")
+    if embedding is None:
+        return None
+    return (
+        document_id,
+        user_id,
+        chunk.get("content") or chunk.get("text", ""),
+        decode_embedding(embedding),
+        json.dumps(chunk.get("metadata", {})),
+    )
+
+
+async def _insert_chunk_records_conn(
+    conn: asyncpg.Connection,
+    records: list[tuple[Any, ...]],
+    use_copy: bool = True,
+) -> bool:
+    """Insert chunk rows; returns whether COPY is usable for later batches."""
+    if use_copy:
+        try:
+            # Binary COPY: one round trip, vectors go through the registered pgvector codec.
+            # The savepoint keeps an enclosing transaction usable if COPY is refused.
+            async with conn.transaction():
+                await conn.copy_records_to_table(
+                    "document_chunks",
+                    records=records,
+                    columns=["document_id", "user_id", "content", "embedding", "metadata"],
+                )
+            return True
+        except asyncpg.FeatureNotSupportedError:
+            # COPY is refused when row-level security applies to the connecting role.
+            pass
+    await conn.executemany(
+        """
+        insert into document_chunks (document_id, user_id, content, embedding, metadata)
+        values ($1, $2, $3, $4::vector, $5::jsonb)
+        """,
+        records,
+    )
+    return False
 
+
+async def insert_chunks(
+    pool: asyncpg.Pool,
+    document_id: str,
+    user_id: str,
+    chunks: list[dict[str, Any]],
+) -> int:
+    records = [
+        record
+        for record in (_chunk_record(document_id, user_id, chunk) for chunk in chunks)
+        if record is not None
+    ]
     if not records:
         return 0
 
     async with pool.acquire() as conn:
-        await conn.executemany(
-            """
-            insert into document_chunks (document_id, user_id, content, embedding, metadata)
-            values ($1, $2, $3, $4::vector, $5::jsonb)
-            """,
-            records,
-        )
+        await _insert_chunk_records_conn(conn, records)
     return len(records)
 
 
+async def store_document_result_stream(
+    pool: asyncpg.Pool,
+    document_id: str,
+    user_id: str,
+    batches: AsyncIterator[list[tuple[str, Any]]],
+    build_metadata: Callable[[dict[str, Any]], dict[str, Any]],
+    status: str = "ready",
+    progress: int | None = None,
+    chunk_batch_size: int = 200,
+) -> tuple[dict[str, Any], int]:
+    """Store a result decoded by ``result_stream`` as it arrives.
+
+    Chunks are inserted in batches and page rows written as their pages are
+    decoded, replacing the document's previous chunks and result in one
+    transaction. ``build_metadata`` receives the manifest once the stream
+    ends. Returns ``(manifest, inserted_chunks)``.
+    """
+    builder = PagedResultBuilder()
+    records: list[tuple[Any, ...]] = []
+    inserted = 0
+    use_copy = True
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            await conn.execute(
+                """
+                delete from document_chunks
+                where document_id = $1
+                """,
+                document_id,
+            )
+            await _replace_result_pages_conn(conn, document_id, [])
+
+            async def flush_items(flushes: list[tuple[str, int, list[Any]]]) -> None:
+                # key is "paragraphs" or "words", both columns of document_result_pages.
+                for key, page_number, items in flushes:
+                    await conn.execute(
+                        f"""
+                        update document_result_pages
+                        set {key} = {key} || $3::jsonb
+                        where document_id = $1
+                          and page_number = $2
+                        """,
+                        document_id,
+                        page_number,
+                        json.dumps(items),
+                    )
+
+            async for batch in batches:
+                page_rows: list[dict[str, Any]] = []
+                flushes: list[tuple[str, int, list[Any]]] = []
+                for kind, value in batch:
+                    if kind == "chunk":
+                        record = _chunk_record(document_id, user_id, value)
+                        if record is not None:
+                            records.append(record)
+                        builder.add_chunk(value)
+                    elif kind == "page":
+                        row = builder.add_page(value)
+                        if row is not None:
+                            page_rows.append(row)
+                    elif kind in ("paragraph", "word"):
+                        flushes.extend(builder.add_item(f"{kind}s", value))
+                    else:
+                        builder.add_field(*value)
+                if page_rows:
+                    await _insert_result_pages_conn(conn, document_id, page_rows)
+                await flush_items(flushes)
+                if len(records) >= chunk_batch_size:
+                    use_copy = await _insert_chunk_records_conn(conn, records, use_copy)
+                    inserted += len(records)
+                    records = []
+            if records:
+                await _insert_chunk_records_conn(conn, records, use_copy)
+                inserted += len(records)
+
+            manifest, flushes = builder.finish()
+            await flush_items(flushes)
+            await conn.execute(
+                """
+                update documents
+                set metadata = $2::jsonb,
+                    result = $3::jsonb,
+                    status = $4,
+                    stage = null,
+                    progress = $5,
+                    error_message = null,
+                    updated_at = now()
+                where id = $1
+                """,
+                document_id,
+                json.dumps(build_metadata(manifest)),
+                json.dumps(manifest),
+                status,
+                progress,
+            )
+    return manifest, inserted
+
+
+async def _set_ef_search_conn(
+    conn: asyncpg.Connection,
+    ef_search: int | None,
+    match_count: int,
+) -> None:
+    # Transaction-local, so it is safe behind a transaction-mode pooler; HNSW
+    # returns at most ef_search rows, so it never goes below match_count.
+    if not ef_search:
+        return
+    await conn.execute(
+        "select set_config('hnsw.ef_search', $1, true)",
+        str(max(int(ef_search), int(match_count))),
+    )
+
+
 async def match_documents(
     pool: asyncpg.Pool,
     query_embedding: list[float],
     match_count: int = 5,
     document_id: str | None = None,
+    ef_search: int | None = None,
+    rerank_candidates: int | None = None,
 ) -> list[dict[str, Any]]:
-    vector_literal = _vector_literal(query_embedding)
     async with pool.acquire() as conn:
-        rows = await conn.fetch(
-            """
-            select * from match_documents($1::vector, $2, $3::uuid)
-            """,
-            vector_literal,
-            match_count,
-            document_id,
+        return await match_documents_conn(
+            conn,
+            query_embedding,
+            match_count=match_count,
+            document_id=document_id,
+            ef_search=ef_search,
+            rerank_candidates=rerank_candidates,
         )
-    return [dict(row) for row in rows]
 
 
 async def match_documents_conn(
@@ -543,16 +1520,21 @@ async def match_documents_conn(
     query_embedding: list[float],
     match_count: int = 5,
     document_id: str | None = None,
+    ef_search: int | None = None,
+    rerank_candidates: int | None = None,
 ) -> list[dict[str, Any]]:
-    vector_literal = _vector_literal(query_embedding)
-    rows = await conn.fetch(
-        """
-        select * from match_documents($1::vector, $2, $3::uuid)
-        """,
-        vector_literal,
-        match_count,
-        document_id,
-    )
+    # rerank_candidates > 0: Hamming prefilter on embedding_bits, exact re-rank (migration 026).
+    async with conn.transaction():
+        await _set_ef_search_conn(conn, ef_search, match_count)
+        rows = await conn.fetch(
+            """
+            select * from match_documents($1::vector, $2, $3::uuid, coalesce($4::int, 0))
+            """,
+            query_embedding,
+            match_count,
+            document_id,
+            rerank_candidates,
+        )
     return [dict(row) for row in rows]
 
 
@@ -561,28 +1543,26 @@ async def match_user_documents(
     user_id: str,
     query_embedding: list[float],
     match_count: int = 5,
+    ef_search: int | None = None,
+    exact_max_chunks: int | None = None,
+    rerank_candidates: int | None = None,
 ) -> list[dict[str, Any]]:
-    vector_literal = _vector_literal(query_embedding)
+    """Nearest chunks across one user's documents, with ``document_title``."""
     async with pool.acquire() as conn:
-        rows = await conn.fetch(
-            """
-            select
-                document_chunks.id,
-                document_chunks.document_id,
-                document_chunks.content,
-                document_chunks.metadata,
-                documents.title as document_title,
-                1 - (document_chunks.embedding <=> $2::vector) as similarity
-            from document_chunks
-            join documents on documents.id = document_chunks.document_id
-            where document_chunks.user_id = $1
-            order by document_chunks.embedding <=> $2::vector
-            limit $3
-            """,
-            user_id,
-            vector_literal,
-            match_count,
-        )
+        async with conn.transaction():
+            await _set_ef_search_conn(conn, ef_search, match_count)
+            rows = await conn.fetch(
+                """
+                select * from match_user_documents(
+                    $1::vector, $2::uuid, $3, coalesce($4::int, 20000), coalesce($5::int, 0)
+                )
+                """,
+                query_embedding,
+                user_id,
+                match_count,
+                exact_max_chunks,
+                rerank_candidates,
+            )
     return [dict(row) for row in rows]
 
 
@@ -1739,7 +2719,7 @@ async def list_document_chunks_with_embeddings(
                 document_chunks.document_id,
                 document_chunks.content,
                 document_chunks.metadata,
-                document_chunks.embedding::text as embedding
+                coalesce(document_chunks.embedding, document_chunks.embedding_half::vector) as embedding
             from document_chunks
             join documents on documents.id = document_chunks.document_id
             where document_chunks.document_id = $1
@@ -1752,6 +2732,62 @@ async def list_document_chunks_with_embeddings(
     return [dict(row) for row in rows]
 
 
+async def get_document_chunk_digest(
+    pool: asyncpg.Pool,
+    document_id: str,
+    user_id: str,
+) -> dict[str, Any] | None:
+    """Chunk count and a digest of the chunks; None if the document is not the user's.
+
+    Re-indexing replaces chunks with new ids, and the only in-place change is
+    the embedding storage (quantize/compact in migration 026), which changes
+    the exported values. So the digest covers the chunk ids plus how many rows
+    hold a float32 and a halfvec embedding, without reading the vectors.
+    """
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(
+            """
+            select
+                count(document_chunks.id) as chunk_count,
+                md5(
+                    coalesce(string_agg(document_chunks.id::text, ',' order by document_chunks.id), '')
+                    || ':' || count(document_chunks.embedding)
+                    || ':' || count(document_chunks.embedding_half)
+                ) as chunk_digest
+            from documents
+            left join document_chunks on document_chunks.document_id = documents.id
+            where documents.id = $1
+              and documents.user_id = $2
+            group by documents.id
+            """,
+            document_id,
+            user_id,
+        )
+    return dict(row) if row else None
+
+
+async def list_document_chunk_vectors_conn(
+    conn: asyncpg.Connection,
+    document_id: str,
+) -> list[dict[str, Any]]:
+    """Chunk rows in ``match_documents`` shape plus the decoded embedding."""
+    rows = await conn.fetch(
+        """
+        select
+            id,
+            document_id,
+            content,
+            metadata,
+            coalesce(embedding, embedding_half::vector) as embedding
+        from document_chunks
+        where document_id = $1
+          and (embedding is not null or embedding_half is not null)
+        """,
+        document_id,
+    )
+    return [dict(row) for row in rows]
+
+
 async def get_document_chunk_content(
     pool: asyncpg.Pool,
     chunk_id: str,
@@ -2794,3 +3830,64 @@ async def create_user_message(
             admin_id,
         )
     return dict(row) if row else {}
+
+
+async def get_query_embedding(
+    pool: asyncpg.Pool,
+    cache_key: str,
+    max_age_s: float,
+) -> list[float] | None:
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(
+            """
+            update query_embedding_cache
+            set last_used_at = now()
+            where cache_key = $1
+              and created_at > now() - make_interval(secs => $2)
+            returning embedding
+            """,
+            cache_key,
+            float(max_age_s),
+        )
+    return list(row["embedding"]) if row else None
+
+
+async def upsert_query_embedding(
+    pool: asyncpg.Pool,
+    cache_key: str,
+    model: str,
+    embedding: list[float],
+) -> None:
+    async with pool.acquire() as conn:
+        await conn.execute(
+            """
+            insert into query_embedding_cache (cache_key, model, embedding)
+            values ($1, $2, $3::real[])
+            on conflict (cache_key) do update
+            set model = excluded.model,
+                embedding = excluded.embedding,
+                created_at = now(),
+                last_used_at = now()
+            """,
+            cache_key,
+            model,
+            embedding_as_list(embedding),
+        )
+
+
+async def prune_query_embeddings(
+    pool: asyncpg.Pool,
+    max_age_s: float,
+) -> int:
+    async with pool.acquire() as conn:
+        result = await conn.execute(
+            """
+            delete from query_embedding_cache
+            where last_used_at < now() - make_interval(secs => $1)
+            """,
+            float(max_age_s),
+        )
+    try:
+        return int(str(result).split()[-1])
+    except Exception:
+        return 0
@@ -0,0 +1,264 @@
+"""Split normalized parser results into per-page rows and put them back together.
+
+``documents.result`` keeps a small manifest (document-level fields plus page
+sizes); the heavy per-page parts live in ``document_result_pages`` so readers
+can fetch only the pages they need.
+"""
+from __future__ import annotations
+
+import re
+from typing import Any
+
+PAGED_LAYOUT = "paged"
+# Top-level lists whose items carry boundingRegions and are stored with their page.
+_PAGED_KEYS = ("paragraphs", "words")
+_PAGE_SELECTION_PATTERN = re.compile(r"^\s*(\d+)\s*(?:-\s*(\d+))?\s*$")
+
+
+def _page_number(page: dict[str, Any]) -> int | None:
+    value = page.get("pageNumber") or page.get("page_number")
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _item_page_number(item: Any) -> int | None:
+    if not isinstance(item, dict):
+        return None
+    regions = item.get("boundingRegions") or item.get("bounding_regions") or []
+    for region in regions:
+        if isinstance(region, dict):
+            number = _page_number(region)
+            if number is not None:
+                return number
+    return None
+
+
+def _page_summary(page: dict[str, Any]) -> dict[str, Any]:
+    return {key: value for key, value in page.items() if not isinstance(value, (list, dict))}
+
+
+def strip_chunk_embeddings(result: dict[str, Any]) -> dict[str, Any]:
+    """Drop ``chunks[].embedding``; the vectors already live in ``document_chunks``."""
+    chunks = result.get("chunks")
+    if not isinstance(chunks, list):
+        return result
+    slim = dict(result)
+    slim["chunks"] = [
+        {key: value for key, value in chunk.items() if key != "embedding"}
+        if isinstance(chunk, dict)
+        else chunk
+        for chunk in chunks
+    ]
+    return slim
+
+
+def split_result(result: dict[str, Any]) -> tuple[dict[str, Any], list[dict[str, Any]]]:
+    """Return ``(manifest, page_rows)``; each row has page_number/page/paragraphs/words."""
+    pages = result.get("pages")
+    if not isinstance(pages, list) or not pages:
+        return result, []
+
+    rows: dict[int, dict[str, Any]] = {}
+    summaries: list[dict[str, Any]] = []
+    unpaged_pages: list[Any] = []
+    for page in pages:
+        number = _page_number(page) if isinstance(page, dict) else None
+        if number is None or number in rows:
+            unpaged_pages.append(page)
+            continue
+        rows[number] = {"page_number": number, "page": page, "paragraphs": [], "words": []}
+        summaries.append(_page_summary(page))
+
+    if not rows:
+        return result, []
+
+    manifest = {key: value for key, value in result.items() if key != "pages"}
+    manifest["pages"] = summaries + unpaged_pages
+    manifest["result_layout"] = PAGED_LAYOUT
+    for key in _PAGED_KEYS:
+        items = result.get(key)
+        if not isinstance(items, list):
+            continue
+        leftovers: list[Any] = []
+        for item in items:
+            row = rows.get(_item_page_number(item))
+            if row is None:
+                leftovers.append(item)
+            else:
+                row[key].append(item)
+        manifest[key] = leftovers
+    return manifest, list(rows.values())
+
+
+class PagedResultBuilder:
+    """Incremental ``split_result`` for results decoded one item at a time.
+
+    ``add_page`` returns the page row to store right away; paragraph and word
+    items are buffered per page and handed back by ``add_item`` as
+    ``(key, page_number, items)`` flushes once their page changes, so only one
+    page's items are held when the parser emits them in page order.
+    ``finish`` returns the manifest (same shape as ``split_result``) and the
+    remaining flushes.
+    """
+
+    def __init__(self) -> None:
+        self._fields: dict[str, Any] = {}
+        self._summaries: list[dict[str, Any]] = []
+        self._unpaged_pages: list[Any] = []
+        self._page_numbers: set[int] = set()
+        self._chunks: list[Any] = []
+        self._seen: set[str] = set()
+        self._current: dict[str, tuple[int, list[Any]]] = {}
+        self._deferred: dict[str, dict[int, list[Any]]] = {}
+        self._leftovers: dict[str, list[Any]] = {key: [] for key in _PAGED_KEYS}
+
+    @property
+    def page_count(self) -> int:
+        return len(self._summaries) + len(self._unpaged_pages)
+
+    def add_field(self, key: str, value: Any) -> None:
+        if value == [] and (key in ("pages", "chunks") or key in _PAGED_KEYS):
+            self._seen.add(key)
+            return
+        self._fields[key] = value
+
+    def add_chunk(self, chunk: Any) -> None:
+        self._seen.add("chunks")
+        if isinstance(chunk, dict):
+            chunk = {key: value for key, value in chunk.items() if key != "embedding"}
+        self._chunks.append(chunk)
+
+    def add_page(self, page: Any) -> dict[str, Any] | None:
+        self._seen.add("pages")
+        number = _page_number(page) if isinstance(page, dict) else None
+        if number is None or number in self._page_numbers:
+            self._unpaged_pages.append(page)
+            return None
+        self._page_numbers.add(number)
+        self._summaries.append(_page_summary(page))
+        return {"page_number": number, "page": page, "paragraphs": [], "words": []}
+
+    def add_item(self, key: str, item: Any) -> list[tuple[str, int, list[Any]]]:
+        self._seen.add(key)
+        number = _item_page_number(item)
+        if number is None:
+            self._leftovers[key].append(item)
+            return []
+        current = self._current.get(key)
+        if current is not None and current[0] == number:
+            current[1].append(item)
+            return []
+        self._current[key] = (number, [item])
+        return self._release(key, current)
+
+    def finish(self) -> tuple[Any, list[tuple[str, int, list[Any]]]]:
+        flushes: list[tuple[str, int, list[Any]]] = []
+        for key in list(self._current):
+            flushes.extend(self._release(key, self._current.pop(key)))
+        paged = bool(self._page_numbers)
+        for key, by_page in self._deferred.items():
+            for number, items in by_page.items():
+                if paged and number in self._page_numbers:
+                    flushes.append((key, number, items))
+                else:
+                    self._leftovers[key].extend(items)
+        self._deferred = {}
+
+        manifest = dict(self._fields)
+        if "pages" in self._seen:
+            manifest["pages"] = self._summaries + self._unpaged_pages
+        if "chunks" in self._seen:
+            manifest["chunks"] = self._chunks
+        for key in _PAGED_KEYS:
+            if key in self._seen:
+                manifest[key] = self._leftovers[key]
+        if paged:
+            manifest["result_layout"] = PAGED_LAYOUT
+        return manifest, flushes
+
+    def _release(
+        self,
+        key: str,
+        current: tuple[int, list[Any]] | None,
+    ) -> list[tuple[str, int, list[Any]]]:
+        if current is None:
+            return []
+        number, items = current
+        if number in self._page_numbers:
+            return [(key, number, items)]
+        # Page not seen yet (items before pages, or no such page): decide at finish.
+        self._deferred.setdefault(key, {}).setdefault(number, []).extend(items)
+        return []
+
+
+def assemble_result(
+    manifest: dict[str, Any],
+    page_rows: list[dict[str, Any]],
+    page_numbers: list[int] | None = None,
+) -> dict[str, Any]:
+    """Rebuild a result in the original shape, optionally limited to ``page_numbers``."""
+    wanted = set(page_numbers) if page_numbers else None
+    if manifest.get("result_layout") != PAGED_LAYOUT:
+        if wanted is None:
+            return manifest
+        return _filter_legacy_result(manifest, wanted)
+
+    result = {key: value for key, value in manifest.items() if key != "result_layout"}
+    rows = sorted(page_rows, key=lambda row: int(row["page_number"]))
+    by_number = {int(row["page_number"]): row for row in rows}
+    pages: list[Any] = []
+    for summary in manifest.get("pages") or []:
+        number = _page_number(summary) if isinstance(summary, dict) else None
+        if wanted is not None and number not in wanted:
+            continue
+        row = by_number.get(number) if number is not None else None
+        pages.append(row["page"] if row is not None else summary)
+    result["pages"] = pages
+    for key in _PAGED_KEYS:
+        if key not in manifest:
+            continue
+        items: list[Any] = []
+        for row in rows:
+            items.extend(row.get(key) or [])
+        if wanted is None:
+            items.extend(manifest.get(key) or [])
+        result[key] = items
+    if wanted is not None:
+        result["page_count"] = len(manifest.get("pages") or [])
+    return result
+
+
+def _filter_legacy_result(result: dict[str, Any], wanted: set[int]) -> dict[str, Any]:
+    filtered = dict(result)
+    pages = result.get("pages")
+    if isinstance(pages, list):
+        filtered["pages"] = [
+            page for page in pages if isinstance(page, dict) and _page_number(page) in wanted
+        ]
+        filtered["page_count"] = len(pages)
+    for key in _PAGED_KEYS:
+        items = result.get(key)
+        if isinstance(items, list):
+            filtered[key] = [item for item in items if _item_page_number(item) in wanted]
+    return filtered
+
+
+def parse_page_selection(value: str | None, max_pages: int = 2000) -> list[int] | None:
+    """Parse ``"1-3,7"`` into page numbers; None means all pages."""
+    if value is None or not value.strip():
+        return None
+    numbers: set[int] = set()
+    for part in value.split(","):
+        match = _PAGE_SELECTION_PATTERN.match(part)
+        if not match:
+            raise ValueError(f"Invalid page selection: {part!r}")
+        start = int(match.group(1))
+        end = int(match.group(2) or start)
+        if start < 1 or end < start:
+            raise ValueError(f"Invalid page selection: {part!r}")
+        numbers.update(range(start, min(end, start + max_pages) + 1))
+        if len(numbers) > max_pages:
+            raise ValueError("Too many pages selected")
+    return sorted(numbers)
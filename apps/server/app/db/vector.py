@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import base64
+import struct
+import sys
+from array import array
+from typing import Any
+
+import asyncpg
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# pgvector binary wire format: uint16 dimensions, uint16 reserved, then big-endian float4 values.
+_HEADER = struct.Struct(">HH")
+_LITTLE_ENDIAN = sys.byteorder == "little"
+
+
+def float32_from_bytes(data: bytes | bytearray | memoryview) -> array:
+    """Little-endian float32 bytes (the base64 embedding transport) as ``array('f')``."""
+    values = array("f")
+    values.frombytes(data)
+    if not _LITTLE_ENDIAN:
+        values.byteswap()
+    return values
+
+
+def decode_embedding(value: Any) -> Any:
+    """Accept either embedding transport: JSON floats pass through, base64 float32 is unpacked."""
+    if isinstance(value, str):
+        return float32_from_bytes(base64.b64decode(value))
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return float32_from_bytes(value)
+    return value
+
+
+def is_embedding(value: Any) -> bool:
+    if np is not None and isinstance(value, np.ndarray):
+        return value.ndim == 1 and value.size > 0
+    return isinstance(value, (list, array)) and len(value) > 0
+
+
+def embedding_as_list(value: Any) -> list[float]:
+    if isinstance(value, array) or (np is not None and isinstance(value, np.ndarray)):
+        return value.tolist()
+    return list(value)
+
+
+def vector_as_numpy(value: Any) -> Any:
+    """A decoded vector as a float32 ndarray; zero-copy for ``array('f')``."""
+    if np is None:
+        raise RuntimeError("vector_as_numpy requires numpy; install it or use embedding_as_list")
+    if isinstance(value, array) and value.typecode == "f":
+        return np.frombuffer(value, dtype=np.float32)
+    return np.asarray(value, dtype=np.float32)
+
+
+def encode_vector(value: Any) -> bytes:
+    if np is not None and isinstance(value, np.ndarray):
+        values = np.ascontiguousarray(value, dtype=">f4")
+        return _HEADER.pack(values.shape[0], 0) + values.tobytes()
+    if isinstance(value, array) and value.typecode == "f":
+        # Already float32: copy the buffer and fix the byte order, no per-element work.
+        values = array("f")
+        values.frombytes(value.tobytes())
+    else:
+        values = array("f", value)
+    if _LITTLE_ENDIAN:
+        values.byteswap()
+    return _HEADER.pack(len(values), 0) + values.tobytes()
+
+
+def decode_vector(data: bytes) -> array:
+    dim, _ = _HEADER.unpack_from(data)
+    values = array("f")
+    values.frombytes(memoryview(data)[_HEADER.size : _HEADER.size + 4 * dim])
+    if _LITTLE_ENDIAN:
+        values.byteswap()
+    return values
+
+
+async def register_vector_codec(conn: asyncpg.Connection) -> None:
+    schema = await conn.fetchval(
+        """
+        select n.nspname
+        from pg_type t
+        join pg_namespace n on n.oid = t.typnamespace
+        where t.typname = 'vector'
+        limit 1
+        """
+    )
+    if schema is None:
+        return
+    await conn.set_type_codec(
+        "vector",
+        schema=schema,
+        encoder=encode_vector,
+        decoder=decode_vector,
+        format="binary",
+    )
@@ -1,13 +1,23 @@
-from fastapi import FastAPI
+import anyio
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 import httpx
 
-from app.api import account, admin, billing, documents, messages, plans, search, usage
+from app.api import account, admin, billing, documents, messages, parser, plans, search, usage
 from app.config import get_settings
+from app.db import repository
 from app.db.pool import close_pool, create_pool
+from app.services.embedding_cache import EmbeddingCache
 from app.services.indexer import Indexer
+from app.services.ingestion_queue import IngestionQueue, create_ingestion_queue
 from app.services.parser_client import ParserClient
+from app.services.parser_transport import ParserUnavailable
+from app.services.parser_scheduler import ParserScheduler
+from app.services.progress import ProgressBroker
+from app.services.spool import sweep_spool_dir
 from app.services.storage import create_storage_client
+from app.services.vector_cache import DocumentVectorCache
 
 
 def create_app() -> FastAPI:
@@ -46,23 +56,89 @@ def create_app() -> FastAPI:
             base_url=settings.parser_api_base_url,
             api_key=settings.parser_api_key,
             api_prefix=settings.parser_api_prefix,
+            embed_batch_window_s=settings.embed_batch_window_ms / 1000.0,
+            embed_batch_max=settings.embed_batch_max,
+            ws_pool_size=settings.parser_ws_pool_size,
+            ws_pool_max_idle_s=settings.parser_ws_pool_max_idle_s,
+            http2=settings.parser_http2,
+            max_connections=settings.parser_max_connections,
+            max_retries=settings.parser_max_retries,
+            breaker_threshold=settings.parser_breaker_threshold,
+            breaker_reset_s=settings.parser_breaker_reset_s,
+            embed_hedge_delay_s=settings.embed_hedge_delay_ms / 1000.0,
+            embedding_format=settings.parser_embedding_format,
         )
         app.state.db_pool = await create_pool(settings.database_url)
+        app.state.embedding_cache = EmbeddingCache(
+            app.state.parser_client,
+            pool=app.state.db_pool,
+            max_entries=settings.embedding_cache_size,
+            ttl_s=settings.embedding_cache_ttl_s,
+            persist=settings.embedding_cache_persist,
+        )
+        app.state.vector_cache = DocumentVectorCache(
+            app.state.db_pool,
+            max_bytes=int(settings.vector_cache_max_mb * 1024 * 1024),
+        )
+        if settings.embedding_cache_persist:
+            try:
+                await repository.prune_query_embeddings(app.state.db_pool, settings.embedding_cache_ttl_s)
+            except Exception:
+                pass
         storage_client = create_storage_client(
             settings.supabase_url,
             settings.supabase_service_role_key,
             settings.supabase_bucket,
         )
         app.state.storage_client = storage_client
-        app.state.indexer = Indexer(app.state.parser_client, storage_client)
+        app.state.indexer = Indexer(
+            app.state.parser_client,
+            storage_client,
+            max_attempts=settings.ingestion_max_attempts,
+            callback_url=settings.parser_callback_url,
+            callback_token=settings.parser_callback_secret,
+            spool_dir=settings.upload_spool_dir,
+            pipelined=settings.ingestion_pipelined,
+            scheduler=ParserScheduler(
+                app.state.parser_client,
+                capacity=settings.parser_max_concurrent_jobs,
+            ),
+        )
+        app.state.ingestion_queue = create_ingestion_queue(
+            app.state.db_pool,
+            app.state.indexer,
+            settings,
+        )
+        app.state.ingestion_queue.start()
+        app.state.progress_broker = ProgressBroker(settings.database_listen_url)
+        app.state.progress_broker.start()
+        # Queued jobs without their spool file fall back to the storage copy.
+        await anyio.to_thread.run_sync(sweep_spool_dir, settings.upload_spool_dir, 24 * 3600)
 
     @app.on_event("shutdown")
     async def shutdown() -> None:
+        progress_broker: ProgressBroker | None = getattr(app.state, "progress_broker", None)
+        if progress_broker is not None:
+            await progress_broker.stop()
+        indexer: Indexer | None = getattr(app.state, "indexer", None)
+        if indexer is not None:
+            await indexer.drain(settings.ingestion_drain_timeout_s)
+        ingestion_queue: IngestionQueue | None = getattr(app.state, "ingestion_queue", None)
+        if ingestion_queue is not None:
+            await ingestion_queue.stop(settings.ingestion_drain_timeout_s)
         parser_client: ParserClient | None = getattr(app.state, "parser_client", None)
         if parser_client is not None:
             await parser_client.close()
         await close_pool(getattr(app.state, "db_pool", None))
 
+    @app.exception_handler(ParserUnavailable)
+    async def parser_unavailable_handler(request: Request, exc: ParserUnavailable) -> JSONResponse:
+        return JSONResponse(
+            status_code=503,
+            content={"detail": "Parser is temporarily unavailable"},
+            headers={"Retry-After": str(int(settings.parser_breaker_reset_s))},
+        )
+
     @app.get("/health")
     async def health() -> dict[str, str]:
         return {"status": "ok"}
@@ -75,6 +151,7 @@ def create_app() -> FastAPI:
     app.include_router(account.router)
     app.include_router(messages.router)
     app.include_router(admin.router)
+    app.include_router(parser.router)
 
     return app
 
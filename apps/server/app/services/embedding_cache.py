@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any
+
+from app.db import repository
+from app.db.vector import is_embedding
+from app.services.parser_client import ParserClient
+
+logger = logging.getLogger("uvicorn.error")
+
+_SPACE_PATTERN = re.compile(r"\s+")
+_MODEL_REFRESH_S = 600.0
+_UNKNOWN_MODEL = "default"
+
+
+def normalize_query_text(text: str) -> str:
+    return _SPACE_PATTERN.sub(" ", unicodedata.normalize("NFKC", text)).strip().casefold()
+
+
+def _embedding_from_payload(payload: Any) -> Any:
+    if not isinstance(payload, dict):
+        return None
+    embedding = payload.get("embedding") or payload.get("data")
+    if isinstance(embedding, dict):
+        embedding = embedding.get("embedding")
+    return embedding if is_embedding(embedding) else None
+
+
+class EmbeddingCache:
+    """Normalized query text -> embedding, keyed by the parser's embedding model.
+
+    In-memory LRU with a TTL, optionally written through to
+    ``query_embedding_cache`` so hits survive restarts. Hits are returned in
+    the ``embed_text`` payload shape with zero token usage, so usage logs
+    record them without cost.
+    """
+
+    def __init__(
+        self,
+        parser_client: ParserClient,
+        pool=None,
+        max_entries: int = 2048,
+        ttl_s: float = 7 * 24 * 3600,
+        persist: bool = False,
+    ) -> None:
+        self._parser = parser_client
+        self._pool = pool
+        self._max_entries = max(1, int(max_entries))
+        self._ttl_s = ttl_s
+        self._persist = persist and pool is not None
+        self._entries: OrderedDict[str, tuple[float, list[float]]] = OrderedDict()
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._model = _UNKNOWN_MODEL
+        self._model_checked_at = 0.0
+        self._hits = 0
+        self._persisted_hits = 0
+        self._misses = 0
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self._hits + self._misses
+        return {
+            "model": self._model,
+            "entries": len(self._entries),
+            "max_entries": self._max_entries,
+            "hits": self._hits,
+            "persisted_hits": self._persisted_hits,
+            "misses": self._misses,
+            "hit_rate": round(self._hits / lookups, 4) if lookups else None,
+            "persist": self._persist,
+        }
+
+    async def embed(self, text: str) -> dict[str, Any]:
+        model = await self._current_model()
+        key = self._key(model, text)
+        embedding = self._get_memory(key)
+        if embedding is None and self._persist:
+            embedding = await self._get_persisted(key)
+            if embedding is not None:
+                self._persisted_hits += 1
+                self._put_memory(key, embedding)
+        if embedding is not None:
+            self._hits += 1
+            return self._hit_payload(model, embedding)
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            # Identical concurrent query: share the in-flight request, cost once.
+            try:
+                embedding = await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if inflight.cancelled():
+                    # The leading request was cancelled, not us: fetch it ourselves.
+                    return await self.embed(text)
+                raise
+            self._hits += 1
+            return self._hit_payload(model, embedding)
+
+        self._misses += 1
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            payload = await self._parser.embed_text(text)
+            embedding = _embedding_from_payload(payload)
+            if embedding is None:
+                raise ValueError("Invalid embedding response")
+            future.set_result(embedding)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            # Mark retrieved so an unawaited failure does not log a warning.
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+        self._put_memory(key, embedding)
+        if self._persist:
+            await self._store_persisted(key, model, embedding)
+        return payload
+
+    def _key(self, model: str, text: str) -> str:
+        normalized = normalize_query_text(text)
+        return hashlib.sha256(f"{model}\0{normalized}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _hit_payload(model: str, embedding: list[float]) -> dict[str, Any]:
+        payload: dict[str, Any] = {
+            "embedding": embedding,
+            "usage": {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0, "cache_hit": True},
+        }
+        if model != _UNKNOWN_MODEL:
+            payload["model"] = model
+        return payload
+
+    async def _current_model(self) -> str:
+        now = time.monotonic()
+        if now - self._model_checked_at < _MODEL_REFRESH_S:
+            return self._model
+        self._model_checked_at = now
+        try:
+            system = await self._parser.get_system()
+            model = str(system.get("openai_embedding_model") or "").strip()
+        except Exception:
+            logger.warning("embedding model lookup failed; keeping model=%s", self._model)
+            return self._model
+        if model and model != self._model:
+            if self._model != _UNKNOWN_MODEL:
+                logger.info("embedding model changed %s -> %s; clearing cache", self._model, model)
+            self._entries.clear()
+            self._model = model
+        return self._model
+
+    def _get_memory(self, key: str) -> list[float] | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, embedding = entry
+        if time.monotonic() - stored_at > self._ttl_s:
+            self._entries.pop(key, None)
+            return None
+        self._entries.move_to_end(key)
+        return embedding
+
+    def _put_memory(self, key: str, embedding: list[float]) -> None:
+        self._entries[key] = (time.monotonic(), embedding)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    async def _get_persisted(self, key: str) -> list[float] | None:
+        try:
+            return await repository.get_query_embedding(self._pool, key, self._ttl_s)
+        except Exception:
+            logger.exception("embedding cache read failed")
+            return None
+
+    async def _store_persisted(self, key: str, model: str, embedding: list[float]) -> None:
+        try:
+            await repository.upsert_query_embedding(self._pool, key, model, embedding)
+        except Exception:
+            logger.exception("embedding cache write failed")
@@ -0,0 +1,129 @@
+"""Compact binary export of a document's chunk embeddings for client-side ranking.
+
+Layout (all integers and floats little-endian, so a browser can wrap the
+sections in typed arrays without copying)::
+
+    0   4s  magic b"APE1"
+    4   B   encoding: 1 = float16, 2 = int8
+    5   3x  reserved
+    8   I   chunk count
+    12  I   dimensions
+    16  I   byte length of the chunk table
+    20      chunk table: UTF-8 JSON list of {id, documentId, content, metadata}
+            zero padding to a multiple of 4
+            int8 only: float32 scale per chunk
+            float16 / int8 values, count * dimensions, row-major
+
+Vectors are L2-normalized before quantization, so a dot product with a
+normalized query is the cosine similarity. int8 rows are symmetric per-row:
+``value = q * scale``. Rows without an embedding, with a zero norm or with a
+different dimension than the first row are left out.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import struct
+import sys
+from array import array
+from typing import Any
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+EXPORT_FORMATS = {"f16": 1, "i8": 2}
+EXPORT_MEDIA_TYPE = "application/octet-stream"
+
+_MAGIC = b"APE1"
+# Bump when the layout or quantization changes so clients never reuse stale bytes.
+_LAYOUT_VERSION = 1
+_HEADER = struct.Struct("<4sB3xIII")
+
+
+def export_version(chunk_digest: str, fmt: str) -> str:
+    """Content hash naming an export; changes whenever the document's chunks do."""
+    seed = f"{_LAYOUT_VERSION}:{fmt}:{chunk_digest}".encode()
+    return hashlib.sha256(seed).hexdigest()[:32]
+
+
+def build_embedding_export(rows: list[dict[str, Any]], fmt: str) -> bytes:
+    encoding = EXPORT_FORMATS[fmt]
+    table: list[dict[str, Any]] = []
+    vectors: list[Any] = []
+    dim = 0
+    for row in rows:
+        embedding = row.get("embedding")
+        if embedding is None or len(embedding) == 0:
+            continue
+        if dim == 0:
+            dim = len(embedding)
+        elif len(embedding) != dim:
+            continue
+        vector = _normalized(embedding)
+        if vector is None:
+            continue
+        vectors.append(vector)
+        table.append(
+            {
+                "id": str(row["id"]),
+                "documentId": str(row["document_id"]),
+                "content": str(row.get("content") or ""),
+                "metadata": row.get("metadata"),
+            }
+        )
+
+    table_bytes = json.dumps(table, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    padding = -(_HEADER.size + len(table_bytes)) % 4
+    parts = [
+        _HEADER.pack(_MAGIC, encoding, len(vectors), dim, len(table_bytes)),
+        table_bytes,
+        b"\0" * padding,
+    ]
+    if fmt == "f16":
+        parts.append(_float16_bytes(vectors))
+    else:
+        parts.extend(_int8_bytes(vectors))
+    return b"".join(parts)
+
+
+def _normalized(embedding: Any) -> Any:
+    if np is not None:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm > 0.0 and math.isfinite(norm) else None
+    values = [float(item) for item in embedding]
+    norm = math.sqrt(sum(item * item for item in values))
+    if norm == 0.0 or not math.isfinite(norm):
+        return None
+    return [item / norm for item in values]
+
+
+def _float16_bytes(vectors: list[Any]) -> bytes:
+    if not vectors:
+        return b""
+    if np is not None:
+        return np.vstack(vectors).astype("<f2").tobytes()
+    return b"".join(struct.pack(f"<{len(vector)}e", *vector) for vector in vectors)
+
+
+def _int8_bytes(vectors: list[Any]) -> tuple[bytes, bytes]:
+    if not vectors:
+        return b"", b""
+    if np is not None:
+        matrix = np.vstack(vectors)
+        scales = np.abs(matrix).max(axis=1) / 127.0
+        scales[scales == 0.0] = 1.0
+        quantized = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+        return scales.astype("<f4").tobytes(), quantized.tobytes()
+    scales = array("f")
+    quantized = array("b")
+    for vector in vectors:
+        scale = (max(abs(item) for item in vector) / 127.0) or 1.0
+        scales.append(scale)
+        quantized.extend(max(-127, min(127, round(item / scale))) for item in vector)
+    if sys.byteorder != "little":
+        scales.byteswap()
+    return scales.tobytes(), quantized.tobytes()
@@ -1,25 +1,171 @@
 from __future__ import annotations
 
+import asyncio
+import logging
+import os
 import re
 import time
-import asyncio
 import unicodedata
-from typing import Any
+from typing import Any, Awaitable, Callable
 from uuid import uuid4
 
 import anyio
+import httpx
 
 from app.db import repository
+from app.services.ingestion_queue import DEFAULT_LEASE_S, IngestionQueue, JobFailed
 from app.services.parser_client import ParserClient
+from app.services.parser_scheduler import ParserScheduler
+from app.services.plans import get_plan_limits, resolve_user_plan
+from app.services.result_stream import aiter_result_file
+from app.services.spool import (
+    DEFAULT_SPOOL_DIR,
+    SpooledFile,
+    new_spool_path,
+    remove_spooled_file,
+    spool_chunks,
+)
 from app.services.usage import extract_pages
 from app.services.storage import StorageClient
 
+logger = logging.getLogger("uvicorn.error")
+
+# Coarse progress for parser stages (lowercased); "queued" is waiting for a parser slot and
+# "storing" covers our own chunk/result writes.
+_STAGE_PROGRESS = {
+    "queued": 0,
+    "pending": 5,
+    "running": 20,
+    "chunking": 60,
+    "embedding": 80,
+    "storing": 95,
+}
+
+
+class ParserPollPolicy:
+    """Poll interval and deadline for a parser job, scaled by page count and stage.
+
+    Intervals back off while the stage is unchanged; each stage transition
+    resets the interval and extends the deadline, so large documents are not
+    cut off mid-embedding. The parser limits ``GET /documents/{id}`` to
+    120/min per IP, so polls never go below ``min_interval_s`` and the jobs
+    polled from one process share ``poll_budget_per_min`` (half the limit,
+    leaving room for replica probes and other reads).
+    """
+
+    min_interval_s = 2.0
+    backoff = 1.6
+    poll_budget_per_min = 60.0
+    rate_limited_s = 15.0
+    base_timeout_s = 120.0
+    per_page_timeout_s = 4.0
+    max_timeout_s = 1800.0
+    callback_interval_s = 10.0
+
+    def __init__(self, pages: int | None, callback: bool = False) -> None:
+        self._pages = max(int(pages or 0), 0)
+        self._callback = callback
+        self._stage: str | None = None
+        self._interval_s = self.min_interval_s
+        self._deadline = time.monotonic() + self._timeout_for(self._pages)
+
+    def _timeout_for(self, pages: int) -> float:
+        return min(self.base_timeout_s + self.per_page_timeout_s * pages, self.max_timeout_s)
+
+    def _stage_cap_s(self, stage: str) -> float:
+        if self._callback:
+            return self.callback_interval_s
+        if stage in {"chunking", "embedding"}:
+            return 4.0
+        return min(4.0 + 0.05 * self._pages, 15.0)
+
+    def observe(self, stage: str, pages: int | None = None, concurrent: int = 1) -> float:
+        now = time.monotonic()
+        if pages and pages > self._pages:
+            self._pages = pages
+            self._deadline = max(self._deadline, now + self._timeout_for(pages))
+        if stage != self._stage:
+            if self._stage is not None and stage in {"chunking", "embedding"}:
+                self._deadline = max(self._deadline, now + 60.0 + 0.5 * self._pages)
+            self._stage = stage
+            self._interval_s = self.min_interval_s
+        else:
+            self._interval_s = min(self._interval_s * self.backoff, self._stage_cap_s(stage))
+        floor_s = max(int(concurrent), 1) * 60.0 / self.poll_budget_per_min
+        return min(max(self._interval_s, floor_s), max(self._deadline - now, 0.0))
+
+    def rate_limited(self, response: httpx.Response) -> float:
+        """Wait before the next poll after a 429, per Retry-After when the parser sends it."""
+        try:
+            retry_after = float(response.headers.get("Retry-After", ""))
+        except ValueError:
+            retry_after = self.rate_limited_s
+        now = time.monotonic()
+        return min(max(retry_after, self.min_interval_s), max(self._deadline - now, 0.0))
+
+    def expired(self) -> bool:
+        return time.monotonic() > self._deadline
+
+
+class ParserJobLost(RuntimeError):
+    """The parser no longer has a job for the recorded ``parser_doc_id`` (404)."""
+
+
+class ParserJobFailed(JobFailed):
+    """The parser reported the job as failed; resubmitting would pay for the same failure."""
+
 
 class Indexer:
-    def __init__(self, parser_client: ParserClient, storage_client: StorageClient) -> None:
+    def __init__(
+        self,
+        parser_client: ParserClient,
+        storage_client: StorageClient,
+        max_attempts: int = 3,
+        callback_url: str | None = None,
+        callback_token: str | None = None,
+        spool_dir: str | None = None,
+        pipelined: bool = False,
+        scheduler: ParserScheduler | None = None,
+    ) -> None:
         self._parser = parser_client
+        self._scheduler = scheduler or ParserScheduler(parser_client)
         self._storage = storage_client
         self._limiter = None
+        self._max_attempts = max(1, int(max_attempts))
+        self._queue: IngestionQueue | None = None
+        self._callback_url = callback_url
+        self._callback_token = callback_token
+        self._parser_waiters: dict[str, asyncio.Event] = {}
+        self._spool_dir = spool_dir or DEFAULT_SPOOL_DIR
+        self._pipelined = pipelined
+        self._background_tasks: set[asyncio.Task] = set()
+
+    @property
+    def scheduler(self) -> ParserScheduler:
+        return self._scheduler
+
+    def notify_parser_status(self, parser_doc_id: str) -> bool:
+        """Wake the local waiter for ``parser_doc_id``; False when none is waiting here."""
+        event = self._parser_waiters.get(parser_doc_id)
+        if event is None:
+            return False
+        event.set()
+        return True
+
+    def attach_queue(self, queue: IngestionQueue) -> None:
+        self._queue = queue
+
+    async def _enqueue(self, pool, document_id: str, user_id: str, payload: dict[str, Any]) -> None:
+        await repository.enqueue_ingestion_job(
+            pool,
+            document_id=document_id,
+            user_id=user_id,
+            kind="process",
+            payload=payload,
+            max_attempts=self._max_attempts,
+        )
+        if self._queue is not None:
+            self._queue.notify()
 
     async def resume_processing(self, pool, user_id: str) -> int:
         rows = await repository.list_processing_documents(pool, user_id)
@@ -29,77 +175,37 @@ class Indexer:
             parser_doc_id = row.get("parser_doc_id")
             if not parser_doc_id:
                 continue
-            asyncio.create_task(
-                self._resume_parser_document(
-                    pool=pool,
-                    document_id=document_id,
-                    user_id=user_id,
-                    parser_doc_id=str(parser_doc_id),
-                )
+            await self._enqueue(
+                pool,
+                document_id,
+                user_id,
+                {"parser_doc_id": str(parser_doc_id)},
             )
             started += 1
         return started
 
-    async def _resume_parser_document(
-        self,
-        pool,
-        document_id: str,
-        user_id: str,
-        parser_doc_id: str,
-    ) -> None:
-        try:
-            status_payload = await self._wait_for_parser(parser_doc_id)
-            result_payload = await self._parser.get_result(parser_doc_id)
-            chunks_payload = result_payload.get("chunks", result_payload)
-            chunks = self._normalize_chunks(chunks_payload)
-
-            await repository.update_document_result(
-                pool,
-                document_id=document_id,
-                metadata={
-                    "parser_doc_id": parser_doc_id,
-                    "parser_status": status_payload,
-                    "parser_result_meta": {
-                        "parser_version": result_payload.get("parser_version"),
-                        "source": result_payload.get("source"),
-                    },
-                },
-                result=result_payload,
-                status="ready",
-            )
-            await repository.insert_chunks(pool, document_id, user_id, chunks)
+    def _new_storage_path(self, user_id: str, filename: str) -> str:
+        return f"{user_id}/{uuid4()}-{self._sanitize_storage_name(filename)}"
 
-            pages = extract_pages(result_payload)
-            if pages is not None:
-                try:
-                    await repository.insert_usage_log(
-                        pool,
-                        user_id=user_id,
-                        operation="parse",
-                        document_id=document_id,
-                        pages=pages,
-                        raw_request={"parser_doc_id": parser_doc_id},
-                    )
-                except Exception:
-                    pass
-        except Exception as exc:
-            await repository.update_document_status(
-                pool,
-                document_id=document_id,
-                status="failed",
-                error_message=str(exc),
-            )
+    @staticmethod
+    def _upload_job_payload(upload: SpooledFile, storage_path: str, filename: str) -> dict[str, Any]:
+        return {
+            "storage_path": storage_path,
+            "filename": filename,
+            "spool_path": upload.path,
+            "page_estimate": upload.page_estimate,
+            "content_sha256": upload.sha256,
+        }
 
     async def start_index_document(
         self,
         pool,
-        file_bytes: bytes,
+        upload: SpooledFile,
         filename: str | None,
         user_id: str,
     ) -> dict[str, Any]:
         original_name = filename or "document.pdf"
-        safe_storage_name = self._sanitize_storage_name(original_name)
-        storage_path = f"{user_id}/{uuid4()}-{safe_storage_name}"
+        storage_path = self._new_storage_path(user_id, original_name)
 
         document_id = await repository.insert_document(
             pool,
@@ -109,15 +215,119 @@ class Indexer:
             result=None,
             user_id=user_id,
             status="uploading",
+            content_sha256=upload.sha256 or None,
         )
+        job_payload = self._upload_job_payload(upload, storage_path, original_name)
+        return await self._dispatch_upload(pool, document_id, user_id, upload, job_payload)
+
+    async def start_index_batch(
+        self,
+        pool,
+        uploads: list[tuple[SpooledFile, str | None]],
+        user_id: str,
+        concurrency: int = 2,
+    ) -> list[dict[str, Any]]:
+        """Insert all documents at once and upload them in the background.
+
+        Returns immediately with one ``{"document_id", "status": "uploading"}``
+        entry per upload; each file then follows the single-upload path.
+        """
+        if not uploads:
+            return []
+        prepared: list[tuple[SpooledFile, dict[str, Any]]] = []
+        for upload, filename in uploads:
+            original_name = filename or "document.pdf"
+            storage_path = self._new_storage_path(user_id, original_name)
+            prepared.append((upload, self._upload_job_payload(upload, storage_path, original_name)))
+        try:
+            document_ids = await repository.insert_documents(
+                pool,
+                user_id,
+                [
+                    {
+                        "title": payload["filename"],
+                        "storage_path": payload["storage_path"],
+                        "content_sha256": upload.sha256 or None,
+                    }
+                    for upload, payload in prepared
+                ],
+            )
+        except BaseException:
+            for upload, _ in prepared:
+                remove_spooled_file(upload.path)
+            raise
+
+        limiter = asyncio.Semaphore(max(1, int(concurrency)))
+
+        async def dispatch(document_id: str, upload: SpooledFile, payload: dict[str, Any]) -> None:
+            try:
+                async with limiter:
+                    await self._dispatch_upload(pool, document_id, user_id, upload, payload)
+            except asyncio.CancelledError:
+                # drain() gave up on this upload; do not leave the row stuck in "uploading".
+                remove_spooled_file(upload.path)
+                try:
+                    await asyncio.shield(
+                        repository.update_document_status(
+                            pool,
+                            document_id=document_id,
+                            status="failed",
+                            error_message="Upload interrupted by server shutdown",
+                        )
+                    )
+                except Exception:
+                    logger.exception("batch upload cancel cleanup failed doc=%s", document_id)
+                raise
+            except Exception:
+                logger.exception("batch upload failed doc=%s", document_id)
+
+        for document_id, (upload, payload) in zip(document_ids, prepared):
+            task = asyncio.create_task(dispatch(document_id, upload, payload))
+            self._background_tasks.add(task)
+            task.add_done_callback(self._background_tasks.discard)
+        return [{"document_id": document_id, "status": "uploading"} for document_id in document_ids]
+
+    async def drain(self, timeout_s: float) -> None:
+        """Wait for background batch uploads, cancelling any still running after ``timeout_s``."""
+        tasks = list(self._background_tasks)
+        if not tasks:
+            return
+        _, pending = await asyncio.wait(tasks, timeout=timeout_s)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _dispatch_upload(
+        self,
+        pool,
+        document_id: str,
+        user_id: str,
+        upload: SpooledFile,
+        job_payload: dict[str, Any],
+    ) -> dict[str, Any]:
+        if (
+            self._pipelined
+            and not (
+                upload.sha256
+                and await repository.has_ready_document_with_hash(pool, upload.sha256, document_id)
+            )
+            # Only skip the queue when the parser has a free slot right now,
+            # both across processes and in this one.
+            and await self._parser_has_free_slot(pool)
+            and self._scheduler.try_acquire()
+        ):
+            # _start_pipelined owns the slot from here: it releases or hands it over.
+            return await self._start_pipelined(pool, document_id, user_id, upload, job_payload)
 
         try:
             await anyio.to_thread.run_sync(
-                self._storage.upload_pdf,
-                storage_path,
-                file_bytes,
+                self._storage.upload_pdf_file,
+                job_payload["storage_path"],
+                upload.path,
             )
         except Exception as exc:
+            remove_spooled_file(upload.path)
             await repository.update_document_status(
                 pool,
                 document_id=document_id,
@@ -131,81 +341,383 @@ class Indexer:
             document_id=document_id,
             status="uploaded",
         )
-
-        asyncio.create_task(
-            self._process_document(
-                pool,
-                file_bytes,
-                original_name,
-                user_id,
-                document_id,
-            )
-        )
+        await self._enqueue(pool, document_id, user_id, job_payload)
 
         return {
             "document_id": document_id,
             "status": "uploaded",
         }
 
-    async def _process_document(
+    async def _parser_has_free_slot(self, pool) -> bool:
+        lease_s = self._queue.lease_s if self._queue is not None else DEFAULT_LEASE_S
+        try:
+            busy = await repository.count_parser_busy_jobs(pool, lease_s)
+        except Exception:
+            logger.exception("parser busy count failed; using the queue")
+            return False
+        return busy < await self._scheduler.refresh_capacity()
+
+    async def _start_pipelined(
         self,
         pool,
-        file_bytes: bytes,
-        filename: str,
+        document_id: str,
         user_id: str,
+        upload: SpooledFile,
+        job_payload: dict[str, Any],
+    ) -> dict[str, Any]:
+        """Send the spooled file to storage and to the parser at the same time.
+
+        Outcomes map onto ``documents.status``: both succeed -> processing with a
+        resume job; only storage succeeds -> uploaded with a regular job that
+        retries the parser; storage fails -> failed, and an accepted parser job
+        is discarded in the background.
+
+        Called holding a scheduler slot from ``try_acquire``. An accepted parser
+        job keeps it: the slot is handed to the resume job (or kept by the
+        discard task); otherwise it is released here.
+        """
+        slot_kept = False
+        try:
+            storage_result, parser_result = await asyncio.gather(
+                anyio.to_thread.run_sync(
+                    self._storage.upload_pdf_file,
+                    job_payload["storage_path"],
+                    upload.path,
+                ),
+                self._submit_to_parser(upload.path, job_payload["filename"]),
+                return_exceptions=True,
+            )
+            for outcome in (storage_result, parser_result):
+                if isinstance(outcome, BaseException) and not isinstance(outcome, Exception):
+                    raise outcome
+
+            if isinstance(storage_result, Exception):
+                remove_spooled_file(upload.path)
+                if not isinstance(parser_result, Exception):
+                    self._spawn(self._discard_parser_job(parser_result, release_slot=True))
+                    slot_kept = True
+                await repository.update_document_status(
+                    pool,
+                    document_id=document_id,
+                    status="failed",
+                    error_message=str(storage_result),
+                )
+                raise storage_result
+
+            if not isinstance(parser_result, Exception):
+                self._scheduler.hand_over(parser_result)
+                slot_kept = True
+            return await self._finish_pipelined(pool, document_id, user_id, upload, job_payload, parser_result)
+        finally:
+            if not slot_kept:
+                self._scheduler.release()
+
+    async def _finish_pipelined(
+        self,
+        pool,
         document_id: str,
-    ) -> None:
+        user_id: str,
+        upload: SpooledFile,
+        job_payload: dict[str, Any],
+        parser_result: str | Exception,
+    ) -> dict[str, Any]:
+        if isinstance(parser_result, Exception):
+            logger.warning(
+                "pipelined parser submit failed doc=%s error=%s; falling back to queue",
+                document_id,
+                parser_result,
+            )
+            await repository.update_document_status(
+                pool,
+                document_id=document_id,
+                status="uploaded",
+            )
+            await self._enqueue(pool, document_id, user_id, job_payload)
+            return {"document_id": document_id, "status": "uploaded"}
+
+        remove_spooled_file(upload.path)
+        await repository.set_document_parser_doc_id(
+            pool,
+            document_id,
+            parser_result,
+            page_estimate=upload.page_estimate,
+            parser_endpoint=self._parser.endpoint_for(parser_result),
+        )
+        # The queued job re-pins from metadata, possibly in another process.
+        self._parser.forget_document(parser_result)
         await repository.update_document_status(
             pool,
             document_id=document_id,
             status="processing",
         )
+        await self._enqueue(
+            pool,
+            document_id,
+            user_id,
+            {**job_payload, "spool_path": None, "parser_doc_id": parser_result},
+        )
+        return {"document_id": document_id, "status": "processing"}
+
+    def _spawn(self, coro: Awaitable[None]) -> None:
+        task = asyncio.ensure_future(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def _discard_parser_job(self, parser_doc_id: str, release_slot: bool = False) -> None:
+        """Remove a parser job we no longer need.
+
+        The parser has no delete endpoint; fetching the one-shot result is what
+        makes it delete the PDF, result and job, so wait for completion and
+        throw the result away. The job keeps its parser slot until then.
+        """
+        path = None
         try:
-            parser_payload = await self._parser.create_document(file_bytes, filename)
-            parser_doc_id = str(parser_payload.get("doc_id") or parser_payload.get("id"))
+            await self._wait_for_parser(parser_doc_id)
+            path = await self._download_result(parser_doc_id)
+        except ParserJobFailed:
+            pass
+        except Exception:
+            logger.warning("parser job discard failed parser_doc_id=%s", parser_doc_id, exc_info=True)
+        finally:
+            remove_spooled_file(path)
+            self._parser.forget_document(parser_doc_id)
+            if release_slot:
+                self._scheduler.release()
+
+    async def _submit_to_parser(self, path: str, filename: str) -> str:
+        with open(path, "rb") as handle:
+            parser_payload = await self._parser.create_document(
+                handle,
+                filename,
+                callback_url=self._callback_url,
+                callback_token=self._callback_token,
+            )
+        return str(parser_payload.get("doc_id") or parser_payload.get("id"))
 
-            status_payload = await self._wait_for_parser(parser_doc_id)
-            result_payload = await self._parser.get_result(parser_doc_id)
-            chunks_payload = result_payload.get("chunks", result_payload)
-            chunks = self._normalize_chunks(chunks_payload)
+    async def run_job(self, pool, job: dict[str, Any]) -> None:
+        kind = job.get("kind")
+        if kind != "process":
+            raise ValueError(f"Unknown ingestion job kind: {kind}")
+        await self._process_document(pool, job["document_id"], job["user_id"], job["payload"])
 
-            await repository.update_document_result(
+    async def fail_job(self, pool, job: dict[str, Any], error_message: str) -> None:
+        remove_spooled_file(job["payload"].get("spool_path"))
+        state = await repository.get_document_ingest_state(pool, job["document_id"])
+        parser_doc_id = (state or {}).get("parser_doc_id") or job["payload"].get("parser_doc_id")
+        if parser_doc_id:
+            self._parser.forget_document(str(parser_doc_id))
+        await repository.update_document_status(
+            pool,
+            document_id=job["document_id"],
+            status="failed",
+            error_message=error_message,
+        )
+
+    async def _process_document(
+        self,
+        pool,
+        document_id: str,
+        user_id: str,
+        payload: dict[str, Any],
+    ) -> None:
+        state = await repository.get_document_ingest_state(pool, document_id)
+        if state is None or state.get("status") in {"ready", "failed"}:
+            remove_spooled_file(payload.get("spool_path"))
+            return
+
+        parser_doc_id = state.get("parser_doc_id") or payload.get("parser_doc_id")
+        if not parser_doc_id:
+            storage_path = str(payload.get("storage_path") or state.get("storage_path") or "")
+            filename = str(payload.get("filename") or state.get("title") or "document.pdf")
+            if not storage_path:
+                raise RuntimeError("Missing storage path")
+            await repository.update_document_status(
                 pool,
                 document_id=document_id,
-                metadata={
-                    "parser_doc_id": parser_doc_id,
-                    "parser_status": status_payload,
-                    "parser_result_meta": {
-                        "parser_version": result_payload.get("parser_version"),
-                        "source": result_payload.get("source"),
-                    },
-                },
-                result=result_payload,
-                status="ready",
+                status="processing",
             )
-            inserted = await repository.insert_chunks(pool, document_id, user_id, chunks)
+            if await self._reuse_existing_parse(pool, document_id, user_id, payload):
+                return
 
-            pages = extract_pages(result_payload)
-            if pages is not None:
+        weight = await self._parser_weight(pool, user_id)
+        if not parser_doc_id:
+            await self._record_stage(pool, document_id, "queued")
+        # Jobs already accepted by the parser occupy a slot without queueing for one.
+        async with self._scheduler.slot(
+            user_id,
+            weight,
+            wait=not parser_doc_id,
+            resume_key=str(parser_doc_id) if parser_doc_id else None,
+        ):
+            if not parser_doc_id:
+                spooled = await self._open_spooled_source(payload, storage_path)
+                page_estimate = spooled.page_estimate
                 try:
-                    await repository.insert_usage_log(
-                        pool,
-                        user_id=user_id,
-                        operation="parse",
-                        document_id=document_id,
-                        pages=pages,
-                        raw_request={"parser_doc_id": parser_doc_id},
-                    )
+                    parser_doc_id = await self._submit_to_parser(spooled.path, filename)
                 except Exception:
-                    pass
-            _ = inserted
-        except Exception as exc:
-            await repository.update_document_status(
+                    if spooled.path != payload.get("spool_path"):
+                        remove_spooled_file(spooled.path)
+                    raise
+                # The parser owns the file now; retries resume via parser_doc_id.
+                remove_spooled_file(spooled.path)
+                await repository.set_document_parser_doc_id(
+                    pool,
+                    document_id,
+                    parser_doc_id,
+                    page_estimate=page_estimate,
+                    parser_endpoint=self._parser.endpoint_for(parser_doc_id),
+                )
+            else:
+                page_estimate = state.get("page_estimate")
+                self._parser.pin_document(str(parser_doc_id), state.get("parser_endpoint"))
+
+            try:
+                await self._complete_from_parser(
+                    pool,
+                    document_id,
+                    user_id,
+                    str(parser_doc_id),
+                    page_estimate=page_estimate,
+                )
+            except ParserJobLost:
+                # Drop the dead parser job so the next attempt submits the file again.
+                await repository.clear_document_parser_doc_id(pool, document_id)
+                raise
+
+    async def _parser_weight(self, pool, user_id: str) -> int:
+        try:
+            plan = await resolve_user_plan(pool, user_id)
+        except Exception:
+            logger.exception("plan lookup failed user=%s", user_id)
+            return 1
+        return get_plan_limits(plan).parser_weight
+
+    async def _reuse_existing_parse(
+        self,
+        pool,
+        document_id: str,
+        user_id: str,
+        payload: dict[str, Any],
+    ) -> bool:
+        content_sha256 = payload.get("content_sha256")
+        if not content_sha256:
+            return False
+        reused = await repository.clone_document_from_hash(
+            pool,
+            document_id=document_id,
+            user_id=user_id,
+            content_sha256=str(content_sha256),
+        )
+        if reused is None:
+            return False
+        remove_spooled_file(payload.get("spool_path"))
+        try:
+            # Logged as a parse with zero billable pages so usage reflects the reuse.
+            await repository.insert_usage_log(
                 pool,
+                user_id=user_id,
+                operation="parse",
                 document_id=document_id,
-                status="failed",
-                error_message=str(exc),
+                pages=0,
+                raw_request={
+                    "dedup_source_document_id": reused["source_document_id"],
+                    "content_sha256": content_sha256,
+                    "source_pages": reused["pages"],
+                },
+            )
+        except Exception:
+            pass
+        return True
+
+    async def _open_spooled_source(self, payload: dict[str, Any], storage_path: str) -> SpooledFile:
+        spool_path = payload.get("spool_path")
+        if spool_path and os.path.exists(spool_path):
+            page_estimate = payload.get("page_estimate")
+            return SpooledFile(
+                path=str(spool_path),
+                size=os.path.getsize(spool_path),
+                sha256="",
+                head=b"",
+                page_estimate=int(page_estimate) if page_estimate else None,
+            )
+        # Picked up by another process or after a restart: stream the file back from storage.
+        return await anyio.to_thread.run_sync(
+            spool_chunks,
+            self._storage.iter_pdf(storage_path),
+            self._spool_dir,
+        )
+
+    async def _complete_from_parser(
+        self,
+        pool,
+        document_id: str,
+        user_id: str,
+        parser_doc_id: str,
+        page_estimate: int | None = None,
+    ) -> None:
+        async def report(stage: str) -> None:
+            await self._record_stage(pool, document_id, stage)
+
+        try:
+            status_payload = await self._wait_for_parser(
+                parser_doc_id,
+                pages=page_estimate,
+                on_stage=report,
             )
+            result_path = await self._download_result(parser_doc_id)
+        except httpx.HTTPStatusError as exc:
+            if exc.response.status_code == 404:
+                raise ParserJobLost(f"Parser job not found: {parser_doc_id}") from exc
+            raise
+
+        def build_metadata(manifest: dict[str, Any]) -> dict[str, Any]:
+            return {
+                "parser_doc_id": parser_doc_id,
+                "parser_status": status_payload,
+                "parser_result_meta": {
+                    "parser_version": manifest.get("parser_version"),
+                    "source": manifest.get("source"),
+                },
+            }
+
+        await report("storing")
+        try:
+            # Decoded incrementally from disk: chunks and page rows are written as they are parsed.
+            manifest, _ = await repository.store_document_result_stream(
+                pool,
+                document_id,
+                user_id,
+                aiter_result_file(result_path),
+                build_metadata,
+                status="ready",
+                progress=100,
+            )
+        finally:
+            remove_spooled_file(result_path)
+
+        pages = extract_pages(manifest)
+        if pages is not None:
+            try:
+                await repository.insert_usage_log(
+                    pool,
+                    user_id=user_id,
+                    operation="parse",
+                    document_id=document_id,
+                    pages=pages,
+                    raw_request={"parser_doc_id": parser_doc_id},
+                )
+            except Exception:
+                pass
+
+    async def _download_result(self, parser_doc_id: str) -> str:
+        path = new_spool_path(self._spool_dir, ".result.json")
+        try:
+            with open(path, "wb") as target:
+                await self._parser.download_result(parser_doc_id, target)
+        except BaseException:
+            remove_spooled_file(path)
+            raise
+        return path
 
     def _sanitize_storage_name(self, filename: str) -> str:
         normalized = unicodedata.normalize("NFKD", filename)
@@ -218,28 +730,54 @@ class Indexer:
             ascii_name = f"{ascii_name}.pdf"
         return ascii_name
 
+    async def _record_stage(self, pool, document_id: str, stage: str) -> None:
+        try:
+            await repository.update_document_progress(
+                pool,
+                document_id,
+                stage,
+                _STAGE_PROGRESS.get(stage),
+            )
+        except Exception:
+            logger.exception("progress update failed doc=%s stage=%s", document_id, stage)
+
     async def _wait_for_parser(
         self,
         doc_id: str,
-        timeout_s: float = 180.0,
-        interval_s: float = 5.0,
+        pages: int | None = None,
+        on_stage: Callable[[str], Awaitable[None]] | None = None,
     ) -> dict[str, Any]:
-        deadline = time.monotonic() + timeout_s
-        while True:
-            payload = await self._parser.get_document(doc_id)
-            status = str(payload.get("status", "")).lower()
-            if status in {"succeeded"}:
-                return payload
-            if status in {"failed"}:
-                raise RuntimeError(f"Parser failed: {payload}")
-            if time.monotonic() > deadline:
-                raise TimeoutError("Parser timeout")
-            await anyio.sleep(interval_s)
-
-    @staticmethod
-    def _normalize_chunks(payload: Any) -> list[dict[str, Any]]:
-        if isinstance(payload, list):
-            return payload
-        if isinstance(payload, dict):
-            return payload.get("chunks") or payload.get("data") or []
-        return []
+        policy = ParserPollPolicy(pages, callback=bool(self._callback_url))
+        event = self._parser_waiters.setdefault(doc_id, asyncio.Event())
+        last_status: str | None = None
+        try:
+            while True:
+                event.clear()
+                try:
+                    payload = await self._parser.get_document(doc_id)
+                except httpx.HTTPStatusError as exc:
+                    if exc.response.status_code != 429:
+                        raise
+                    # Rate limited: the job is fine, only this poll was refused.
+                    if policy.expired():
+                        raise TimeoutError("Parser timeout") from exc
+                    logger.warning("parser poll rate limited doc=%s", doc_id)
+                    await asyncio.sleep(policy.rate_limited(exc.response))
+                    continue
+                status = str(payload.get("status", "")).lower()
+                if status in {"succeeded"}:
+                    return payload
+                if status in {"failed"}:
+                    raise ParserJobFailed(f"Parser failed: {payload}")
+                if on_stage is not None and status and status != last_status:
+                    await on_stage(status)
+                last_status = status
+                interval_s = policy.observe(status, extract_pages(payload), len(self._parser_waiters))
+                if policy.expired():
+                    raise TimeoutError("Parser timeout")
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=interval_s)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._parser_waiters.pop(doc_id, None)
@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import random
+import socket
+import time
+from typing import Any, Awaitable, Callable
+from uuid import uuid4
+
+from app.db import repository
+
+logger = logging.getLogger("uvicorn.error")
+
+JobHandler = Callable[[Any, dict[str, Any]], Awaitable[None]]
+JobFailureHandler = Callable[[Any, dict[str, Any], str], Awaitable[None]]
+CapacityProvider = Callable[[], Awaitable[int]]
+
+DEFAULT_LEASE_S = 600.0
+
+
+class JobFailed(RuntimeError):
+    """Raised by a handler for failures that another attempt cannot fix."""
+
+
+class IngestionQueue:
+    """Worker pool draining the Postgres-backed ``ingestion_jobs`` table."""
+
+    def __init__(
+        self,
+        pool,
+        handler: JobHandler,
+        on_failure: JobFailureHandler | None = None,
+        capacity: CapacityProvider | None = None,
+        workers: int = 2,
+        poll_interval_s: float = 2.0,
+        lease_s: float = DEFAULT_LEASE_S,
+        retry_base_s: float = 5.0,
+        retry_max_s: float = 300.0,
+    ) -> None:
+        self._pool = pool
+        self._handler = handler
+        self._on_failure = on_failure
+        self._capacity = capacity
+        self._workers = max(0, int(workers))
+        self._poll_interval_s = poll_interval_s
+        self._lease_s = lease_s
+        self._retry_base_s = retry_base_s
+        self._retry_max_s = retry_max_s
+        self._worker_prefix = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+        self._wakeup = asyncio.Event()
+        self._stopping = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+        self._reaped_at = 0.0
+
+    @property
+    def workers(self) -> int:
+        return self._workers
+
+    @property
+    def lease_s(self) -> float:
+        return self._lease_s
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        for index in range(self._workers):
+            worker_id = f"{self._worker_prefix}:{index}"
+            self._tasks.append(asyncio.create_task(self._run_worker(worker_id)))
+        logger.info("ingestion_queue started workers=%d", self._workers)
+
+    def notify(self) -> None:
+        self._wakeup.set()
+
+    async def stop(self, drain_timeout_s: float = 30.0) -> None:
+        """Stop claiming new jobs, let running ones finish, then requeue leftovers."""
+        self._stopping.set()
+        self._wakeup.set()
+        if not self._tasks:
+            return
+        _, pending = await asyncio.wait(self._tasks, timeout=max(drain_timeout_s, 0.0))
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        self._tasks = []
+        logger.info("ingestion_queue stopped interrupted=%d", len(pending))
+
+    async def _run_worker(self, worker_id: str) -> None:
+        while not self._stopping.is_set():
+            await self._reap_exhausted()
+            try:
+                capacity = await self._capacity() if self._capacity is not None else None
+                job = await repository.claim_ingestion_job(self._pool, worker_id, self._lease_s, capacity)
+            except Exception:
+                logger.exception("ingestion_queue claim failed worker=%s", worker_id)
+                job = None
+            if job is None:
+                await self._idle()
+                continue
+            await self._run_job(worker_id, job)
+
+    async def _reap_exhausted(self) -> None:
+        """Fail jobs that died with their worker on the last attempt; claims skip them."""
+        if time.monotonic() - self._reaped_at < self._poll_interval_s:
+            return
+        self._reaped_at = time.monotonic()
+        try:
+            jobs = await repository.fail_expired_ingestion_jobs(
+                self._pool,
+                self._lease_s,
+                "Worker lost while processing the job",
+            )
+        except Exception:
+            logger.exception("ingestion_queue reap failed")
+            return
+        for job in jobs:
+            logger.error(
+                "ingestion_job failed id=%s kind=%s attempts=%d error=lease expired on the last attempt",
+                job["id"],
+                job.get("kind"),
+                int(job.get("attempts") or 0),
+            )
+            await self._notify_failure(job, "Worker lost while processing the job")
+
+    async def _idle(self) -> None:
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=self._poll_interval_s)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run_job(self, worker_id: str, job: dict[str, Any]) -> None:
+        job_id = job["id"]
+        heartbeat = asyncio.create_task(self._heartbeat(job_id, worker_id))
+        try:
+            await self._handler(self._pool, job)
+        except asyncio.CancelledError:
+            released = await asyncio.shield(repository.release_ingestion_job(self._pool, job_id, worker_id))
+            self._check_fenced(released, job, worker_id, "release")
+            raise
+        except JobFailed as exc:
+            await self._handle_error(worker_id, job, str(exc) or type(exc).__name__, retry=False)
+        except Exception as exc:
+            await self._handle_error(worker_id, job, str(exc) or type(exc).__name__)
+        else:
+            completed = await repository.complete_ingestion_job(self._pool, job_id, worker_id)
+            self._check_fenced(completed, job, worker_id, "complete")
+        finally:
+            heartbeat.cancel()
+
+    @staticmethod
+    def _check_fenced(applied: bool, job: dict[str, Any], worker_id: str, action: str) -> bool:
+        if not applied:
+            # The lease expired and another worker reclaimed the job; its state wins.
+            logger.warning(
+                "ingestion_job %s skipped id=%s worker=%s: lease lost",
+                action,
+                job["id"],
+                worker_id,
+            )
+        return applied
+
+    async def _handle_error(
+        self,
+        worker_id: str,
+        job: dict[str, Any],
+        error_message: str,
+        retry: bool = True,
+    ) -> None:
+        attempts = int(job.get("attempts") or 1)
+        max_attempts = int(job.get("max_attempts") or 1)
+        if retry and attempts < max_attempts:
+            delay = min(self._retry_max_s, self._retry_base_s * (2 ** (attempts - 1)))
+            delay *= random.uniform(0.5, 1.0)
+            logger.warning(
+                "ingestion_job retry id=%s kind=%s attempt=%d/%d delay_s=%.1f error=%s",
+                job["id"],
+                job.get("kind"),
+                attempts,
+                max_attempts,
+                delay,
+                error_message,
+            )
+            retried = await repository.retry_ingestion_job(self._pool, job["id"], worker_id, delay, error_message)
+            self._check_fenced(retried, job, worker_id, "retry")
+            return
+        logger.error(
+            "ingestion_job failed id=%s kind=%s attempts=%d error=%s",
+            job["id"],
+            job.get("kind"),
+            attempts,
+            error_message,
+        )
+        failed = await repository.fail_ingestion_job(self._pool, job["id"], worker_id, error_message)
+        # Only the owner fails the document; a reclaimed job may still succeed.
+        if self._check_fenced(failed, job, worker_id, "fail"):
+            await self._notify_failure(job, error_message)
+
+    async def _notify_failure(self, job: dict[str, Any], error_message: str) -> None:
+        if self._on_failure is None:
+            return
+        try:
+            await self._on_failure(self._pool, job, error_message)
+        except Exception:
+            logger.exception("ingestion_job failure hook failed id=%s", job["id"])
+
+    async def _heartbeat(self, job_id: str, worker_id: str) -> None:
+        interval = max(self._lease_s / 3.0, 1.0)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await repository.touch_ingestion_job(self._pool, job_id, worker_id)
+            except Exception:
+                logger.exception("ingestion_job heartbeat failed id=%s", job_id)
+
+
+def create_ingestion_queue(pool, indexer, settings, workers: int | None = None) -> IngestionQueue:
+    queue = IngestionQueue(
+        pool,
+        handler=indexer.run_job,
+        on_failure=indexer.fail_job,
+        # Claims stop at the parser's limit across every process sharing the table.
+        capacity=indexer.scheduler.refresh_capacity,
+        workers=settings.ingestion_workers if workers is None else workers,
+        poll_interval_s=settings.ingestion_poll_interval_s,
+    )
+    indexer.attach_queue(queue)
+    return queue
@@ -1,61 +1,556 @@
 from __future__ import annotations
 
-from typing import Any, AsyncGenerator
+from typing import Any, AsyncGenerator, Awaitable, BinaryIO, Callable
+import asyncio
 import json
+import math
+import random
 from urllib.parse import urljoin, urlparse, urlunparse
 
 import httpx
 import websockets
 
+from app.db.vector import decode_embedding, is_embedding
+from app.services.parser_transport import (
+    RETRYABLE_STATUS,
+    TIMEOUT_PROFILES,
+    CircuitBreaker,
+    ParserEndpoint,
+    ParserUnavailable,
+    hedged,
+    http2_available,
+    is_failure,
+    retry_delay,
+)
+from app.services.parser_ws_pool import ParserWebSocketPool
+
+_RESULT_CHUNK_SIZE = 1024 * 1024
+EMBEDDING_FORMATS = ("float", "base64")
+
+
+class EmbeddingBatcher:
+    """Coalesce concurrent single-text embedding calls into one batched request.
+
+    Calls arriving within ``window_s`` of the first pending one (or until
+    ``max_batch`` texts are pending) share a single ``embed_many`` call.
+    """
+
+    def __init__(
+        self,
+        embed_many: Callable[[list[str]], Awaitable[list[dict[str, Any]]]],
+        max_batch: int = 32,
+        window_s: float = 0.005,
+    ) -> None:
+        self._embed_many = embed_many
+        self._max_batch = max(1, int(max_batch))
+        self._window_s = max(0.0, window_s)
+        self._pending: list[tuple[str, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def embed(self, text: str) -> dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self._max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self._window_s, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch = [(text, future) for text, future in self._pending if not future.done()]
+        self._pending = []
+        if not batch:
+            return
+        task = asyncio.create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list[tuple[str, asyncio.Future]]) -> None:
+        try:
+            results = await self._embed_many([text for text, _ in batch])
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+def _split_usage(usage: Any, texts: list[str]) -> list[dict[str, Any] | None]:
+    """Spread batch token usage over its texts in proportion to their length.
+
+    Every numeric field of the shares sums exactly to the batch total, so the
+    per-text usage_logs rows add up to what the batch actually cost.
+    """
+    if not isinstance(usage, dict):
+        return [None] * len(texts)
+    weights = [len(text) for text in texts]
+    if not any(weights):
+        weights = [1] * len(texts)
+    shares: list[dict[str, Any]] = [{} for _ in texts]
+    for key, value in usage.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            parts: list[Any] = [value] * len(texts)
+        elif isinstance(value, int):
+            parts = _largest_remainder(value, weights)
+        else:
+            total_weight = sum(weights)
+            parts = [value * weight / total_weight for weight in weights]
+            parts[-1] = value - sum(parts[:-1])
+        for share, part in zip(shares, parts):
+            share[key] = part
+    return shares
+
+
+def _largest_remainder(total: int, weights: list[int]) -> list[int]:
+    """Integer shares of ``total`` proportional to ``weights`` that sum to ``total``."""
+    total_weight = sum(weights)
+    quotas = [total * weight / total_weight for weight in weights]
+    parts = [math.floor(quota) for quota in quotas]
+    by_remainder = sorted(range(len(weights)), key=lambda index: quotas[index] - parts[index], reverse=True)
+    for index in by_remainder[: total - sum(parts)]:
+        parts[index] += 1
+    return parts
+
+
+def _batch_embeddings(payload: Any, count: int) -> list[list[float]] | None:
+    if not isinstance(payload, dict):
+        return None
+    embeddings = payload.get("embeddings")
+    if not isinstance(embeddings, list):
+        data = payload.get("data")
+        if not isinstance(data, list):
+            return None
+        items = [item for item in data if isinstance(item, dict)]
+        items.sort(key=lambda item: int(item.get("index") or 0))
+        embeddings = [item.get("embedding") for item in items]
+    embeddings = [decode_embedding(item) for item in embeddings]
+    if len(embeddings) != count or not all(is_embedding(item) for item in embeddings):
+        return None
+    return embeddings
+
+
+def _split_base_urls(base_url: str | list[str]) -> list[str]:
+    items = base_url.split(",") if isinstance(base_url, str) else base_url
+    urls = [item.strip().rstrip("/") for item in items if item and item.strip()]
+    if not urls:
+        raise ValueError("At least one parser base URL is required")
+    return list(dict.fromkeys(urls))
+
 
 class ParserClient:
+    """Client for one or more parser replicas.
+
+    Stateless calls go to the available replica with the least outstanding
+    work. Parser jobs are pinned to the replica that accepted them
+    (``endpoint_for`` / ``pin_document``) because only that replica knows
+    the ``doc_id``; a replica whose breaker is open is skipped for new work.
+    """
+
     def __init__(
         self,
-        base_url: str,
+        base_url: str | list[str],
         api_key: str,
         api_prefix: str = "",
         timeout_s: float = 60.0,
+        embed_batch_window_s: float = 0.0,
+        embed_batch_max: int = 32,
+        ws_pool_size: int = 0,
+        ws_pool_max_idle_s: float = 45.0,
+        http2: bool | None = None,
+        max_connections: int = 100,
+        max_retries: int = 2,
+        breaker_threshold: int = 5,
+        breaker_reset_s: float = 30.0,
+        embed_hedge_delay_s: float = 0.0,
+        embedding_format: str = "float",
     ) -> None:
+        if embedding_format not in EMBEDDING_FORMATS:
+            raise ValueError(f"Unsupported embedding format: {embedding_format}")
         prefix = api_prefix.strip()
         if prefix and not prefix.startswith("/"):
             prefix = f"/{prefix}"
         self._prefix = prefix
-        self._client = httpx.AsyncClient(
-            base_url=base_url,
-            timeout=timeout_s,
-            headers={"X-API-Key": api_key},
+        self._api_key = api_key
+        use_http2 = http2_available() if http2 is None else http2
+        self._endpoints = [
+            ParserEndpoint(
+                url,
+                httpx.AsyncClient(
+                    base_url=url,
+                    timeout=timeout_s,
+                    headers={"X-API-Key": api_key},
+                    http2=use_http2,
+                    limits=httpx.Limits(
+                        max_connections=max_connections,
+                        max_keepalive_connections=max(1, max_connections // 4),
+                        keepalive_expiry=30.0,
+                    ),
+                ),
+                CircuitBreaker(breaker_threshold, breaker_reset_s),
+            )
+            for url in _split_base_urls(base_url)
+        ]
+        self._endpoints_by_key = {endpoint.key: endpoint for endpoint in self._endpoints}
+        self._pins: dict[str, ParserEndpoint] = {}
+        self._max_retries = max(0, int(max_retries))
+        self._embed_hedge_delay_s = embed_hedge_delay_s
+        # "base64": ask for little-endian float32 instead of JSON float lists; parsers
+        # that ignore the option still answer with floats, which decode_embedding accepts.
+        self._embedding_format = embedding_format
+        self._embed_batch_max = max(1, int(embed_batch_max))
+        # None until the first batch call tells us whether /embeddings accepts "texts".
+        self._batch_embeddings_supported: bool | None = None
+        self._embed_batcher = (
+            EmbeddingBatcher(self.embed_texts, max_batch=embed_batch_max, window_s=embed_batch_window_s)
+            if embed_batch_window_s > 0
+            else None
+        )
+        self._ws_pool = (
+            ParserWebSocketPool(self._connect_answer_ws, size=ws_pool_size, max_idle_s=ws_pool_max_idle_s)
+            if ws_pool_size > 0
+            else None
         )
 
     async def close(self) -> None:
-        await self._client.aclose()
+        if self._ws_pool is not None:
+            await self._ws_pool.close()
+        for endpoint in self._endpoints:
+            await endpoint.client.aclose()
+
+    def ws_pool_stats(self) -> dict[str, Any] | None:
+        return self._ws_pool.stats() if self._ws_pool is not None else None
+
+    def circuit_stats(self) -> list[dict[str, Any]]:
+        return [endpoint.stats() for endpoint in self._endpoints]
+
+    def endpoint_for(self, doc_id: str) -> str | None:
+        endpoint = self._pins.get(doc_id)
+        return endpoint.key if endpoint is not None else None
+
+    def pin_document(self, doc_id: str, endpoint_key: str | None) -> bool:
+        """Route ``doc_id`` to a known replica, e.g. after a restart; False if unknown."""
+        endpoint = self._endpoints_by_key.get(endpoint_key or "")
+        if endpoint is None:
+            return False
+        self._set_pin(doc_id, endpoint)
+        return True
+
+    def forget_document(self, doc_id: str) -> None:
+        """Drop the local pin once ownership is persisted elsewhere (the job may run in another process)."""
+        self._release_pin(doc_id)
+
+    def _set_pin(self, doc_id: str, endpoint: ParserEndpoint) -> None:
+        self._release_pin(doc_id)
+        self._pins[doc_id] = endpoint
+        endpoint.jobs += 1
+
+    def _release_pin(self, doc_id: str) -> None:
+        endpoint = self._pins.pop(doc_id, None)
+        if endpoint is not None:
+            endpoint.jobs = max(0, endpoint.jobs - 1)
+
+    def _choose(self) -> ParserEndpoint:
+        candidates = [endpoint for endpoint in self._endpoints if endpoint.available]
+        if not candidates:
+            raise ParserUnavailable("No parser endpoint is available")
+        lowest = min(endpoint.load for endpoint in candidates)
+        return random.choice([endpoint for endpoint in candidates if endpoint.load == lowest])
+
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        *,
+        profile: str,
+        retry: bool = False,
+        endpoint: ParserEndpoint | None = None,
+        stream: bool = False,
+        **kwargs: Any,
+    ) -> httpx.Response:
+        """Send through the endpoint's circuit breaker; ``retry`` is only for idempotent calls.
 
-    async def create_document(self, file_bytes: bytes, filename: str) -> dict[str, Any]:
+        With ``stream=True`` the body is not read; the caller must close the response.
+        """
+        target = endpoint or self._choose()
+        attempts = self._max_retries + 1 if retry else 1
+        for attempt in range(attempts):
+            target.breaker.before_call()
+            target.outstanding += 1
+            try:
+                request = target.client.build_request(
+                    method,
+                    f"{self._prefix}{path}",
+                    timeout=TIMEOUT_PROFILES.get(profile, target.client.timeout),
+                    **kwargs,
+                )
+                response = await target.client.send(request, stream=stream)
+            except httpx.TransportError:
+                target.breaker.record_failure()
+                if attempt + 1 >= attempts:
+                    raise
+                response = None
+            except BaseException:
+                target.breaker.release_probe()
+                raise
+            finally:
+                target.outstanding -= 1
+            if response is None:
+                await asyncio.sleep(retry_delay(attempt))
+                if endpoint is None and not target.available:
+                    target = self._choose()
+                continue
+            if is_failure(None, response):
+                target.breaker.record_failure()
+            else:
+                target.breaker.record_success()
+            if retry and response.status_code in RETRYABLE_STATUS and attempt + 1 < attempts:
+                await response.aclose()
+                await asyncio.sleep(retry_delay(attempt))
+                continue
+            return response
+        raise RuntimeError("unreachable")
+
+    async def _document_request(
+        self,
+        method: str,
+        doc_id: str,
+        path: str,
+        *,
+        profile: str,
+        retry: bool = False,
+        stream: bool = False,
+        **kwargs: Any,
+    ) -> httpx.Response:
+        """Send a ``doc_id`` request to its owning replica, locating it if unpinned."""
+        pinned = self._pins.get(doc_id)
+        if pinned is not None or len(self._endpoints) == 1:
+            return await self._request(
+                method,
+                path,
+                profile=profile,
+                retry=retry,
+                endpoint=pinned or self._endpoints[0],
+                stream=stream,
+                **kwargs,
+            )
+        # Unknown owner (pin lost): a 404 from the wrong replica is harmless, so ask each in turn.
+        response: httpx.Response | None = None
+        for endpoint in sorted(self._endpoints, key=lambda item: not item.available):
+            if response is not None:
+                await response.aclose()
+            try:
+                response = await self._request(
+                    method,
+                    path,
+                    profile=profile,
+                    retry=retry,
+                    endpoint=endpoint,
+                    stream=stream,
+                    **kwargs,
+                )
+            except (ParserUnavailable, httpx.TransportError):
+                continue
+            if response.status_code != 404:
+                if response.is_success:
+                    self._set_pin(doc_id, endpoint)
+                return response
+        if response is None:
+            raise ParserUnavailable("No parser endpoint is available")
+        return response
+
+    async def create_document(
+        self,
+        file_bytes: bytes | BinaryIO,
+        filename: str,
+        callback_url: str | None = None,
+        callback_token: str | None = None,
+    ) -> dict[str, Any]:
         files = {"file": (filename, file_bytes, "application/pdf")}
-        response = await self._client.post(f"{self._prefix}/documents", files=files)
+        data: dict[str, str] = {}
+        if callback_url:
+            data["callback_url"] = callback_url
+            if callback_token:
+                data["callback_token"] = callback_token
+        endpoint = self._choose()
+        # Not retried: the upload stream is consumed and a retry could create a duplicate job.
+        response = await self._request(
+            "POST",
+            "/documents",
+            profile="upload",
+            endpoint=endpoint,
+            files=files,
+            data=data or None,
+        )
         response.raise_for_status()
-        return response.json()
+        payload = response.json()
+        doc_id = payload.get("doc_id") or payload.get("id")
+        if doc_id:
+            self._set_pin(str(doc_id), endpoint)
+        return payload
 
     async def get_document(self, doc_id: str) -> dict[str, Any]:
-        response = await self._client.get(f"{self._prefix}/documents/{doc_id}")
+        response = await self._document_request("GET", doc_id, f"/documents/{doc_id}", profile="poll", retry=True)
+        if response.status_code == 404:
+            self._release_pin(doc_id)
         response.raise_for_status()
         return response.json()
 
+    async def get_system(self) -> dict[str, Any]:
+        response = await self._request("GET", "/system", profile="system", retry=True)
+        response.raise_for_status()
+        return response.json()
+
+    async def get_capacity(self) -> int:
+        """Sum of ``adi_max_concurrent_jobs`` over reachable replicas."""
+
+        async def replica_capacity(endpoint: ParserEndpoint) -> int:
+            response = await self._request("GET", "/system", profile="system", retry=True, endpoint=endpoint)
+            response.raise_for_status()
+            return int(response.json().get("adi_max_concurrent_jobs") or 0)
+
+        results = await asyncio.gather(
+            *(replica_capacity(endpoint) for endpoint in self._endpoints if endpoint.available),
+            return_exceptions=True,
+        )
+        values = [value for value in results if isinstance(value, int)]
+        if not values:
+            raise ParserUnavailable("No parser endpoint reported its capacity")
+        return sum(values)
+
     async def get_chunks(self, doc_id: str) -> dict[str, Any]:
-        response = await self._client.post(f"{self._prefix}/documents/{doc_id}/chunks")
+        response = await self._document_request(
+            "POST",
+            doc_id,
+            f"/documents/{doc_id}/chunks",
+            profile="chunks",
+            retry=True,
+        )
         response.raise_for_status()
         return response.json()
 
     async def get_result(self, doc_id: str) -> dict[str, Any]:
-        response = await self._client.get(f"{self._prefix}/documents/{doc_id}/result")
+        # One-shot on the parser side (deleted after reading), so never retried.
+        response = await self._document_request("GET", doc_id, f"/documents/{doc_id}/result", profile="result")
+        if response.is_success or response.status_code == 404:
+            self._release_pin(doc_id)
         response.raise_for_status()
         return response.json()
 
-    async def embed_text(self, text: str) -> dict[str, Any]:
-        response = await self._client.post(
-            f"{self._prefix}/embeddings", json={"text": text}
+    async def download_result(self, doc_id: str, target: BinaryIO) -> int:
+        """Stream the one-shot result body into ``target`` without decoding it; returns bytes written."""
+        response = await self._document_request(
+            "GET",
+            doc_id,
+            f"/documents/{doc_id}/result",
+            profile="result",
+            stream=True,
+            params=self._embedding_params(),
         )
+        try:
+            if response.is_success or response.status_code == 404:
+                self._release_pin(doc_id)
+            if not response.is_success:
+                await response.aread()
+                response.raise_for_status()
+            size = 0
+            async for chunk in response.aiter_bytes(_RESULT_CHUNK_SIZE):
+                target.write(chunk)
+                size += len(chunk)
+            return size
+        finally:
+            await response.aclose()
+
+    async def embed_text(self, text: str) -> dict[str, Any]:
+        # Once the parser has rejected "texts", coalescing would only add latency.
+        if self._embed_batcher is not None and self._batch_embeddings_supported is not False:
+            return await self._embed_batcher.embed(text)
+        return await self._embed_one(text)
+
+    def _embedding_params(self) -> dict[str, str] | None:
+        # Same option name as the /embeddings body, so the parser reads one setting.
+        if self._embedding_format == "float":
+            return None
+        return {"encoding_format": self._embedding_format}
+
+    def _embedding_body(self, body: dict[str, Any]) -> dict[str, Any]:
+        if self._embedding_format != "float":
+            body["encoding_format"] = self._embedding_format
+        return body
+
+    async def _embed_one(self, text: str) -> dict[str, Any]:
+        response = await self._post_embeddings(self._embedding_body({"text": text}))
         response.raise_for_status()
-        return response.json()
+        payload = response.json()
+        if isinstance(payload, dict) and "embedding" in payload:
+            payload["embedding"] = decode_embedding(payload["embedding"])
+        return payload
+
+    async def _post_embeddings(self, body: dict[str, Any]) -> httpx.Response:
+        async def send() -> httpx.Response:
+            return await self._request("POST", "/embeddings", profile="embed", retry=True, json=body)
+
+        if self._embed_hedge_delay_s > 0:
+            return await hedged(send, self._embed_hedge_delay_s)
+        return await send()
+
+    async def embed_texts(self, texts: list[str]) -> list[dict[str, Any]]:
+        """Embed several texts; each item has the same shape as ``embed_text``'s payload.
+
+        Uses ``{"texts": [...]}`` when the parser accepts it and falls back to
+        concurrent single requests otherwise. The first rejection is cached for
+        the life of the client, so an unsupporting parser is probed only once.
+        """
+        if not texts:
+            return []
+        if len(texts) == 1 or self._batch_embeddings_supported is False:
+            return list(await asyncio.gather(*(self._embed_one(text) for text in texts)))
+        results: list[dict[str, Any]] = []
+        for start in range(0, len(texts), self._embed_batch_max):
+            batch = texts[start:start + self._embed_batch_max]
+            batch_results = (
+                await self._embed_batch(batch) if self._batch_embeddings_supported is not False else None
+            )
+            if batch_results is None:
+                self._batch_embeddings_supported = False
+                batch_results = list(await asyncio.gather(*(self._embed_one(text) for text in batch)))
+            else:
+                self._batch_embeddings_supported = True
+            results.extend(batch_results)
+        return results
+
+    async def _embed_batch(self, texts: list[str]) -> list[dict[str, Any]] | None:
+        response = await self._post_embeddings(self._embedding_body({"texts": texts}))
+        # Any client error other than rate limiting means the body shape is not understood.
+        if (
+            400 <= response.status_code < 500
+            and response.status_code != 429
+            and self._batch_embeddings_supported is not True
+        ):
+            return None
+        response.raise_for_status()
+        payload = response.json()
+        embeddings = _batch_embeddings(payload, len(texts))
+        if embeddings is None:
+            return None
+        model = payload.get("model")
+        usages = _split_usage(payload.get("usage"), texts)
+        items: list[dict[str, Any]] = []
+        for embedding, usage in zip(embeddings, usages):
+            item: dict[str, Any] = {"embedding": embedding}
+            if usage is not None:
+                item["usage"] = usage
+            if model is not None:
+                item["model"] = model
+            items.append(item)
+        return items
 
     async def create_answer(
         self,
@@ -66,13 +561,12 @@ class ParserClient:
         payload: dict[str, Any] = {"question": question, "context": context}
         if model:
             payload["model"] = model
-        response = await self._client.post(f"{self._prefix}/answers", json=payload)
+        response = await self._request("POST", "/answers", profile="answer", json=payload)
         response.raise_for_status()
         return response.json()
 
-    def _ws_url(self, path: str) -> str:
-        base = self._client.base_url
-        parsed = urlparse(str(base))
+    def _ws_url(self, endpoint: ParserEndpoint, path: str) -> str:
+        parsed = urlparse(endpoint.key)
         scheme = "wss" if parsed.scheme == "https" else "ws"
         base_path = parsed.path.rstrip("/")
         full_path = f"{base_path}{self._prefix}{path}"
@@ -87,35 +581,58 @@ class ParserClient:
             )
         )
 
+    async def _connect_answer_ws(self) -> Any:
+        endpoint = self._choose()
+        url = self._ws_url(endpoint, "/ws/answers")
+        headers = {"X-API-Key": self._api_key}
+        endpoint.breaker.before_call()
+        try:
+            try:
+                websocket = await websockets.connect(
+                    url,
+                    additional_headers=headers,
+                    ping_interval=30,
+                    ping_timeout=120,
+                    close_timeout=10,
+                )
+            except TypeError:
+                websocket = await websockets.connect(
+                    url,
+                    extra_headers=headers,
+                    ping_interval=30,
+                    ping_timeout=120,
+                    close_timeout=10,
+                )
+        except (OSError, asyncio.TimeoutError, websockets.InvalidHandshake):
+            endpoint.breaker.record_failure()
+            raise
+        except BaseException:
+            endpoint.breaker.release_probe()
+            raise
+        endpoint.breaker.record_success()
+        return websocket
+
     async def stream_answer(
         self,
         question: str,
         context: str,
         model: str | None = None,
     ) -> AsyncGenerator[dict[str, Any], None]:
-        url = self._ws_url("/ws/answers")
         payload: dict[str, Any] = {"question": question, "context": context}
         if model:
             payload["model"] = model
-        headers = {"X-API-Key": self._client.headers.get("X-API-Key", "")}
+        pooled = self._ws_pool is not None
+        websocket = await self._ws_pool.acquire() if pooled else await self._connect_answer_ws()
         try:
-            websocket_ctx = websockets.connect(
-                url,
-                additional_headers=headers,
-                ping_interval=30,
-                ping_timeout=120,
-                close_timeout=10,
-            )
-        except TypeError:
-            websocket_ctx = websockets.connect(
-                url,
-                extra_headers=headers,
-                ping_interval=30,
-                ping_timeout=120,
-                close_timeout=10,
-            )
-        async with websocket_ctx as websocket:
-            await websocket.send(json.dumps(payload))
+            try:
+                await websocket.send(json.dumps(payload))
+            except websockets.ConnectionClosed:
+                if not pooled:
+                    raise
+                # A pooled socket died while idle; nothing was sent, so a fresh one is safe.
+                await websocket.close()
+                websocket = await self._connect_answer_ws()
+                await websocket.send(json.dumps(payload))
             async for message in websocket:
                 try:
                     data = json.loads(message)
@@ -123,3 +640,5 @@ class ParserClient:
                     continue
                 if isinstance(data, dict):
                     yield data
+        finally:
+            await websocket.close()
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
+
+from app.services.parser_client import ParserClient
+
+logger = logging.getLogger("uvicorn.error")
+
+DEFAULT_PARSER_CAPACITY = 3
+
+
+class ParserScheduler:
+    """Admit parser jobs fairly across users without oversubscribing the parser.
+
+    A slot is held from ``create_document`` until the result has been fetched,
+    which is how long the job occupies one of the parser's
+    ``adi_max_concurrent_jobs`` (summed over replicas). Waiting jobs are
+    ordered by start-time fair queueing: a job starts at ``max(virtual_time, user's last finish)`` and
+    finishes ``1 / weight`` later, so a user with many queued files cannot
+    starve others and higher weights (paid plans) get proportionally more slots.
+
+    The global limit is enforced in Postgres, where every process sees the
+    same jobs: ``claim_ingestion_job`` only claims a new parser job while
+    fewer than ``capacity`` jobs hold a slot, and pipelined uploads check the
+    same count before bypassing the queue. The in-process slots here add the
+    weighting and keep a single process from racing itself between claims.
+    """
+
+    def __init__(
+        self,
+        parser_client: ParserClient,
+        capacity: int | None = None,
+        capacity_refresh_s: float = 300.0,
+    ) -> None:
+        self._parser = parser_client
+        self._fixed_capacity = capacity
+        self._capacity = max(1, int(capacity or DEFAULT_PARSER_CAPACITY))
+        self._capacity_refresh_s = capacity_refresh_s
+        self._capacity_checked_at = 0.0 if capacity is None else float("inf")
+        self._in_flight = 0
+        self._virtual_time = 0.0
+        self._last_finish: dict[str, float] = {}
+        self._waiters: list[tuple[float, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._handoffs: dict[str, float] = {}
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "capacity": self._capacity,
+            "in_flight": self._in_flight,
+            "waiting": len(self._waiters),
+            "handoffs": len(self._handoffs),
+        }
+
+    async def refresh_capacity(self) -> int:
+        if self._fixed_capacity is not None:
+            return self._capacity
+        if time.monotonic() - self._capacity_checked_at < self._capacity_refresh_s:
+            return self._capacity
+        self._capacity_checked_at = time.monotonic()
+        try:
+            value = await self._parser.get_capacity()
+        except Exception:
+            logger.warning("parser capacity lookup failed; keeping capacity=%d", self._capacity)
+            return self._capacity
+        if value > 0 and value != self._capacity:
+            logger.info("parser capacity changed %d -> %d", self._capacity, value)
+            self._capacity = value
+            self._dispatch()
+        return self._capacity
+
+    def try_acquire(self) -> bool:
+        """Take a slot only if one is free and nobody is waiting."""
+        self._expire_handoffs()
+        if self._waiters or self._in_flight >= self._capacity:
+            return False
+        self._in_flight += 1
+        return True
+
+    def release(self) -> None:
+        self._in_flight = max(0, self._in_flight - 1)
+        self._dispatch()
+
+    def hand_over(self, key: str, ttl_s: float = 120.0) -> None:
+        """Keep the caller's slot for the queued job that resumes parser job ``key``.
+
+        The job takes it with ``slot(..., wait=False, resume_key=key)``. If the
+        job is claimed by another process, the slot is released after ``ttl_s``.
+        """
+        self._expire_handoffs()
+        self._handoffs[key] = time.monotonic() + ttl_s
+
+    def _expire_handoffs(self) -> None:
+        now = time.monotonic()
+        for key in [key for key, deadline in self._handoffs.items() if deadline <= now]:
+            del self._handoffs[key]
+            self.release()
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        user_id: str,
+        weight: float = 1.0,
+        wait: bool = True,
+        resume_key: str | None = None,
+    ) -> AsyncIterator[None]:
+        """Hold one parser slot; ``wait=False`` is for jobs already running on the parser."""
+        if wait:
+            await self._acquire(user_id, weight)
+        elif resume_key is None or self._handoffs.pop(resume_key, None) is None:
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def _acquire(self, user_id: str, weight: float) -> None:
+        await self.refresh_capacity()
+        self._expire_handoffs()
+        start = max(self._virtual_time, self._last_finish.get(user_id, 0.0))
+        self._last_finish[user_id] = start + 1.0 / max(weight, 0.01)
+        if not self._waiters and self._in_flight < self._capacity:
+            self._in_flight += 1
+            self._advance(start)
+            return
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (start, next(self._sequence), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just before cancellation: hand the slot on.
+                self.release()
+            raise
+
+    def _advance(self, start: float) -> None:
+        self._virtual_time = max(self._virtual_time, start)
+        if len(self._last_finish) > 1024:
+            self._last_finish = {
+                user_id: value
+                for user_id, value in self._last_finish.items()
+                if value > self._virtual_time
+            }
+
+    def _dispatch(self) -> None:
+        while self._waiters and self._in_flight < self._capacity:
+            start, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self._in_flight += 1
+            self._advance(start)
+            future.set_result(None)
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, TypeVar
+
+import httpx
+
+logger = logging.getLogger("uvicorn.error")
+
+T = TypeVar("T")
+
+# Per-operation timeouts; uploads get a long write budget, status polls fail fast.
+TIMEOUT_PROFILES: dict[str, httpx.Timeout] = {
+    "poll": httpx.Timeout(10.0, connect=5.0),
+    "system": httpx.Timeout(10.0, connect=5.0),
+    "embed": httpx.Timeout(20.0, connect=5.0),
+    "upload": httpx.Timeout(120.0, connect=10.0, write=300.0),
+    "result": httpx.Timeout(180.0, connect=10.0),
+    "chunks": httpx.Timeout(120.0, connect=10.0),
+    "answer": httpx.Timeout(120.0, connect=10.0),
+}
+# 429 is left to callers: the parser's limits are per minute, so a sub-second retry only
+# spends more of the budget.
+RETRYABLE_STATUS = {502, 503, 504}
+
+
+class ParserUnavailable(RuntimeError):
+    """The parser circuit is open; calls fail fast until the cooldown passes."""
+
+
+def http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with a single half-open probe."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout_s: float = 30.0) -> None:
+        self._threshold = max(1, int(failure_threshold))
+        self._reset_timeout_s = reset_timeout_s
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self._reset_timeout_s:
+            return "half_open"
+        return "open"
+
+    def stats(self) -> dict[str, Any]:
+        return {"state": self.state, "consecutive_failures": self._failures}
+
+    def before_call(self) -> None:
+        state = self.state
+        if state == "open":
+            raise ParserUnavailable("Parser is unavailable")
+        if state == "half_open":
+            if self._probe_in_flight:
+                raise ParserUnavailable("Parser is unavailable")
+            self._probe_in_flight = True
+
+    def record_success(self) -> None:
+        if self._opened_at is not None:
+            logger.info("parser circuit closed")
+        self._failures = 0
+        self._opened_at = None
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        self._probe_in_flight = False
+        if self._opened_at is not None or self._failures >= self._threshold:
+            if self._opened_at is None:
+                logger.warning("parser circuit opened failures=%d", self._failures)
+            self._opened_at = time.monotonic()
+
+    def release_probe(self) -> None:
+        self._probe_in_flight = False
+
+
+def is_failure(exc: BaseException | None, response: httpx.Response | None) -> bool:
+    """Whether an outcome says the parser itself is unhealthy (not a client error)."""
+    if exc is not None:
+        return isinstance(exc, httpx.TransportError)
+    return response is not None and response.status_code >= 500
+
+
+def retry_delay(attempt: int, base_s: float = 0.2, max_s: float = 2.0) -> float:
+    return random.uniform(0.0, min(max_s, base_s * (2 ** attempt)))
+
+
+async def hedged(call: Callable[[], Awaitable[T]], delay_s: float) -> T:
+    """Run ``call``; if it has not finished after ``delay_s``, race a second copy."""
+    tasks = [asyncio.ensure_future(call())]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay_s)
+        if not done:
+            tasks.append(asyncio.ensure_future(call()))
+        pending = set(tasks)
+        error: BaseException | None = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error  # type: ignore[misc]
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+class ParserEndpoint:
+    """One parser replica: its HTTP client, breaker and load counters."""
+
+    def __init__(self, base_url: str, client: httpx.AsyncClient, breaker: CircuitBreaker) -> None:
+        self.key = base_url
+        self.client = client
+        self.breaker = breaker
+        self.outstanding = 0
+        self.jobs = 0
+
+    @property
+    def available(self) -> bool:
+        return self.breaker.state != "open"
+
+    @property
+    def load(self) -> int:
+        # Pinned jobs keep the replica busy long after their upload request returns.
+        return self.outstanding + self.jobs
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "endpoint": self.key,
+            "outstanding": self.outstanding,
+            "jobs": self.jobs,
+            **self.breaker.stats(),
+        }
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable
+
+logger = logging.getLogger("uvicorn.error")
+
+
+def websocket_is_open(websocket: Any) -> bool:
+    state = getattr(websocket, "state", None)
+    if state is not None:
+        return getattr(state, "name", "") == "OPEN"
+    return bool(getattr(websocket, "open", False))
+
+
+class ParserWebSocketPool:
+    """Keep a few handshaken ``/ws/answers`` sockets ready for the next answer.
+
+    The parser protocol carries one question per socket, so sockets are not
+    reused: each ``acquire`` hands one out and the pool opens a replacement in
+    the background. Idle sockets older than ``max_idle_s`` or found closed are
+    dropped, and failed connects back off before retrying.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Awaitable[Any]],
+        size: int = 2,
+        max_idle_s: float = 45.0,
+        max_backoff_s: float = 30.0,
+    ) -> None:
+        self._connect = connect
+        self._size = max(0, int(size))
+        self._max_idle_s = max_idle_s
+        self._max_backoff_s = max_backoff_s
+        self._idle: list[tuple[float, Any]] = []
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._closed = False
+        self._hits = 0
+        self._misses = 0
+
+    def stats(self) -> dict[str, Any]:
+        return {"size": self._size, "idle": len(self._idle), "hits": self._hits, "misses": self._misses}
+
+    async def acquire(self) -> Any:
+        self._ensure_started()
+        while self._idle:
+            opened_at, websocket = self._idle.pop()
+            if websocket_is_open(websocket) and time.monotonic() - opened_at < self._max_idle_s:
+                self._hits += 1
+                self._wakeup.set()
+                return websocket
+            await self._close_quietly(websocket)
+        self._misses += 1
+        self._wakeup.set()
+        return await self._connect()
+
+    async def close(self) -> None:
+        self._closed = True
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        idle, self._idle = self._idle, []
+        for _, websocket in idle:
+            await self._close_quietly(websocket)
+
+    def _ensure_started(self) -> None:
+        if self._task is None and not self._closed and self._size > 0:
+            self._task = asyncio.create_task(self._maintain())
+
+    async def _maintain(self) -> None:
+        backoff = 1.0
+        while not self._closed:
+            await self._prune()
+            try:
+                while len(self._idle) < self._size:
+                    websocket = await self._connect()
+                    self._idle.append((time.monotonic(), websocket))
+                backoff = 1.0
+                timeout = self._max_idle_s / 2
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning("parser ws pool connect failed error=%s retry_s=%.1f", exc, backoff)
+                timeout = backoff
+                backoff = min(backoff * 2, self._max_backoff_s)
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _prune(self) -> None:
+        now = time.monotonic()
+        keep: list[tuple[float, Any]] = []
+        for opened_at, websocket in self._idle:
+            if websocket_is_open(websocket) and now - opened_at < self._max_idle_s:
+                keep.append((opened_at, websocket))
+            else:
+                await self._close_quietly(websocket)
+        self._idle = keep
+
+    @staticmethod
+    async def _close_quietly(websocket: Any) -> None:
+        try:
+            await websocket.close()
+        except Exception:
+            pass
@@ -11,12 +11,13 @@ class PlanLimits:
     max_file_mb: int | None
     max_messages_per_thread: int | None
     max_threads_per_document: int | None
+    parser_weight: int = 1
 
 
 PLAN_LIMITS: dict[str, PlanLimits] = {
     "guest": PlanLimits(max_files=1, max_file_mb=10, max_messages_per_thread=8, max_threads_per_document=None),
     "free": PlanLimits(max_files=5, max_file_mb=20, max_messages_per_thread=20, max_threads_per_document=None),
-    "plus": PlanLimits(max_files=50, max_file_mb=50, max_messages_per_thread=120, max_threads_per_document=None),
+    "plus": PlanLimits(max_files=50, max_file_mb=50, max_messages_per_thread=120, max_threads_per_document=None, parser_weight=4),
 }
 
 
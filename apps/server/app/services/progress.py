@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from typing import Any
+
+import asyncpg
+
+logger = logging.getLogger("uvicorn.error")
+
+PROGRESS_CHANNEL = "document_progress"
+
+
+class ProgressBroker:
+    """Fan out ``document_progress`` notifications to per-user subscribers.
+
+    Holds one dedicated LISTEN connection (outside the pool, which may sit
+    behind a transaction-mode pooler that drops LISTEN) and reconnects on loss.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        channel: str = PROGRESS_CHANNEL,
+        queue_size: int = 100,
+        reconnect_s: float = 5.0,
+    ) -> None:
+        self._dsn = dsn
+        self._channel = channel
+        self._queue_size = queue_size
+        self._reconnect_s = reconnect_s
+        self._subscribers: dict[str, set[asyncio.Queue]] = {}
+        self._stopping = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._stopping.set()
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    def subscribe(self, user_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self._queue_size)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue) -> None:
+        queues = self._subscribers.get(user_id)
+        if not queues:
+            return
+        queues.discard(queue)
+        if not queues:
+            self._subscribers.pop(user_id, None)
+
+    def publish(self, event: dict[str, Any]) -> None:
+        user_id = event.get("user_id")
+        for queue in list(self._subscribers.get(str(user_id), ())):
+            if queue.full():
+                # Slow consumer: drop the oldest event; later ones carry the latest state.
+                try:
+                    queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    pass
+            queue.put_nowait(event)
+
+    def _on_notification(self, conn, pid: int, channel: str, payload: str) -> None:
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            logger.warning("progress notification ignored payload=%r", payload[:200])
+            return
+        if isinstance(event, dict):
+            self.publish(event)
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            conn: asyncpg.Connection | None = None
+            try:
+                conn = await asyncpg.connect(self._dsn, statement_cache_size=0)
+                lost = asyncio.Event()
+                conn.add_termination_listener(lambda _conn: lost.set())
+                await conn.add_listener(self._channel, self._on_notification)
+                logger.info("progress broker listening channel=%s", self._channel)
+                await lost.wait()
+                logger.warning("progress broker connection lost; reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("progress broker listen failed")
+            finally:
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+            if not self._stopping.is_set():
+                await asyncio.sleep(self._reconnect_s)
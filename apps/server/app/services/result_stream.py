@@ -0,0 +1,150 @@
+"""Incremental decoding of spooled parser results.
+
+A ``/result`` body holds every page, word, paragraph and chunk embedding of a
+document. Instead of building that whole object graph, the decoder walks the
+spooled JSON once and yields one event per list item or top-level field:
+
+* ``("page", item)`` / ``("paragraph", item)`` / ``("word", item)`` /
+  ``("chunk", item)`` for items of the matching top-level list
+* ``("field", (key, value))`` for any other top-level key (and for those
+  lists when they are empty)
+
+so only one item is alive at a time. Falls back to ``json.load`` (same events)
+when ijson is not installed.
+"""
+from __future__ import annotations
+
+import json
+from typing import Any, AsyncIterator, BinaryIO, Iterator
+
+import anyio
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+ResultEvent = tuple[str, Any]
+
+STREAMED_LISTS = {
+    "pages": "page",
+    "paragraphs": "paragraph",
+    "words": "word",
+    "chunks": "chunk",
+}
+_START_EVENTS = {"start_map", "start_array"}
+_END_EVENTS = {"end_map", "end_array"}
+
+
+def streaming_available() -> bool:
+    return ijson is not None
+
+
+def iter_result_events(source: BinaryIO) -> Iterator[ResultEvent]:
+    if ijson is None:
+        yield from _iter_loaded(json.load(source))
+        return
+    yield from _iter_incremental(source)
+
+
+def iter_result_batches(source: BinaryIO, batch_size: int = 200) -> Iterator[list[ResultEvent]]:
+    """Group events so callers crossing a thread boundary pay per batch, not per item."""
+    batch: list[ResultEvent] = []
+    for event in iter_result_events(source):
+        batch.append(event)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def aiter_result_file(path: str, batch_size: int = 200) -> AsyncIterator[list[ResultEvent]]:
+    """Decode a spooled result in a worker thread, one batch at a time."""
+    with open(path, "rb") as source:
+        batches = iter_result_batches(source, batch_size)
+        while True:
+            batch = await anyio.to_thread.run_sync(next, batches, None)
+            if batch is None:
+                return
+            yield batch
+
+
+def _iter_loaded(payload: Any) -> Iterator[ResultEvent]:
+    if isinstance(payload, list):
+        # Bare chunk list, as accepted by the indexer's chunk normalization.
+        for item in payload:
+            yield "chunk", item
+        return
+    if not isinstance(payload, dict):
+        raise ValueError("Invalid parser result")
+    for key, value in payload.items():
+        kind = STREAMED_LISTS.get(key)
+        if kind is not None and isinstance(value, list) and value:
+            for item in value:
+                yield kind, item
+        else:
+            yield "field", (key, value)
+
+
+def _iter_incremental(source: BinaryIO) -> Iterator[ResultEvent]:
+    # depth 1 = inside the top-level object, 2 = inside one of STREAMED_LISTS.
+    depth = 0
+    key: str | None = None
+    kind: str | None = None
+    builder: Any = None
+    nesting = 0
+    items = 0
+    root_list = False
+    for _, event, value in ijson.parse(source, use_float=True):
+        if builder is not None:
+            builder.event(event, value)
+            if event in _START_EVENTS:
+                nesting += 1
+            elif event in _END_EVENTS:
+                nesting -= 1
+            if nesting == 0:
+                yield (kind, builder.value) if kind else ("field", (key, builder.value))
+                builder = None
+            continue
+
+        if depth == 0:
+            if event == "start_map":
+                depth = 1
+            elif event == "start_array":
+                depth, kind, root_list = 2, "chunk", True
+            else:
+                raise ValueError("Invalid parser result")
+            continue
+
+        if depth == 1:
+            if event == "map_key":
+                key = value
+                continue
+            if event == "end_map":
+                depth = 0
+                continue
+            list_kind = STREAMED_LISTS.get(key or "")
+            if list_kind is not None and event == "start_array":
+                depth, kind, items = 2, list_kind, 0
+                continue
+            kind = None
+            if event in _START_EVENTS:
+                builder, nesting = ijson.ObjectBuilder(), 1
+                builder.event(event, value)
+            else:
+                yield "field", (key, value)
+            continue
+
+        # depth == 2: items of a streamed list.
+        if event == "end_array":
+            if items == 0 and not root_list:
+                yield "field", (key, [])
+            depth, kind = (0, None) if root_list else (1, None)
+            continue
+        items += 1
+        if event in _START_EVENTS:
+            builder, nesting = ijson.ObjectBuilder(), 1
+            builder.event(event, value)
+        else:
+            yield kind, value  # type: ignore[misc]
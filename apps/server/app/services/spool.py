@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import time
+from typing import BinaryIO, Iterable
+from uuid import uuid4
+
+import anyio
+from fastapi import UploadFile
+
+logger = logging.getLogger("uvicorn.error")
+
+SPOOL_CHUNK_SIZE = 1024 * 1024
+DEFAULT_SPOOL_DIR = os.path.join(tempfile.gettempdir(), "askpdf-uploads")
+_PDF_PAGE_PATTERN = re.compile(rb"/Type\s*/Page(?![A-Za-z])")
+_PAGE_PATTERN_OVERLAP = 32
+
+
+class SpoolLimitExceeded(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class SpooledFile:
+    path: str
+    size: int
+    sha256: str
+    head: bytes
+    page_estimate: int | None
+
+
+def _spool_path(directory: str, suffix: str = ".pdf") -> str:
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"{uuid4().hex}{suffix}")
+
+
+def new_spool_path(directory: str, suffix: str) -> str:
+    """Path for another kind of spooled body (e.g. a parser result); swept like uploads."""
+    return _spool_path(directory, suffix)
+
+
+def _write_chunks(chunks: Iterable[bytes], target: str, max_bytes: int | None) -> SpooledFile:
+    digest = hashlib.sha256()
+    size = 0
+    pages = 0
+    head = b""
+    tail = b""
+    try:
+        with open(target, "wb") as out:
+            for chunk in chunks:
+                if not chunk:
+                    continue
+                size += len(chunk)
+                if max_bytes is not None and size > max_bytes:
+                    raise SpoolLimitExceeded("File size limit exceeded")
+                if len(head) < 8:
+                    head = (head + chunk)[:8]
+                digest.update(chunk)
+                window = tail + chunk
+                pages += len(_PDF_PAGE_PATTERN.findall(window))
+                # Keep a short overlap so markers split across chunks are counted once.
+                tail = window[-_PAGE_PATTERN_OVERLAP:]
+                pages -= len(_PDF_PAGE_PATTERN.findall(tail))
+                out.write(chunk)
+    except BaseException:
+        remove_spooled_file(target)
+        raise
+    pages += len(_PDF_PAGE_PATTERN.findall(tail))
+    return SpooledFile(
+        path=target,
+        size=size,
+        sha256=digest.hexdigest(),
+        head=head,
+        page_estimate=pages or None,
+    )
+
+
+def _iter_file(source: BinaryIO) -> Iterable[bytes]:
+    while True:
+        chunk = source.read(SPOOL_CHUNK_SIZE)
+        if not chunk:
+            return
+        yield chunk
+
+
+def spool_stream(source: BinaryIO, directory: str, max_bytes: int | None = None) -> SpooledFile:
+    return _write_chunks(_iter_file(source), _spool_path(directory), max_bytes)
+
+
+def spool_chunks(chunks: Iterable[bytes], directory: str) -> SpooledFile:
+    return _write_chunks(chunks, _spool_path(directory), None)
+
+
+async def spool_upload(
+    file: UploadFile,
+    directory: str,
+    max_bytes: int | None = None,
+) -> SpooledFile:
+    """Copy an upload into the spool directory in fixed-size chunks."""
+    await file.seek(0)
+    return await anyio.to_thread.run_sync(spool_stream, file.file, directory, max_bytes)
+
+
+def remove_spooled_file(path: str | None) -> None:
+    if not path:
+        return
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError:
+        logger.exception("spool remove failed path=%s", path)
+
+
+def sweep_spool_dir(directory: str, max_age_s: float) -> int:
+    """Delete spool files left behind by crashed or drained processes."""
+    if not os.path.isdir(directory):
+        return 0
+    cutoff = time.time() - max_age_s
+    removed = 0
+    for entry in os.scandir(directory):
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except OSError:
+            continue
+    return removed
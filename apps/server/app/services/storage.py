@@ -3,7 +3,9 @@ from __future__ import annotations
 from dataclasses import dataclass, field
 import logging
 import time
+from typing import Iterator
 
+import httpx
 from supabase import Client, create_client
 
 logger = logging.getLogger("uvicorn.error")
@@ -22,6 +24,15 @@ class StorageClient:
             file_options={"content-type": "application/pdf"},
         )
 
+    def upload_pdf_file(self, storage_path: str, file_path: str) -> None:
+        # A file handle is streamed by the storage client instead of being read into memory.
+        with open(file_path, "rb") as handle:
+            self.client.storage.from_(self.bucket).upload(
+                storage_path,
+                handle,
+                file_options={"content-type": "application/pdf"},
+            )
+
     def create_signed_url(self, storage_path: str, expires_in: int = 3600) -> tuple[str, float]:
         now = time.time()
         cached = self.signed_url_cache.get(storage_path)
@@ -48,6 +59,15 @@ class StorageClient:
             return bytes(payload)
         raise RuntimeError("Unexpected storage download response")
 
+    def iter_pdf(self, storage_path: str, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+        signed_url, _ = self.create_signed_url(storage_path, expires_in=600)
+        if not signed_url:
+            raise RuntimeError("Failed to create signed URL")
+        with httpx.Client(timeout=60.0) as client:
+            with client.stream("GET", signed_url) as response:
+                response.raise_for_status()
+                yield from response.iter_bytes(chunk_size)
+
 
 def create_storage_client(url: str, service_role_key: str, bucket: str) -> StorageClient:
     base_url = url.rstrip("/") + "/"
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import sys
+import time
+from collections import OrderedDict
+from typing import Any
+
+from app.db import repository
+from app.db.vector import vector_as_numpy
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger("uvicorn.error")
+
+
+class _DocumentVectors:
+    __slots__ = ("rows", "matrix", "nbytes")
+
+    def __init__(self, rows: list[dict[str, Any]], matrix: Any) -> None:
+        self.rows = rows
+        self.matrix = matrix
+        self.nbytes = matrix.nbytes + sum(
+            sys.getsizeof(row.get("content") or "") + sys.getsizeof(row.get("metadata") or "")
+            for row in rows
+        )
+
+
+class DocumentVectorCache:
+    """Per-document chunk embeddings held as L2-normalized float32 matrices.
+
+    Chat turns always search one document whose chunks do not change after
+    ingestion, so the first search loads its vectors and later turns rank with
+    one matrix-vector product instead of a database round trip. Similarity is
+    cosine, matching ``1 - (embedding <=> query)`` in ``match_documents``.
+    Documents are evicted LRU once ``max_bytes`` is exceeded; a document larger
+    than the budget is ranked from a fresh load each time and never kept.
+    """
+
+    def __init__(self, pool, max_bytes: int = 256 * 1024 * 1024) -> None:
+        self._pool = pool
+        self._max_bytes = max(0, int(max_bytes))
+        self._entries: OrderedDict[str, _DocumentVectors] = OrderedDict()
+        self._loading: dict[str, asyncio.Future] = {}
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return np is not None and self._max_bytes > 0
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self._hits + self._misses
+        return {
+            "enabled": self.enabled,
+            "documents": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self._max_bytes,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(self._hits / lookups, 4) if lookups else None,
+        }
+
+    def invalidate(self, document_id: str) -> None:
+        entry = self._entries.pop(str(document_id), None)
+        if entry is not None:
+            self._bytes -= entry.nbytes
+
+    async def search(
+        self,
+        document_id: str,
+        query_embedding: Any,
+        match_count: int,
+        conn=None,
+    ) -> list[dict[str, Any]] | None:
+        """Top ``match_count`` chunks by cosine similarity, or None to use the database.
+
+        ``conn`` is used to load a missing document so a caller already holding
+        a connection does not take a second one from the pool.
+        """
+        if not self.enabled:
+            return None
+        key = str(document_id)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._hits += 1
+            self._entries.move_to_end(key)
+        else:
+            self._misses += 1
+            entry = await self._load(key, conn)
+            if entry is None:
+                return None
+        return self._rank(entry, query_embedding, match_count)
+
+    @staticmethod
+    def _rank(entry: _DocumentVectors, query_embedding: Any, match_count: int) -> list[dict[str, Any]]:
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(query))
+        if norm == 0.0 or query.shape[0] != entry.matrix.shape[1]:
+            return []
+        scores = entry.matrix @ (query / norm)
+        count = min(max(int(match_count), 0), scores.shape[0])
+        if count == 0:
+            return []
+        if count < scores.shape[0]:
+            top = np.argpartition(-scores, count - 1)[:count]
+            top = top[np.argsort(-scores[top])]
+        else:
+            top = np.argsort(-scores)
+        return [{**entry.rows[idx], "similarity": float(scores[idx])} for idx in top.tolist()]
+
+    async def _load(self, key: str, conn) -> _DocumentVectors | None:
+        loading = self._loading.get(key)
+        if loading is not None:
+            try:
+                return await asyncio.shield(loading)
+            except asyncio.CancelledError:
+                if loading.cancelled():
+                    return await self._load(key, conn)
+                raise
+            except Exception:
+                return None
+
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._loading[key] = future
+        try:
+            started = time.perf_counter()
+            if conn is not None:
+                rows = await repository.list_document_chunk_vectors_conn(conn, key)
+            else:
+                async with self._pool.acquire() as pooled:
+                    rows = await repository.list_document_chunk_vectors_conn(pooled, key)
+            entry = self._build(rows)
+            future.set_result(entry)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            logger.exception("vector cache load failed document=%s", key)
+            future.set_exception(exc)
+            future.exception()
+            return None
+        finally:
+            self._loading.pop(key, None)
+
+        if entry is not None:
+            self._store(key, entry)
+            logger.info(
+                "vector cache loaded document=%s chunks=%d bytes=%d ms=%.1f",
+                key,
+                len(entry.rows),
+                entry.nbytes,
+                (time.perf_counter() - started) * 1000,
+            )
+        return entry
+
+    @staticmethod
+    def _build(rows: list[dict[str, Any]]) -> _DocumentVectors | None:
+        rows = [row for row in rows if row.get("embedding") is not None]
+        if not rows:
+            # Nothing ingested yet (or still processing): do not cache an empty result.
+            return None
+        # Rows arrive as array('f') from the binary codec; stacking their buffers is one copy.
+        matrix = np.vstack([vector_as_numpy(row.pop("embedding")) for row in rows])
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0.0] = 1.0
+        matrix /= norms
+        return _DocumentVectors(rows, np.ascontiguousarray(matrix))
+
+    def _store(self, key: str, entry: _DocumentVectors) -> None:
+        if entry.nbytes > self._max_bytes:
+            return
+        self.invalidate(key)
+        self._entries[key] = entry
+        self._bytes += entry.nbytes
+        while self._bytes > self._max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
@@ -0,0 +1,74 @@
+"""Standalone ingestion worker.
+
+Run beside the API (with ``INGESTION_WORKERS=0`` on the API side) to scale
+ingestion independently::
+
+    python -m app.worker
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import signal
+
+from app.config import get_settings
+from app.db.pool import close_pool, create_pool
+from app.services.indexer import Indexer
+from app.services.ingestion_queue import create_ingestion_queue
+from app.services.parser_client import ParserClient
+from app.services.parser_scheduler import ParserScheduler
+from app.services.storage import create_storage_client
+
+logger = logging.getLogger("uvicorn.error")
+
+
+async def run_worker() -> None:
+    settings = get_settings()
+    parser_client = ParserClient(
+        base_url=settings.parser_api_base_url,
+        api_key=settings.parser_api_key,
+        api_prefix=settings.parser_api_prefix,
+        http2=settings.parser_http2,
+        max_retries=settings.parser_max_retries,
+        breaker_threshold=settings.parser_breaker_threshold,
+        breaker_reset_s=settings.parser_breaker_reset_s,
+        embedding_format=settings.parser_embedding_format,
+    )
+    pool = await create_pool(settings.database_url)
+    storage_client = create_storage_client(
+        settings.supabase_url,
+        settings.supabase_service_role_key,
+        settings.supabase_bucket,
+    )
+    indexer = Indexer(
+        parser_client,
+        storage_client,
+        max_attempts=settings.ingestion_max_attempts,
+        callback_url=settings.parser_callback_url,
+        callback_token=settings.parser_callback_secret,
+        spool_dir=settings.upload_spool_dir,
+        pipelined=settings.ingestion_pipelined,
+        scheduler=ParserScheduler(parser_client, capacity=settings.parser_max_concurrent_jobs),
+    )
+    queue = create_ingestion_queue(pool, indexer, settings, workers=max(settings.ingestion_workers, 1))
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            pass
+
+    queue.start()
+    try:
+        await stop_event.wait()
+    finally:
+        await queue.stop(settings.ingestion_drain_timeout_s)
+        await parser_client.close()
+        await close_pool(pool)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run_worker())
@@ -0,0 +1,66 @@
+"""Strip chunk embeddings from stored parser results and optionally page legacy rows.
+
+Usage (from apps/server)::
+
+    python -m scripts.backfill_slim_results --batch-size 50
+    python -m scripts.backfill_slim_results --paginate
+
+The vectors stay in ``document_chunks``; only the duplicate copy inside
+``documents.result`` is removed. Safe to re-run: already slimmed or paged
+rows are skipped.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+
+import asyncpg
+
+from app.db import repository
+
+
+async def _strip_embeddings(pool: asyncpg.Pool, batch_size: int) -> int:
+    total = 0
+    while True:
+        updated = await repository.strip_result_chunk_embeddings_batch(pool, limit=batch_size)
+        if not updated:
+            return total
+        total += updated
+        print(f"stripped embeddings rows={total}")
+
+
+async def _paginate(pool: asyncpg.Pool, batch_size: int) -> int:
+    total = 0
+    after_id: str | None = None
+    while True:
+        ids = await repository.list_unpaged_result_document_ids(pool, after_id=after_id, limit=batch_size)
+        if not ids:
+            return total
+        for document_id in ids:
+            if await repository.repage_document_result(pool, document_id):
+                total += 1
+        after_id = ids[-1]
+        print(f"paged results rows={total}")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--paginate", action="store_true", help="also move legacy results into per-page rows")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", ""))
+    args = parser.parse_args()
+    if not args.database_url:
+        raise SystemExit("DATABASE_URL is required")
+
+    pool = await asyncpg.create_pool(args.database_url, min_size=1, max_size=2, statement_cache_size=0)
+    try:
+        stripped = await _strip_embeddings(pool, args.batch_size)
+        paged = await _paginate(pool, args.batch_size) if args.paginate else 0
+    finally:
+        await pool.close()
+    print(f"done stripped={stripped} paged={paged}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,140 @@
+"""Compare the legacy text-literal executemany path with binary COPY for chunk inserts.
+
+Usage (from apps/server)::
+
+    python -m scripts.bench_insert_chunks --chunks 500 --repeat 5
+
+Writes only to a temporary table on a dedicated connection; DATABASE_URL
+must point at a Postgres with pgvector (use a direct connection, not the
+transaction-mode pooler).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+from uuid import uuid4
+
+import asyncpg
+
+from app.db.vector import register_vector_codec
+
+_DIM = 1536
+_TEMP_TABLE = """
+create temp table bench_document_chunks (
+    id uuid primary key default gen_random_uuid(),
+    document_id uuid not null,
+    user_id uuid not null,
+    content text not null,
+    embedding vector(1536),
+    metadata jsonb
+)
+"""
+
+
+def _vector_literal(values: list[float]) -> str:
+    return "[" + ",".join(str(v) for v in values) + "]"
+
+
+def _make_chunks(count: int, seed: int) -> list[dict]:
+    rng = random.Random(seed)
+    return [
+        {
+            "text": f"chunk {idx} " + "lorem ipsum " * 60,
+            "metadata": {"page": [idx // 4 + 1], "word_indexes": list(range(idx * 50, idx * 50 + 50))},
+            "embedding": [rng.uniform(-1.0, 1.0) for _ in range(_DIM)],
+        }
+        for idx in range(count)
+    ]
+
+
+async def _legacy_insert(conn: asyncpg.Connection, document_id: str, user_id: str, chunks: list[dict]) -> None:
+    records = [
+        (
+            document_id,
+            user_id,
+            chunk["text"],
+            _vector_literal(chunk["embedding"]),
+            json.dumps(chunk["metadata"]),
+        )
+        for chunk in chunks
+    ]
+    await conn.executemany(
+        """
+        insert into bench_document_chunks (document_id, user_id, content, embedding, metadata)
+        values ($1, $2, $3, $4::vector, $5::jsonb)
+        """,
+        records,
+    )
+
+
+async def _copy_insert(conn: asyncpg.Connection, document_id: str, user_id: str, chunks: list[dict]) -> None:
+    records = [
+        (
+            document_id,
+            user_id,
+            chunk["text"],
+            chunk["embedding"],
+            json.dumps(chunk["metadata"]),
+        )
+        for chunk in chunks
+    ]
+    await conn.copy_records_to_table(
+        "bench_document_chunks",
+        records=records,
+        columns=["document_id", "user_id", "content", "embedding", "metadata"],
+    )
+
+
+async def _measure(conn: asyncpg.Connection, insert, chunks: list[dict], repeat: int) -> list[float]:
+    timings: list[float] = []
+    for _ in range(repeat):
+        await conn.execute("truncate bench_document_chunks")
+        start = time.perf_counter()
+        await insert(conn, str(uuid4()), str(uuid4()), chunks)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def _report(label: str, timings: list[float], count: int) -> None:
+    median = statistics.median(timings)
+    print(
+        f"{label:<22} median={median:8.1f} ms  min={min(timings):8.1f} ms  "
+        f"per_chunk={median / max(count, 1):6.3f} ms"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", ""))
+    args = parser.parse_args()
+    if not args.database_url:
+        raise SystemExit("DATABASE_URL is required")
+
+    chunks = _make_chunks(args.chunks, seed=7)
+    legacy_conn = await asyncpg.connect(args.database_url, statement_cache_size=0)
+    copy_conn = await asyncpg.connect(args.database_url, statement_cache_size=0)
+    try:
+        await register_vector_codec(copy_conn)
+        for conn in (legacy_conn, copy_conn):
+            await conn.execute(_TEMP_TABLE)
+        legacy = await _measure(legacy_conn, _legacy_insert, chunks, args.repeat)
+        copy = await _measure(copy_conn, _copy_insert, chunks, args.repeat)
+    finally:
+        await legacy_conn.close()
+        await copy_conn.close()
+
+    print(f"chunks={args.chunks} dim={_DIM} repeat={args.repeat}")
+    _report("executemany (text)", legacy, args.chunks)
+    _report("copy (binary)", copy, args.chunks)
+    print(f"speedup x{statistics.median(legacy) / statistics.median(copy):.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
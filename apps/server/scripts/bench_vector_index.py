@@ -0,0 +1,182 @@
+"""Compare recall and latency of the HNSW index with the exact scan.
+
+Usage (from apps/server)::
+
+    python -m scripts.bench_vector_index --sizes 10000,100000,1000000 --queries 50
+
+Builds a clustered synthetic corpus in an unlogged scratch table (grown in
+place from one size to the next), creates the same HNSW index as
+024_add_document_chunks_hnsw_index.sql, and for each ``hnsw.ef_search`` value
+reports recall@k against the exact ``<=>`` scan plus p50/p95 latency. The 1M
+row step generates ~6 GB of vectors server-side; use a scratch database and a
+direct connection (not the transaction-mode pooler).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+
+import asyncpg
+
+from app.db.vector import register_vector_codec
+
+_TABLE = "bench_vector_chunks"
+_CENTROIDS = "bench_vector_centroids"
+_INDEX = "bench_vector_chunks_hnsw_idx"
+
+
+def _parse_ints(value: str) -> list[int]:
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def _setup(conn: asyncpg.Connection, dim: int, clusters: int, seed: int) -> None:
+    rng = random.Random(seed)
+    await conn.execute(f"drop table if exists {_TABLE}")
+    await conn.execute(f"drop table if exists {_CENTROIDS}")
+    await conn.execute(f"create unlogged table {_TABLE} (id bigserial primary key, embedding vector({dim}) not null)")
+    await conn.execute(f"create unlogged table {_CENTROIDS} (id int primary key, centroid real[] not null)")
+    await conn.copy_records_to_table(
+        _CENTROIDS,
+        records=[(idx, [rng.gauss(0.0, 1.0) for _ in range(dim)]) for idx in range(clusters)],
+        columns=["id", "centroid"],
+    )
+
+
+async def _grow(conn: asyncpg.Connection, target: int, clusters: int, noise: float) -> None:
+    current = await conn.fetchval(f"select count(*) from {_TABLE}")
+    if current >= target:
+        return
+    # Generated in Postgres: centroid plus uniform noise, so neighbourhoods are realistic.
+    await conn.execute(
+        f"""
+        insert into {_TABLE} (embedding)
+        select (
+            select array_agg(u.value + (random() - 0.5) * $3 order by u.ord)
+            from unnest(c.centroid) with ordinality as u(value, ord)
+        )::vector
+        from generate_series($1::bigint, $2::bigint) as g(n)
+        join {_CENTROIDS} c on c.id = (g.n % $4)
+        """,
+        current + 1,
+        target,
+        noise,
+        clusters,
+    )
+    await conn.execute(f"analyze {_TABLE}")
+
+
+async def _build_index(conn: asyncpg.Connection, m: int, ef_construction: int) -> float:
+    await conn.execute(f"drop index if exists {_INDEX}")
+    start = time.perf_counter()
+    await conn.execute(
+        f"""
+        create index {_INDEX} on {_TABLE}
+        using hnsw (embedding vector_cosine_ops)
+        with (m = {int(m)}, ef_construction = {int(ef_construction)})
+        """
+    )
+    return time.perf_counter() - start
+
+
+async def _queries(conn: asyncpg.Connection, count: int, noise: float, seed: int) -> list[list[float]]:
+    rng = random.Random(seed)
+    rows = await conn.fetch(f"select embedding from {_TABLE} order by random() limit $1", count)
+    return [[value + rng.uniform(-noise, noise) for value in row["embedding"]] for row in rows]
+
+
+async def _search(
+    conn: asyncpg.Connection,
+    query: list[float],
+    k: int,
+    ef_search: int | None,
+) -> tuple[list[int], float]:
+    async with conn.transaction():
+        if ef_search is None:
+            await conn.execute("set local enable_indexscan = off")
+        else:
+            await conn.execute("select set_config('hnsw.ef_search', $1, true)", str(ef_search))
+        start = time.perf_counter()
+        rows = await conn.fetch(
+            f"select id from {_TABLE} order by embedding <=> $1::vector limit $2",
+            query,
+            k,
+        )
+        elapsed = (time.perf_counter() - start) * 1000
+    return [row["id"] for row in rows], elapsed
+
+
+def _report(label: str, recalls: list[float], timings: list[float]) -> None:
+    recall = f"recall={statistics.mean(recalls):.3f}" if recalls else "recall=1.000"
+    print(
+        f"  {label:<16} {recall}  p50={_percentile(timings, 50):8.2f} ms  "
+        f"p95={_percentile(timings, 95):8.2f} ms"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--noise", type=float, default=0.6)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--ef-search", default="40,64,100,200")
+    parser.add_argument("--m", type=int, default=16)
+    parser.add_argument("--ef-construction", type=int, default=64)
+    parser.add_argument("--maintenance-work-mem", default="2GB")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch tables afterwards")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", ""))
+    args = parser.parse_args()
+    if not args.database_url:
+        raise SystemExit("DATABASE_URL is required")
+
+    conn = await asyncpg.connect(args.database_url, statement_cache_size=0, command_timeout=None)
+    try:
+        await register_vector_codec(conn)
+        await conn.execute("select set_config('maintenance_work_mem', $1, false)", args.maintenance_work_mem)
+        await _setup(conn, args.dim, args.clusters, seed=7)
+        ef_values = _parse_ints(args.ef_search)
+        print(f"dim={args.dim} k={args.k} queries={args.queries} m={args.m} ef_construction={args.ef_construction}")
+        for size in sorted(_parse_ints(args.sizes)):
+            start = time.perf_counter()
+            await _grow(conn, size, args.clusters, args.noise)
+            load_s = time.perf_counter() - start
+            build_s = await _build_index(conn, args.m, args.ef_construction)
+            index_mb = await conn.fetchval("select pg_relation_size(to_regclass($1))", _INDEX) / 1024 / 1024
+            print(f"rows={size} load={load_s:.1f}s index_build={build_s:.1f}s index_size={index_mb:.0f} MB")
+
+            queries = await _queries(conn, args.queries, args.noise * 0.1, seed=size)
+            exact: list[list[int]] = []
+            exact_timings: list[float] = []
+            for query in queries:
+                ids, elapsed = await _search(conn, query, args.k, None)
+                exact.append(ids)
+                exact_timings.append(elapsed)
+            _report("exact", [], exact_timings)
+            for ef_search in ef_values:
+                recalls: list[float] = []
+                timings: list[float] = []
+                for query, truth in zip(queries, exact):
+                    ids, elapsed = await _search(conn, query, args.k, max(ef_search, args.k))
+                    recalls.append(len(set(ids) & set(truth)) / max(len(truth), 1))
+                    timings.append(elapsed)
+                _report(f"hnsw ef={ef_search}", recalls, timings)
+    finally:
+        if not args.keep:
+            await conn.execute(f"drop table if exists {_TABLE}")
+            await conn.execute(f"drop table if exists {_CENTROIDS}")
+        await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
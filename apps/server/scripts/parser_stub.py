@@ -0,0 +1,603 @@
+"""Local stand-in for the PDF parser API, for benchmarks and offline development.
+
+Implements the endpoints the server uses (see PDF-PARSER-README.md) without
+Azure DI or OpenAI: synthetic page/word/paragraph layouts scaled to the PDF's
+page count, deterministic pseudo-embeddings (same text -> same vector) and
+canned answers streamed at a configurable token rate.
+
+Usage (from apps/server)::
+
+    python -m scripts.parser_stub --port 8001
+    # then run the server with
+    PARSER_API_BASE_URL=http://127.0.0.1:8001 PARSER_API_PREFIX=/api/v1 PARSER_API_KEY=stub ...
+
+Tuning (environment variables, all optional):
+
+    STUB_API_PREFIX          route prefix (default /api/v1)
+    STUB_API_KEY             require this X-API-Key when set
+    STUB_LATENCY_MS          added to every HTTP request (default 20)
+    STUB_JITTER              +/- fraction applied to simulated delays (default 0.1)
+    STUB_PAGE_MS             layout analysis time per page (default 150)
+    STUB_EMBED_MS            embedding time per chunk during ingestion (default 5)
+    STUB_MAX_CONCURRENT_JOBS reported and enforced job concurrency (default 3)
+    STUB_WORDS_PER_PAGE      synthetic words per page (default 350)
+    STUB_EMBEDDING_DIM       embedding dimensions (default 1536)
+    STUB_FIRST_TOKEN_MS      answer time to first token (default 300)
+    STUB_TOKENS_PER_S        answer streaming rate (default 60)
+    STUB_ANSWER_TOKENS       answer length in tokens (default 120)
+    STUB_RATE_LIMITS         enforce the parser's per-IP limits (default 1)
+
+Like the real parser, requests over the per-IP limits of PDF-PARSER-README.md
+get 429 and ``/result`` is one-shot: reading it deletes the job, so a second
+read (or a later ``/chunks``) is 404.
+
+Features the real parser does not have are off unless enabled explicitly,
+so the stub cannot hide a client that depends on them:
+
+    STUB_BATCH_EMBEDDINGS    accept {"texts": [...]} on /embeddings
+    STUB_BASE64_EMBEDDINGS   honour ``encoding_format: "base64"`` on /embeddings
+                             and ``?encoding_format=base64`` on /result
+    STUB_CALLBACKS           POST status changes to the upload's callback_url
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import re
+import struct
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any
+
+import httpx
+from fastapi import APIRouter, FastAPI, File, Form, Request, UploadFile, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse
+
+logger = logging.getLogger("uvicorn.error")
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name, "").strip()
+    return float(value) if value else default
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name, "").strip()
+    return int(value) if value else default
+
+
+def _env_flag(name: str, default: bool = False) -> bool:
+    value = os.getenv(name, "").strip().lower()
+    return value in {"1", "true", "yes"} if value else default
+
+
+PREFIX = "/" + os.getenv("STUB_API_PREFIX", "/api/v1").strip().strip("/")
+API_KEY = os.getenv("STUB_API_KEY", "").strip() or None
+LATENCY_S = _env_float("STUB_LATENCY_MS", 20.0) / 1000
+JITTER = _env_float("STUB_JITTER", 0.1)
+PAGE_S = _env_float("STUB_PAGE_MS", 150.0) / 1000
+EMBED_S = _env_float("STUB_EMBED_MS", 5.0) / 1000
+MAX_CONCURRENT_JOBS = max(1, _env_int("STUB_MAX_CONCURRENT_JOBS", 3))
+WORDS_PER_PAGE = max(1, _env_int("STUB_WORDS_PER_PAGE", 350))
+EMBEDDING_DIM = max(1, _env_int("STUB_EMBEDDING_DIM", 1536))
+FIRST_TOKEN_S = _env_float("STUB_FIRST_TOKEN_MS", 300.0) / 1000
+TOKENS_PER_S = max(0.1, _env_float("STUB_TOKENS_PER_S", 60.0))
+ANSWER_TOKENS = max(1, _env_int("STUB_ANSWER_TOKENS", 120))
+RATE_LIMITS = _env_flag("STUB_RATE_LIMITS", True)
+BATCH_EMBEDDINGS = _env_flag("STUB_BATCH_EMBEDDINGS")
+BASE64_EMBEDDINGS = _env_flag("STUB_BASE64_EMBEDDINGS")
+CALLBACKS = _env_flag("STUB_CALLBACKS")
+
+PARSER_VERSION = "stub-1.0.0"
+EMBEDDING_MODEL = "stub-embedding-1536"
+CHAT_MODEL = "stub-chat"
+RESULT_TTL_S = 600.0
+
+# Letter-size pages in inches, like the ADI layout output.
+_PAGE_WIDTH = 8.5
+_PAGE_HEIGHT = 11.0
+_MARGIN = 1.0
+_LINE_HEIGHT = 0.22
+_CHAR_WIDTH = 0.075
+_WORDS_PER_PARAGRAPH = 48
+_CHUNK_WORDS = 384  # ~512 tokens at ~1.33 tokens per word
+_CHUNK_OVERLAP = _CHUNK_WORDS // 10
+_PAGE_PATTERN = re.compile(rb"/Type\s*/Page(?![a-zA-Z])")
+# Per-IP requests per minute, as documented for the parser.
+_RATE_LIMITS = (
+    ("POST", re.compile(r"/documents$"), 3),
+    ("POST", re.compile(r"/answers$"), 30),
+    ("POST", re.compile(r"/embeddings$"), 60),
+    ("GET", re.compile(r"/documents/[^/]+$"), 120),
+    ("GET", re.compile(r"/health$"), 120),
+    ("GET", re.compile(r"/documents/[^/]+/result$"), 60),
+    ("POST", re.compile(r"/documents/[^/]+/chunks$"), 60),
+)
+_VOCABULARY = (
+    "the of and to in is that for it as with was on be by this are from at or an which "
+    "document analysis result section figure table method data model value system process "
+    "report page chapter summary revenue growth policy design review market customer risk "
+    "contract clause party agreement term notice payment period service product quality "
+    "research sample measure effect increase decrease total annual quarter index rate cost"
+).split()
+
+
+def _jittered(seconds: float) -> float:
+    if seconds <= 0:
+        return 0.0
+    return max(0.0, seconds * (1.0 + random.uniform(-JITTER, JITTER)))
+
+
+def _error(status_code: int, code: str, message: str) -> JSONResponse:
+    return JSONResponse(
+        status_code=status_code,
+        content={"error": {"code": code, "message": message, "details": {}}},
+    )
+
+
+class RateLimiter:
+    """Sliding one-minute window per (client IP, route)."""
+
+    def __init__(self) -> None:
+        self._hits: dict[tuple[str, str], deque[float]] = {}
+
+    def retry_after(self, client: str, method: str, path: str) -> float | None:
+        """Record the request; returns seconds to wait when it is over the limit."""
+        for limit_method, pattern, limit in _RATE_LIMITS:
+            if method == limit_method and pattern.search(path):
+                break
+        else:
+            return None
+        now = time.monotonic()
+        hits = self._hits.setdefault((client, pattern.pattern), deque())
+        while hits and now - hits[0] >= 60.0:
+            hits.popleft()
+        if len(hits) >= limit:
+            return 60.0 - (now - hits[0])
+        hits.append(now)
+        return None
+
+
+def count_pdf_pages(data: bytes) -> int:
+    pages = len(_PAGE_PATTERN.findall(data))
+    # Compressed object streams hide page objects; fall back to a size estimate.
+    return pages or max(1, len(data) // 60_000)
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, math.ceil(len(text) / 4))
+
+
+def pseudo_embedding(text: str, dim: int = EMBEDDING_DIM) -> list[float]:
+    """Unit vector seeded by the text, so equal texts embed identically."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+    rng = random.Random(seed)
+    values = [rng.gauss(0.0, 1.0) for _ in range(dim)]
+    norm = math.sqrt(sum(value * value for value in values)) or 1.0
+    return [round(value / norm, 6) for value in values]
+
+
+def encode_embedding(values: list[float], encoding_format: str | None) -> Any:
+    """``base64`` mirrors the opt-in binary transport: little-endian float32, base64-encoded."""
+    if encoding_format != "base64":
+        return values
+    return base64.b64encode(struct.pack(f"<{len(values)}f", *values)).decode("ascii")
+
+
+def _polygon(left: float, top: float, right: float, bottom: float) -> list[float]:
+    return [left, top, right, top, right, bottom, left, bottom]
+
+
+def build_result(doc_id: str, pages: int, seed: bytes) -> dict[str, Any]:
+    """Synthetic layout result in the parser's ``/result`` shape."""
+    rng = random.Random(int.from_bytes(hashlib.sha256(seed).digest()[:8], "big"))
+    page_items: list[dict[str, Any]] = []
+    paragraphs: list[dict[str, Any]] = []
+    words_text: list[str] = []
+    word_pages: list[int] = []
+    offset = 0
+    max_right = _PAGE_WIDTH - _MARGIN
+
+    for page_number in range(1, pages + 1):
+        words: list[dict[str, Any]] = []
+        lines: list[dict[str, Any]] = []
+        x, y = _MARGIN, _MARGIN
+        line_words: list[int] = []
+        paragraph_words: list[int] = []
+        paragraph_top = y
+
+        def close_line() -> None:
+            if line_words:
+                first, last = words[-len(line_words)], words[-1]
+                lines.append(
+                    {
+                        "content": " ".join(words_text[idx] for idx in line_words),
+                        "polygon": _polygon(first["polygon"][0], y, last["polygon"][2], y + _LINE_HEIGHT * 0.8),
+                        "word_indexes": list(line_words),
+                    }
+                )
+                line_words.clear()
+
+        def close_paragraph() -> None:
+            nonlocal offset
+            if not paragraph_words:
+                return
+            content = " ".join(words_text[idx] for idx in paragraph_words)
+            paragraphs.append(
+                {
+                    "content": content,
+                    "role": "content",
+                    "spans": [{"offset": offset, "length": len(content)}],
+                    "boundingRegions": [
+                        {
+                            "pageNumber": page_number,
+                            "bbox": [_MARGIN, round(paragraph_top, 4), max_right, round(y + _LINE_HEIGHT, 4)],
+                        }
+                    ],
+                    "word_indexes": list(paragraph_words),
+                    "paragraph_index": len(paragraphs),
+                }
+            )
+            offset += len(content) + 1
+            paragraph_words.clear()
+
+        for _ in range(WORDS_PER_PAGE):
+            text = rng.choice(_VOCABULARY)
+            width = _CHAR_WIDTH * len(text)
+            if x + width > max_right:
+                close_line()
+                x, y = _MARGIN, y + _LINE_HEIGHT
+            if y + _LINE_HEIGHT > _PAGE_HEIGHT - _MARGIN:
+                break
+            if not paragraph_words:
+                paragraph_top = y
+            word_index = len(words_text)
+            words_text.append(text)
+            word_pages.append(page_number)
+            words.append(
+                {
+                    "content": text,
+                    "polygon": [round(v, 4) for v in _polygon(x, y, x + width, y + _LINE_HEIGHT * 0.8)],
+                    "confidence": 0.99,
+                    "word_index": word_index,
+                }
+            )
+            line_words.append(word_index)
+            paragraph_words.append(word_index)
+            x += width + _CHAR_WIDTH
+            if len(paragraph_words) >= _WORDS_PER_PARAGRAPH:
+                close_line()
+                close_paragraph()
+                x, y = _MARGIN, y + _LINE_HEIGHT * 2
+        close_line()
+        close_paragraph()
+        page_items.append(
+            {
+                "pageNumber": page_number,
+                "width": _PAGE_WIDTH,
+                "height": _PAGE_HEIGHT,
+                "unit": "inch",
+                "words": words,
+                "lines": lines,
+            }
+        )
+
+    chunks: list[dict[str, Any]] = []
+    step = _CHUNK_WORDS - _CHUNK_OVERLAP
+    for start in range(0, max(len(words_text) - _CHUNK_OVERLAP, 1), step):
+        indexes = list(range(start, min(start + _CHUNK_WORDS, len(words_text))))
+        if not indexes:
+            break
+        text = " ".join(words_text[idx] for idx in indexes)
+        chunks.append(
+            {
+                "text": text,
+                "token_count": estimate_tokens(text),
+                "metadata": {
+                    "doc_id": doc_id,
+                    "word_indexes": indexes,
+                    "page": sorted({word_pages[idx] for idx in indexes}),
+                },
+                "embedding": pseudo_embedding(text),
+            }
+        )
+
+    return {
+        "doc_id": doc_id,
+        "usage": {"pages": pages},
+        "parser_version": PARSER_VERSION,
+        "source": {"adi_model": "prebuilt-layout"},
+        "pages": page_items,
+        "paragraphs": paragraphs,
+        "chunks": chunks,
+    }
+
+
+@dataclass
+class StubJob:
+    doc_id: str
+    pages: int
+    data: bytes
+    callback_url: str | None = None
+    callback_token: str | None = None
+    status: str = "PENDING"
+    error: str | None = None
+    result: dict[str, Any] | None = None
+    created_at: float = field(default_factory=time.monotonic)
+    finished_at: float | None = None
+
+    def payload(self) -> dict[str, Any]:
+        body: dict[str, Any] = {"doc_id": self.doc_id, "status": self.status, "pages": self.pages}
+        if self.error:
+            body["error"] = self.error
+        return body
+
+
+class StubParser:
+    def __init__(self) -> None:
+        self.jobs: dict[str, StubJob] = {}
+        self._slots = asyncio.Semaphore(MAX_CONCURRENT_JOBS)
+        self._tasks: set[asyncio.Task] = set()
+        self._http: httpx.AsyncClient | None = None
+
+    def submit(self, job: StubJob) -> None:
+        self._sweep()
+        self.jobs[job.doc_id] = job
+        task = asyncio.create_task(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def close(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._http is not None:
+            await self._http.aclose()
+
+    def _sweep(self) -> None:
+        # Mirrors the parser's orphan sweep: unread results do not live forever.
+        now = time.monotonic()
+        expired = [
+            doc_id
+            for doc_id, job in self.jobs.items()
+            if job.finished_at is not None and now - job.finished_at > RESULT_TTL_S
+        ]
+        for doc_id in expired:
+            self.jobs.pop(doc_id, None)
+
+    async def _run(self, job: StubJob) -> None:
+        try:
+            async with self._slots:
+                await self._set_status(job, "RUNNING")
+                await asyncio.sleep(_jittered(PAGE_S * job.pages))
+                await self._set_status(job, "CHUNKING")
+                job.result = await asyncio.to_thread(build_result, job.doc_id, job.pages, job.data)
+                job.data = b""
+                await self._set_status(job, "EMBEDDING")
+                await asyncio.sleep(_jittered(EMBED_S * len(job.result["chunks"])))
+            job.finished_at = time.monotonic()
+            await self._set_status(job, "SUCCEEDED")
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.exception("stub job failed doc=%s", job.doc_id)
+            job.error = str(exc)
+            job.finished_at = time.monotonic()
+            await self._set_status(job, "FAILED")
+
+    async def _set_status(self, job: StubJob, status: str) -> None:
+        job.status = status
+        if not CALLBACKS or not job.callback_url:
+            return
+        if self._http is None:
+            self._http = httpx.AsyncClient(timeout=5.0)
+        headers = {"X-Callback-Token": job.callback_token} if job.callback_token else {}
+        try:
+            await self._http.post(job.callback_url, json={"doc_id": job.doc_id, "status": status}, headers=headers)
+        except httpx.HTTPError as exc:
+            logger.warning("stub callback failed doc=%s error=%s", job.doc_id, exc)
+
+
+def _answer_tokens(question: str, context: str) -> list[str]:
+    seed = int.from_bytes(hashlib.sha256(f"{question}\0{context}".encode("utf-8")).digest()[:8], "big")
+    rng = random.Random(seed)
+    source = context.split() or question.split() or _VOCABULARY
+    return [rng.choice(source) + " " for _ in range(ANSWER_TOKENS)]
+
+
+def _answer_usage(question: str, context: str, output_tokens: int) -> dict[str, int]:
+    input_tokens = estimate_tokens(question) + estimate_tokens(context)
+    return {
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "total_tokens": input_tokens + output_tokens,
+    }
+
+
+stub = StubParser()
+rate_limiter = RateLimiter()
+router = APIRouter(prefix=PREFIX)
+
+
+@router.get("/health")
+async def health() -> dict[str, Any]:
+    return {"status": "ok"}
+
+
+@router.get("/system")
+async def system() -> dict[str, Any]:
+    return {
+        "parser_version": PARSER_VERSION,
+        "api_key_configured": API_KEY is not None,
+        "azure_di_configured": False,
+        "adi_model_default": "prebuilt-layout",
+        "adi_max_concurrent_jobs": MAX_CONCURRENT_JOBS,
+        "adi_analysis_timeout_seconds": 900,
+        "max_upload_size_bytes": 20_000_000,
+        "orphan_max_age_seconds": int(RESULT_TTL_S),
+        "orphan_sweep_interval_seconds": 60,
+        "openai_embedding_model": EMBEDDING_MODEL,
+        "openai_chat_model": CHAT_MODEL,
+        "openai_max_output_tokens": ANSWER_TOKENS,
+    }
+
+
+@router.post("/documents")
+async def create_document(
+    file: UploadFile = File(...),
+    callback_url: str | None = Form(default=None),
+    callback_token: str | None = Form(default=None),
+) -> dict[str, Any]:
+    data = await file.read()
+    job = StubJob(
+        doc_id=str(uuid.uuid4()),
+        pages=count_pdf_pages(data),
+        data=data,
+        callback_url=callback_url,
+        callback_token=callback_token,
+    )
+    stub.submit(job)
+    return job.payload()
+
+
+@router.get("/documents/{doc_id}")
+async def get_document(doc_id: str):
+    job = stub.jobs.get(doc_id)
+    if job is None:
+        return _error(404, "NOT_FOUND", "Document not found")
+    return job.payload()
+
+
+@router.get("/documents/{doc_id}/result")
+async def get_result(doc_id: str, encoding_format: str | None = None):
+    job = stub.jobs.get(doc_id)
+    if job is None:
+        return _error(404, "NOT_FOUND", "Document not found")
+    if job.status != "SUCCEEDED" or job.result is None:
+        return _error(409, "DOCUMENT_NOT_READY", "Document is not ready")
+    # One-shot like the real parser: the job is gone once the result is read.
+    stub.jobs.pop(doc_id, None)
+    if BASE64_EMBEDDINGS and encoding_format == "base64":
+        for chunk in job.result["chunks"]:
+            chunk["embedding"] = encode_embedding(chunk["embedding"], encoding_format)
+    return job.result
+
+
+@router.post("/documents/{doc_id}/chunks")
+async def get_chunks(doc_id: str):
+    job = stub.jobs.get(doc_id)
+    if job is None:
+        return _error(404, "NOT_FOUND", "Document not found")
+    if job.status != "SUCCEEDED" or job.result is None:
+        return _error(409, "DOCUMENT_NOT_READY", "Document is not ready")
+    return {"chunks": job.result["chunks"]}
+
+
+@router.post("/embeddings")
+async def embeddings(request: Request):
+    body = await request.json()
+    encoding_format = body.get("encoding_format") if BASE64_EMBEDDINGS else None
+    if BATCH_EMBEDDINGS and isinstance(body.get("texts"), list):
+        texts = [str(text) for text in body["texts"]]
+        tokens = sum(estimate_tokens(text) for text in texts)
+        return {
+            "model": EMBEDDING_MODEL,
+            "embeddings": [encode_embedding(pseudo_embedding(text), encoding_format) for text in texts],
+            "usage": {"input_tokens": tokens, "total_tokens": tokens},
+        }
+    text = body.get("text")
+    if not isinstance(text, str):
+        return _error(400, "INVALID_OPTIONS", "text is required")
+    tokens = estimate_tokens(text)
+    return {
+        "model": EMBEDDING_MODEL,
+        "embedding": encode_embedding(pseudo_embedding(text), encoding_format),
+        "usage": {"input_tokens": tokens, "total_tokens": tokens},
+    }
+
+
+@router.post("/answers")
+async def answers(request: Request) -> dict[str, Any]:
+    body = await request.json()
+    question = str(body.get("question") or "")
+    context = str(body.get("context") or "")
+    tokens = _answer_tokens(question, context)
+    await asyncio.sleep(_jittered(FIRST_TOKEN_S + len(tokens) / TOKENS_PER_S))
+    return {
+        "answer": "".join(tokens).strip(),
+        "model": body.get("model") or CHAT_MODEL,
+        "usage": _answer_usage(question, context, len(tokens)),
+    }
+
+
+@router.websocket("/ws/answers")
+async def ws_answers(websocket: WebSocket) -> None:
+    if API_KEY and websocket.headers.get("x-api-key") != API_KEY:
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    try:
+        body = json.loads(await websocket.receive_text())
+        question = str(body.get("question") or "")
+        context = str(body.get("context") or "")
+        tokens = _answer_tokens(question, context)
+        await asyncio.sleep(_jittered(FIRST_TOKEN_S))
+        interval = 1.0 / TOKENS_PER_S
+        for token in tokens:
+            await websocket.send_text(json.dumps({"type": "delta", "delta": token}))
+            await asyncio.sleep(interval)
+        usage = _answer_usage(question, context, len(tokens))
+        await websocket.send_text(json.dumps({"type": "usage", "usage": usage}))
+        await websocket.send_text(json.dumps({"type": "done"}))
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+
+
+app = FastAPI(title="PDF parser stub")
+
+
+@app.middleware("http")
+async def simulate_network(request: Request, call_next):
+    if API_KEY and request.headers.get("x-api-key") != API_KEY:
+        return _error(401, "UNAUTHORIZED", "Invalid API key")
+    if RATE_LIMITS:
+        client = request.client.host if request.client else "unknown"
+        retry_after = rate_limiter.retry_after(client, request.method, request.url.path)
+        if retry_after is not None:
+            response = _error(429, "RATE_LIMITED", "Rate limit exceeded")
+            response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+            return response
+    await asyncio.sleep(_jittered(LATENCY_S))
+    return await call_next(request)
+
+
+@app.on_event("shutdown")
+async def shutdown() -> None:
+    await stub.close()
+
+
+app.include_router(router)
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    args = parser.parse_args()
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
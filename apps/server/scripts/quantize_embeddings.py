@@ -0,0 +1,213 @@
+"""Backfill the halfvec/binary shadow columns of document_chunks and measure them.
+
+Usage (from apps/server)::
+
+    python -m scripts.quantize_embeddings                      # backfill + storage report
+    python -m scripts.quantize_embeddings --check --candidates 200
+    python -m scripts.quantize_embeddings --compact --candidates 200 --min-recall 0.95
+    python -m scripts.quantize_embeddings --drop-float32-index
+
+Requires migration 026. ``--check`` compares the Hamming-prefilter + re-rank
+path of ``match_documents`` with an exact float32 scan on sampled chunk
+embeddings and reports recall@k. ``--compact`` runs the same check, refuses
+to continue below ``--min-recall``, then makes new chunks store halfvec only
+and nulls existing float32 embeddings. Set VECTOR_RERANK_CANDIDATES to the
+checked value before compacting; the search functions switch to the
+prefilter path by themselves as soon as a row is compacted. Run VACUUM FULL
+or pg_repack afterwards to return the space.
+
+The float32 HNSW index is kept by ``--compact`` so anything still ordering by
+``embedding`` (older app deployments, ad-hoc queries) keeps working while
+they are rolled over. ``--drop-float32-index`` removes it once every server
+runs with VECTOR_RERANK_CANDIDATES set, and refuses while float32 rows remain.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+
+import asyncpg
+
+from app.db import repository
+from app.db.vector import register_vector_codec
+
+_FLOAT32_INDEX = "document_chunks_embedding_hnsw_idx"
+_BITS_INDEX = "document_chunks_embedding_bits_hnsw_idx"
+
+
+async def _backfill(pool: asyncpg.Pool, batch_size: int) -> int:
+    total = 0
+    while True:
+        updated = await repository.quantize_chunk_embeddings_batch(pool, limit=batch_size)
+        if not updated:
+            return total
+        total += updated
+        print(f"quantized rows={total}")
+
+
+async def _report(pool: asyncpg.Pool) -> None:
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(
+            """
+            select
+                count(*) as chunks,
+                count(embedding) as float32_rows,
+                coalesce(sum(pg_column_size(embedding)), 0) as float32_bytes,
+                coalesce(sum(pg_column_size(embedding_half)), 0) as half_bytes,
+                coalesce(sum(pg_column_size(embedding_bits)), 0) as bits_bytes
+            from document_chunks
+            """
+        )
+        indexes = {
+            name: await conn.fetchval("select coalesce(pg_relation_size(to_regclass($1)), 0)", name)
+            for name in (_FLOAT32_INDEX, _BITS_INDEX)
+        }
+    mb = 1024 * 1024
+    print(
+        f"chunks={row['chunks']} float32_rows={row['float32_rows']} "
+        f"float32={row['float32_bytes'] / mb:.1f} MB halfvec={row['half_bytes'] / mb:.1f} MB "
+        f"bits={row['bits_bytes'] / mb:.1f} MB"
+    )
+    print(
+        f"index {_FLOAT32_INDEX}={indexes[_FLOAT32_INDEX] / mb:.1f} MB "
+        f"{_BITS_INDEX}={indexes[_BITS_INDEX] / mb:.1f} MB"
+    )
+
+
+async def _check(pool: asyncpg.Pool, queries: int, k: int, candidates: int, noise: float, seed: int) -> float:
+    rng = random.Random(seed)
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            """
+            select embedding from document_chunks
+            where embedding is not null
+            order by random()
+            limit $1
+            """,
+            queries,
+        )
+        if not rows:
+            raise SystemExit("no float32 embeddings left to check against")
+        recalls: list[float] = []
+        exact_ms: list[float] = []
+        quantized_ms: list[float] = []
+        for row in rows:
+            query = [value + rng.uniform(-noise, noise) for value in row["embedding"]]
+            async with conn.transaction():
+                await conn.execute("set local enable_indexscan = off")
+                start = time.perf_counter()
+                truth = await conn.fetch(
+                    """
+                    select id from document_chunks
+                    where embedding is not null
+                    order by embedding <=> $1::vector
+                    limit $2
+                    """,
+                    query,
+                    k,
+                )
+                exact_ms.append((time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            found = await repository.match_documents_conn(
+                conn,
+                query,
+                match_count=k,
+                rerank_candidates=candidates,
+            )
+            quantized_ms.append((time.perf_counter() - start) * 1000)
+            expected = {item["id"] for item in truth}
+            recalls.append(len(expected & {item["id"] for item in found}) / max(len(expected), 1))
+    recall = statistics.mean(recalls)
+    print(
+        f"queries={len(rows)} k={k} candidates={candidates} recall={recall:.3f} "
+        f"exact_p50={statistics.median(exact_ms):.1f} ms quantized_p50={statistics.median(quantized_ms):.1f} ms"
+    )
+    return recall
+
+
+async def _compact(pool: asyncpg.Pool, batch_size: int) -> int:
+    async with pool.acquire() as conn:
+        # Read by the document_chunks_quantize_embedding trigger for every new chunk.
+        await conn.execute(
+            """
+            do $$
+            begin
+                execute format('alter database %I set askpdf.embedding_storage = %L', current_database(), 'halfvec');
+            end;
+            $$
+            """
+        )
+    total = 0
+    while True:
+        updated = await repository.compact_chunk_embeddings_batch(pool, limit=batch_size)
+        if not updated:
+            return total
+        total += updated
+        print(f"compacted rows={total}")
+
+
+async def _drop_float32_index(pool: asyncpg.Pool) -> None:
+    async with pool.acquire() as conn:
+        remaining = await conn.fetchval("select count(*) from document_chunks where embedding is not null")
+        if remaining:
+            raise SystemExit(f"{remaining} chunks still store float32 embeddings; run --compact first")
+        print(
+            f"warning: dropping {_FLOAT32_INDEX}; servers without VECTOR_RERANK_CANDIDATES "
+            "fall back to the default prefilter size"
+        )
+        await conn.execute(f"drop index if exists {_FLOAT32_INDEX}")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--check", action="store_true", help="measure recall of the quantized search path")
+    parser.add_argument("--compact", action="store_true", help="drop float32 embeddings after a passing check")
+    parser.add_argument(
+        "--drop-float32-index",
+        action="store_true",
+        help="drop the float32 HNSW index once no float32 embeddings remain",
+    )
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--candidates", type=int, default=200)
+    parser.add_argument("--noise", type=float, default=0.01)
+    parser.add_argument("--min-recall", type=float, default=0.95)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", ""))
+    args = parser.parse_args()
+    if not args.database_url:
+        raise SystemExit("DATABASE_URL is required")
+
+    pool = await asyncpg.create_pool(
+        args.database_url,
+        min_size=1,
+        max_size=2,
+        statement_cache_size=0,
+        command_timeout=None,
+        init=register_vector_codec,
+    )
+    try:
+        quantized = await _backfill(pool, args.batch_size)
+        print(f"backfill done rows={quantized}")
+        await _report(pool)
+        if args.check or args.compact:
+            recall = await _check(pool, args.queries, args.k, args.candidates, args.noise, seed=7)
+            if args.compact:
+                if recall < args.min_recall:
+                    raise SystemExit(f"recall {recall:.3f} is below --min-recall {args.min_recall}; not compacting")
+                compacted = await _compact(pool, args.batch_size)
+                print(f"compact done rows={compacted}")
+                await _report(pool)
+        if args.drop_float32_index:
+            await _drop_float32_index(pool)
+            await _report(pool)
+    finally:
+        await pool.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -31,6 +31,8 @@ type DocumentItem = {
   id: string;
   title: string;
   status?: string | null;
+  stage?: string | null;
+  progress?: number | null;
 };
 
 type OpenDocument = {
@@ -887,11 +889,15 @@ export default function Home() {
   const [tabsOverflow, setTabsOverflow] = useState(false);
   const [editingDocumentId, setEditingDocumentId] = useState<string | null>(null);
   const [documentTitleDraft, setDocumentTitleDraft] = useState("");
-  const documentStatusLabel = (status?: string | null) => {
+  const documentStatusLabel = (status?: string | null, progress?: number | null) => {
     if (!status || status === "ready" || status === "done") return null;
     if (status === "uploading") return t("status.uploading");
     if (status === "uploaded") return t("status.uploaded");
-    if (status === "processing") return t("status.processing");
+    if (status === "processing") {
+      return typeof progress === "number"
+        ? `${t("status.processing")} ${Math.round(progress)}%`
+        : t("status.processing");
+    }
     if (status === "failed") return t("status.failed");
     return status;
   };
@@ -990,6 +996,10 @@ export default function Home() {
   const resumeProcessingStartedRef = useRef(false);
   const documentsRefreshTimerRef = useRef<number | null>(null);
   const documentsRefreshRunningRef = useRef(false);
+  const documentEventsRef = useRef<EventSource | null>(null);
+  const documentEventsRetryRef = useRef(0);
+  const documentEventsRetryTimerRef = useRef<number | null>(null);
+  const [documentEventsEpoch, setDocumentEventsEpoch] = useState(0);
   const documentsRef = useRef<DocumentItem[]>([]);
 
   useEffect(() => {
@@ -1680,6 +1690,8 @@ export default function Home() {
     if (documentsRefreshTimerRef.current !== null) return;
     documentsRefreshTimerRef.current = window.setInterval(() => {
       if (documentsRefreshRunningRef.current) return;
+      // Progress events cover status changes while the stream is open.
+      if (documentEventsRef.current?.readyState === EventSource.OPEN) return;
       documentsRefreshRunningRef.current = true;
       const run = async () => {
         try {
@@ -1730,6 +1742,99 @@ export default function Home() {
     };
   }, [documents, isHydrated, canUseApi]);
 
+  useEffect(() => {
+    if (!isHydrated || !canUseApi) return;
+    const hasTargets = documents.some((doc) =>
+      ["uploading", "uploaded", "processing"].includes(String(doc.status ?? ""))
+    );
+    if (!hasTargets) {
+      documentEventsRef.current?.close();
+      documentEventsRef.current = null;
+      return;
+    }
+    if (documentEventsRef.current || documentEventsRetryTimerRef.current !== null) return;
+    let cancelled = false;
+    void (async () => {
+      const auth = await getAuthParams();
+      if (!auth || cancelled || documentEventsRef.current) return;
+      const baseUrl = process.env.NEXT_PUBLIC_API_BASE_URL ?? "http://127.0.0.1:8000";
+      const source = new EventSource(
+        `${baseUrl}/documents/events?token=${encodeURIComponent(
+          auth.token
+        )}&token_type=${encodeURIComponent(auth.tokenType)}`
+      );
+      documentEventsRef.current = source;
+      const applyEvents = (events: unknown[]) => {
+        const updates = new Map<string, Partial<DocumentItem>>();
+        for (const item of events) {
+          const payload = item as Record<string, unknown> | null;
+          const id = String(payload?.document_id ?? "");
+          if (!id || typeof payload?.status !== "string") continue;
+          updates.set(id, {
+            status: payload.status,
+            stage: typeof payload.stage === "string" ? payload.stage : null,
+            progress: typeof payload.progress === "number" ? payload.progress : null,
+          });
+        }
+        if (updates.size === 0) return;
+        setDocuments((prev) =>
+          prev.map((item) => {
+            const hit = updates.get(item.id);
+            return hit ? { ...item, ...hit } : item;
+          })
+        );
+      };
+      source.onopen = () => {
+        documentEventsRetryRef.current = 0;
+      };
+      source.addEventListener("snapshot", (event) => {
+        try {
+          const payload = JSON.parse((event as MessageEvent).data);
+          if (Array.isArray(payload?.documents)) applyEvents(payload.documents);
+        } catch {
+          // Ignore malformed events
+        }
+      });
+      source.addEventListener("progress", (event) => {
+        try {
+          applyEvents([JSON.parse((event as MessageEvent).data)]);
+        } catch {
+          // Ignore malformed events
+        }
+      });
+      source.onerror = () => {
+        // Polling covers the gap; reopen the stream with exponential backoff.
+        source.close();
+        if (documentEventsRef.current !== source) return;
+        documentEventsRef.current = null;
+        const attempt = documentEventsRetryRef.current;
+        documentEventsRetryRef.current = attempt + 1;
+        const delay = Math.min(1000 * 2 ** attempt, 30000);
+        if (documentEventsRetryTimerRef.current !== null) {
+          window.clearTimeout(documentEventsRetryTimerRef.current);
+        }
+        documentEventsRetryTimerRef.current = window.setTimeout(() => {
+          documentEventsRetryTimerRef.current = null;
+          setDocumentEventsEpoch((value) => value + 1);
+        }, delay);
+      };
+    })();
+    return () => {
+      cancelled = true;
+    };
+  }, [documents, documentEventsEpoch, isHydrated, canUseApi]);
+
+  useEffect(() => {
+    return () => {
+      if (documentEventsRetryTimerRef.current !== null) {
+        window.clearTimeout(documentEventsRetryTimerRef.current);
+        documentEventsRetryTimerRef.current = null;
+      }
+      documentEventsRef.current?.close();
+      documentEventsRef.current = null;
+    };
+  }, []);
+
   useEffect(() => {
     if (typeof window === "undefined") return;
     window.dispatchEvent(new Event("askpdf:layout"));
@@ -3582,6 +3687,79 @@ export default function Home() {
     return sum;
   };
 
+  const halfToFloat = (bits: number) => {
+    const sign = bits & 0x8000 ? -1 : 1;
+    const exponent = (bits >> 10) & 0x1f;
+    const fraction = bits & 0x3ff;
+    if (exponent === 0) return sign * fraction * 2 ** -24;
+    if (exponent === 0x1f) return fraction ? NaN : sign * Infinity;
+    return sign * (1 + fraction / 1024) * 2 ** (exponent - 15);
+  };
+
+  // Binary layout is documented in apps/server/app/services/embedding_export.py.
+  const decodeEmbeddingExport = (buffer: ArrayBuffer, documentId: string) => {
+    if (buffer.byteLength < 20) return null;
+    const view = new DataView(buffer);
+    const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+    if (magic !== "APE1") return null;
+    const encoding = view.getUint8(4);
+    const count = view.getUint32(8, true);
+    const dim = view.getUint32(12, true);
+    const tableLength = view.getUint32(16, true);
+    const table = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 20, tableLength)));
+    if (!Array.isArray(table) || table.length !== count) return null;
+    let offset = 20 + tableLength;
+    offset += (4 - (offset % 4)) % 4;
+    const chunks: ClientChunk[] = [];
+    for (let i = 0; i < count; i += 1) {
+      const embedding = new Float32Array(dim);
+      if (encoding === 2) {
+        const scale = view.getFloat32(offset + i * 4, true);
+        const values = new Int8Array(buffer, offset + count * 4 + i * dim, dim);
+        for (let j = 0; j < dim; j += 1) embedding[j] = values[j] * scale;
+      } else if (encoding === 1) {
+        const base = offset + i * dim * 2;
+        for (let j = 0; j < dim; j += 1) embedding[j] = halfToFloat(view.getUint16(base + j * 2, true));
+      } else {
+        return null;
+      }
+      const norm = calcVectorNorm(embedding);
+      if (!Number.isFinite(norm) || norm === 0) continue;
+      const item = table[i] ?? {};
+      chunks.push({
+        id: String(item.id),
+        documentId: String(item.documentId ?? documentId),
+        content: String(item.content ?? ""),
+        metadata: item.metadata ?? null,
+        embedding,
+        norm,
+      });
+    }
+    return chunks;
+  };
+
+  const loadEmbeddingExport = async (
+    baseUrl: string,
+    documentId: string,
+    headers: Record<string, string>
+  ) => {
+    try {
+      const manifestResponse = await fetch(
+        `${baseUrl}/documents/${documentId}/embeddings?encoding=i8`,
+        { headers }
+      );
+      if (!manifestResponse.ok) return null;
+      const manifest = await manifestResponse.json();
+      if (typeof manifest?.url !== "string") return null;
+      // The URL is content-hashed and served immutable, so repeat loads come from the HTTP cache.
+      const response = await fetch(`${baseUrl}${manifest.url}`, { headers });
+      if (!response.ok) return null;
+      return decodeEmbeddingExport(await response.arrayBuffer(), documentId);
+    } catch {
+      return null;
+    }
+  };
+
   const loadDocumentChunkCache = async (documentId: string) => {
     if (!documentId) return null;
     const cached = documentChunkCacheRef.current.get(documentId);
@@ -3592,6 +3770,12 @@ export default function Home() {
       const auth = await getAuthParams();
       if (!auth) return null;
       const baseUrl = process.env.NEXT_PUBLIC_API_BASE_URL ?? "http://127.0.0.1:8000";
+      const exported = await loadEmbeddingExport(baseUrl, documentId, auth.headers);
+      if (exported) {
+        const cache: ChunkCache = { loadedAt: Date.now(), chunks: exported };
+        documentChunkCacheRef.current.set(documentId, cache);
+        return cache;
+      }
       const response = await fetch(`${baseUrl}/documents/${documentId}/chunks`, {
         headers: auth.headers,
       });
@@ -5530,7 +5714,7 @@ export default function Home() {
                             sidebarSearch
                           )}
                         </span>
-                        {documentStatusLabel(item.doc.status) ? (
+                        {documentStatusLabel(item.doc.status, item.doc.progress) ? (
                           <span
                             className={`history-item__badge ${
                               item.doc.status === "failed"
@@ -5543,7 +5727,7 @@ export default function Home() {
                                 : ""
                             }`}
                           >
-                            {documentStatusLabel(item.doc.status)}
+                            {documentStatusLabel(item.doc.status, item.doc.progress)}
                           </span>
                         ) : null}
                         {item.doc.status === "ready" ? (
@@ -0,0 +1,29 @@
+create table if not exists ingestion_jobs (
+    id uuid primary key default gen_random_uuid(),
+    document_id uuid not null references documents(id) on delete cascade,
+    user_id uuid not null,
+    kind text not null,
+    payload jsonb not null default '{}'::jsonb,
+    status text not null default 'queued',
+    attempts int not null default 0,
+    max_attempts int not null default 3,
+    run_after timestamptz not null default now(),
+    locked_at timestamptz,
+    locked_by text,
+    last_error text,
+    created_at timestamptz not null default now(),
+    updated_at timestamptz not null default now()
+);
+
+create index if not exists ingestion_jobs_claim_idx
+    on ingestion_jobs (run_after)
+    where status = 'queued';
+
+create index if not exists ingestion_jobs_running_idx
+    on ingestion_jobs (locked_at)
+    where status = 'running';
+
+create index if not exists ingestion_jobs_document_idx
+    on ingestion_jobs (document_id);
+
+alter table ingestion_jobs enable row level security;
@@ -0,0 +1,6 @@
+alter table documents
+add column if not exists content_sha256 text;
+
+create index if not exists documents_content_sha256_ready_idx
+    on documents (content_sha256, updated_at desc)
+    where status = 'ready' and content_sha256 is not null;
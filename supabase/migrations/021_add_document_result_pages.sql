@@ -0,0 +1,10 @@
+create table if not exists document_result_pages (
+    document_id uuid not null references documents(id) on delete cascade,
+    page_number int not null,
+    page jsonb not null,
+    paragraphs jsonb not null default '[]'::jsonb,
+    words jsonb not null default '[]'::jsonb,
+    primary key (document_id, page_number)
+);
+
+alter table document_result_pages enable row level security;
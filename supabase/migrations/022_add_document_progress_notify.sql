@@ -0,0 +1,36 @@
+alter table documents
+add column if not exists stage text;
+
+create or replace function notify_document_progress()
+returns trigger as $$
+begin
+  perform pg_notify(
+    'document_progress',
+    json_build_object(
+      'document_id', new.id,
+      'user_id', new.user_id,
+      'status', new.status,
+      'stage', new.stage,
+      'progress', new.progress,
+      'error_message', left(new.error_message, 500)
+    )::text
+  );
+  return new;
+end;
+$$ language plpgsql;
+
+drop trigger if exists documents_progress_notify_insert on documents;
+create trigger documents_progress_notify_insert
+after insert on documents
+for each row execute function notify_document_progress();
+
+drop trigger if exists documents_progress_notify_update on documents;
+create trigger documents_progress_notify_update
+after update of status, stage, progress on documents
+for each row
+when (
+  old.status is distinct from new.status
+  or old.stage is distinct from new.stage
+  or old.progress is distinct from new.progress
+)
+execute function notify_document_progress();
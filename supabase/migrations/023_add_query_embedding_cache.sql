@@ -0,0 +1,12 @@
+create table if not exists query_embedding_cache (
+    cache_key text primary key,
+    model text not null,
+    embedding real[] not null,
+    created_at timestamptz not null default now(),
+    last_used_at timestamptz not null default now()
+);
+
+create index if not exists query_embedding_cache_last_used_idx
+    on query_embedding_cache (last_used_at);
+
+alter table query_embedding_cache enable row level security;
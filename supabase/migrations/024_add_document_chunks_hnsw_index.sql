@@ -0,0 +1,54 @@
+-- Approximate nearest-neighbour index for cross-document similarity search.
+-- On a large existing table, build it ahead of time outside a transaction with
+-- create index concurrently and the same name; this statement is then a no-op.
+create index if not exists document_chunks_embedding_hnsw_idx
+    on document_chunks using hnsw (embedding vector_cosine_ops)
+    with (m = 16, ef_construction = 64);
+
+-- Single-document searches stay exact: ordering by the similarity expression
+-- (not the <=> operator) keeps the planner on document_chunks_document_id_idx,
+-- where a post-filtered HNSW scan could return fewer than match_count rows.
+-- Unfiltered searches use the HNSW index; recall is tuned per transaction with
+-- hnsw.ef_search.
+create or replace function match_documents(
+    query_embedding vector(1536),
+    match_count int,
+    filter_document_id uuid default null
+)
+returns table (
+    id uuid,
+    document_id uuid,
+    content text,
+    metadata jsonb,
+    similarity float
+)
+language plpgsql
+stable
+as $$
+begin
+    if filter_document_id is not null then
+        return query
+        select
+            document_chunks.id,
+            document_chunks.document_id,
+            document_chunks.content,
+            document_chunks.metadata,
+            1 - (document_chunks.embedding <=> query_embedding) as similarity
+        from document_chunks
+        where document_chunks.document_id = filter_document_id
+        order by 1 - (document_chunks.embedding <=> query_embedding) desc
+        limit match_count;
+    else
+        return query
+        select
+            document_chunks.id,
+            document_chunks.document_id,
+            document_chunks.content,
+            document_chunks.metadata,
+            1 - (document_chunks.embedding <=> query_embedding) as similarity
+        from document_chunks
+        order by document_chunks.embedding <=> query_embedding
+        limit match_count;
+    end if;
+end;
+$$;
@@ -0,0 +1,86 @@
+-- Supports the exact per-user path below and the user filter of the HNSW path.
+create index if not exists document_chunks_user_document_idx
+    on document_chunks (user_id, document_id);
+
+-- Similarity search over one user's library. Cost follows the size of that
+-- library, not of the whole table:
+-- * up to exact_max_chunks chunks, the user's rows are scanned exactly through
+--   document_chunks_user_document_idx (ordering by the similarity expression
+--   keeps the planner off the HNSW index, as in match_documents);
+-- * larger libraries use document_chunks_embedding_hnsw_idx with an iterative
+--   scan (pgvector >= 0.8), which keeps walking the graph until match_count
+--   rows pass the user filter instead of returning ef_search candidates that
+--   mostly belong to other users. relaxed_order results are re-sorted.
+create or replace function match_user_documents(
+    query_embedding vector(1536),
+    filter_user_id uuid,
+    match_count int,
+    exact_max_chunks int default 20000
+)
+returns table (
+    id uuid,
+    document_id uuid,
+    document_title text,
+    content text,
+    metadata jsonb,
+    similarity float
+)
+language plpgsql
+as $$
+declare
+    user_chunks bigint;
+begin
+    select count(*) into user_chunks
+    from (
+        select 1 from document_chunks
+        where document_chunks.user_id = filter_user_id
+        limit exact_max_chunks + 1
+    ) as bounded;
+
+    if user_chunks <= exact_max_chunks then
+        return query
+        select
+            document_chunks.id,
+            document_chunks.document_id,
+            documents.title,
+            document_chunks.content,
+            document_chunks.metadata,
+            1 - (document_chunks.embedding <=> query_embedding) as similarity
+        from document_chunks
+        join documents on documents.id = document_chunks.document_id
+        where document_chunks.user_id = filter_user_id
+        order by 1 - (document_chunks.embedding <=> query_embedding) desc
+        limit match_count;
+        return;
+    end if;
+
+    begin
+        perform set_config('hnsw.iterative_scan', 'relaxed_order', true);
+    exception when others then
+        -- Older pgvector: plain post-filtered scan, raise hnsw.ef_search instead.
+        null;
+    end;
+    return query
+    select
+        nearest.id,
+        nearest.document_id,
+        documents.title,
+        nearest.content,
+        nearest.metadata,
+        nearest.similarity
+    from (
+        select
+            document_chunks.id,
+            document_chunks.document_id,
+            document_chunks.content,
+            document_chunks.metadata,
+            1 - (document_chunks.embedding <=> query_embedding) as similarity
+        from document_chunks
+        where document_chunks.user_id = filter_user_id
+        order by document_chunks.embedding <=> query_embedding
+        limit match_count
+    ) as nearest
+    join documents on documents.id = nearest.document_id
+    order by nearest.similarity desc;
+end;
+$$;
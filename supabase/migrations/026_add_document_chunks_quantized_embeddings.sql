@@ -0,0 +1,258 @@
+-- Compact shadow copies of each chunk embedding (pgvector >= 0.7):
+-- * embedding_half: halfvec, 3 KB instead of 6 KB, precise enough to re-rank;
+-- * embedding_bits: sign bits (binary_quantize), 192 bytes, indexed with HNSW
+--   on Hamming distance as a cheap candidate prefilter.
+-- Existing rows are filled by `python -m scripts.quantize_embeddings`.
+alter table document_chunks add column if not exists embedding_half halfvec(1536);
+alter table document_chunks add column if not exists embedding_bits bit(1536);
+
+-- Keeps the shadow columns in sync with whatever the application writes to
+-- embedding. With `askpdf.embedding_storage = 'halfvec'` set on the database
+-- (done by the --compact step of the script) the float32 value is dropped
+-- after quantizing, so new chunks are stored as halfvec + bits only.
+create or replace function document_chunks_quantize_embedding()
+returns trigger
+language plpgsql
+as $$
+begin
+    if new.embedding is not null then
+        new.embedding_half := new.embedding::halfvec(1536);
+        if current_setting('askpdf.embedding_storage', true) = 'halfvec' then
+            new.embedding := null;
+        end if;
+    end if;
+    if new.embedding_half is not null then
+        new.embedding_bits := binary_quantize(new.embedding_half)::bit(1536);
+    else
+        new.embedding_bits := null;
+    end if;
+    return new;
+end;
+$$;
+
+drop trigger if exists document_chunks_quantize_embedding on document_chunks;
+create trigger document_chunks_quantize_embedding
+    before insert or update of embedding, embedding_half on document_chunks
+    for each row execute function document_chunks_quantize_embedding();
+
+-- As with 024, build it concurrently ahead of time on a large table.
+create index if not exists document_chunks_embedding_bits_hnsw_idx
+    on document_chunks using hnsw (embedding_bits bit_hamming_ops)
+    with (m = 16, ef_construction = 64);
+
+-- Compacted rows (halfvec only) are invisible to the float32 HNSW index;
+-- this makes "are there any?" a single index probe.
+create index if not exists document_chunks_compacted_idx
+    on document_chunks (id)
+    where embedding is null and embedding_half is not null;
+
+-- Search functions gain rerank_candidates. When it is > 0 (or any row has
+-- been compacted to halfvec only) the ANN step walks the Hamming index for
+-- that many candidates and re-ranks them exactly on the full or half vector;
+-- otherwise behaviour is unchanged from 024/025. Exact paths read
+-- coalesce(embedding, embedding_half) so compacted rows stay searchable, and
+-- the float32 HNSW path only runs while no row lacks a float32 embedding.
+drop function if exists match_documents(vector, int, uuid);
+drop function if exists match_user_documents(vector, uuid, int, int);
+
+-- Candidate count for the Hamming prefilter, or 0 for the float32 HNSW path.
+-- Falls back to the prefilter once rows are compacted, whether or not the
+-- caller configured rerank_candidates or this session sees the database
+-- setting. Also raises hnsw.ef_search so the index can return that many
+-- candidates.
+create or replace function quantized_rerank_candidates(rerank_candidates int, match_count int)
+returns int
+language plpgsql
+as $$
+declare
+    candidates int := coalesce(rerank_candidates, 0);
+begin
+    if candidates <= 0 and (
+        current_setting('askpdf.embedding_storage', true) = 'halfvec'
+        or exists (
+            select 1 from document_chunks
+            where document_chunks.embedding is null
+              and document_chunks.embedding_half is not null
+        )
+    ) then
+        candidates := match_count * 10;
+    end if;
+    if candidates <= 0 then
+        return 0;
+    end if;
+    -- hnsw.ef_search is capped at 1000.
+    candidates := least(greatest(candidates, match_count), 1000);
+    perform set_config(
+        'hnsw.ef_search',
+        greatest(candidates, coalesce(nullif(current_setting('hnsw.ef_search', true), '')::int, 40))::text,
+        true
+    );
+    return candidates;
+end;
+$$;
+
+create or replace function match_documents(
+    query_embedding vector(1536),
+    match_count int,
+    filter_document_id uuid default null,
+    rerank_candidates int default 0
+)
+returns table (
+    id uuid,
+    document_id uuid,
+    content text,
+    metadata jsonb,
+    similarity float
+)
+language plpgsql
+as $$
+declare
+    candidates int := quantized_rerank_candidates(rerank_candidates, match_count);
+begin
+    if filter_document_id is not null then
+        return query
+        select
+            document_chunks.id,
+            document_chunks.document_id,
+            document_chunks.content,
+            document_chunks.metadata,
+            1 - (coalesce(document_chunks.embedding, document_chunks.embedding_half::vector) <=> query_embedding)
+                as similarity
+        from document_chunks
+        where document_chunks.document_id = filter_document_id
+        order by 1 - (coalesce(document_chunks.embedding, document_chunks.embedding_half::vector) <=> query_embedding) desc
+        limit match_count;
+    elsif candidates > 0 then
+        return query
+        select
+            document_chunks.id,
+            document_chunks.document_id,
+            document_chunks.content,
+            document_chunks.metadata,
+            1 - (coalesce(document_chunks.embedding, document_chunks.embedding_half::vector) <=> query_embedding)
+                as similarity
+        from (
+            select document_chunks.id
+            from document_chunks
+            order by document_chunks.embedding_bits <~> binary_quantize(query_embedding)::bit(1536)
+            limit candidates
+        ) as prefilter
+        join document_chunks on document_chunks.id = prefilter.id
+        order by coalesce(document_chunks.embedding, document_chunks.embedding_half::vector) <=> query_embedding
+        limit match_count;
+    else
+        return query
+        select
+            document_chunks.id,
+            document_chunks.document_id,
+            document_chunks.content,
+            document_chunks.metadata,
+            1 - (document_chunks.embedding <=> query_embedding) as similarity
+        from document_chunks
+        order by document_chunks.embedding <=> query_embedding
+        limit match_count;
+    end if;
+end;
+$$;
+
+create or replace function match_user_documents(
+    query_embedding vector(1536),
+    filter_user_id uuid,
+    match_count int,
+    exact_max_chunks int default 20000,
+    rerank_candidates int default 0
+)
+returns table (
+    id uuid,
+    document_id uuid,
+    document_title text,
+    content text,
+    metadata jsonb,
+    similarity float
+)
+language plpgsql
+as $$
+declare
+    user_chunks bigint;
+    candidates int;
+begin
+    select count(*) into user_chunks
+    from (
+        select 1 from document_chunks
+        where document_chunks.user_id = filter_user_id
+        limit exact_max_chunks + 1
+    ) as bounded;
+
+    if user_chunks <= exact_max_chunks then
+        return query
+        select
+            document_chunks.id,
+            document_chunks.document_id,
+            documents.title,
+            document_chunks.content,
+            document_chunks.metadata,
+            1 - (coalesce(document_chunks.embedding, document_chunks.embedding_half::vector) <=> query_embedding)
+                as similarity
+        from document_chunks
+        join documents on documents.id = document_chunks.document_id
+        where document_chunks.user_id = filter_user_id
+        order by 1 - (coalesce(document_chunks.embedding, document_chunks.embedding_half::vector) <=> query_embedding) desc
+        limit match_count;
+        return;
+    end if;
+
+    begin
+        perform set_config('hnsw.iterative_scan', 'relaxed_order', true);
+    exception when others then
+        -- Older pgvector: plain post-filtered scan, raise hnsw.ef_search instead.
+        null;
+    end;
+    candidates := quantized_rerank_candidates(rerank_candidates, match_count);
+    if candidates > 0 then
+        return query
+        select
+            document_chunks.id,
+            document_chunks.document_id,
+            documents.title,
+            document_chunks.content,
+            document_chunks.metadata,
+            1 - (coalesce(document_chunks.embedding, document_chunks.embedding_half::vector) <=> query_embedding)
+                as similarity
+        from (
+            select document_chunks.id
+            from document_chunks
+            where document_chunks.user_id = filter_user_id
+            order by document_chunks.embedding_bits <~> binary_quantize(query_embedding)::bit(1536)
+            limit candidates
+        ) as prefilter
+        join document_chunks on document_chunks.id = prefilter.id
+        join documents on documents.id = document_chunks.document_id
+        order by coalesce(document_chunks.embedding, document_chunks.embedding_half::vector) <=> query_embedding
+        limit match_count;
+        return;
+    end if;
+
+    return query
+    select
+        nearest.id,
+        nearest.document_id,
+        documents.title,
+        nearest.content,
+        nearest.metadata,
+        nearest.similarity
+    from (
+        select
+            document_chunks.id,
+            document_chunks.document_id,
+            document_chunks.content,
+            document_chunks.metadata,
+            1 - (document_chunks.embedding <=> query_embedding) as similarity
+        from document_chunks
+        where document_chunks.user_id = filter_user_id
+        order by document_chunks.embedding <=> query_embedding
+        limit match_count
+    ) as nearest
+    join documents on documents.id = nearest.document_id
+    order by nearest.similarity desc;
+end;
+$$;
@@ -0,0 +1,5 @@
+-- claim_ingestion_job orders runnable jobs by their owner's live running
+-- jobs; this keeps that per-user count an index lookup.
+create index if not exists ingestion_jobs_user_running_idx
+    on ingestion_jobs (user_id, locked_at)
+    where status = 'running';